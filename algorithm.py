@@ -3,6 +3,8 @@ from collections import Counter
 import pickle
 import struct
 
+from bitWriter import BitWriter
+
 class CodeTable:
     def __init__(self):
         self.codes = {}
@@ -64,15 +66,8 @@ class ShannonFanoCodec:
         code_table = CodeTable()
         code_table.build(data)
 
-        encoded_bits = ''.join(code_table.codes[byte] for byte in data)
-
-        extra_bits = (8 - len(encoded_bits) % 8) % 8
-        encoded_bits += '0' * extra_bits
-
-        encoded_bytes = bytearray()
-        for i in range(0, len(encoded_bits), 8):
-            byte = encoded_bits[i:i+8]
-            encoded_bytes.append(int(byte, 2))
+        bit_writer = BitWriter(code_table.codes)
+        encoded_bytes, extra_bits = bit_writer.pack(data)
 
         codes_serialized = code_table.serialize()
         codes_size = len(codes_serialized)
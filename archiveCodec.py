@@ -0,0 +1,512 @@
+import os
+import struct
+import logging
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from byteHistogram import ByteHistogram
+from codeTable import CodeTable
+from contentChecksum import ContentChecksum
+from fileHandler import DEFAULT_BUFFER_SIZE, FileHandler, is_safe_name
+from numpyBackend import NumpyTableDecoder, make_bit_writer, make_table_decoder, resolve_backend
+from smallAlphabet import FixedLengthDecoder, LookupDecoder
+from tableDecoder import TableDecoder
+
+ARCHIVE_MAGIC = b'SFAR'
+ARCHIVE_FORMAT_VERSION = 1
+ARCHIVE_EXTENSION = '.sfa'
+# Заголовок архива: сигнатура, версия, смещение центрального каталога (записывается после данных файлов)
+ARCHIVE_HEADER = struct.Struct('<4sBQ')
+# Начало каталога: количество кодовых таблиц и файлов; за ним таблицы (длина и таблица) и записи файлов
+DIRECTORY_HEADER = struct.Struct('<II')
+TABLE_LENGTH = struct.Struct('<I')
+# Запись каталога: смещение данных, исходная длина, длина данных, CRC32, дополнительные биты,
+# номер таблицы, длины имени и расширения; за ней имя и расширение в UTF-8
+ARCHIVE_ENTRY = struct.Struct('<QQQIBHHH')
+DEFAULT_MAX_TABLES = 1
+MAX_TABLES = 0xFFFF
+MAX_NAME_LENGTH = 0xFFFF
+REFINE_ROUNDS = 3
+# Сколько исходных данных держится в памяти между подсчётом частот и кодированием,
+# чтобы маленькие файлы не читались с диска дважды
+READ_CACHE_SIZE = 64 << 20
+
+
+class ArchiveMember(NamedTuple):
+    # Путь относительно корня архива с разделителем '/' без расширения
+    name: str
+    extension: str
+    offset: int
+    original_length: int
+    payload_size: int
+    crc32: int
+    extra_bits: int
+    table_index: int
+
+    @property
+    def path(self) -> str:
+        """
+        Возвращает путь файла относительно корня архива вместе с расширением.
+        """
+        return self.name + self.extension
+
+
+def is_archive(file_path: str) -> bool:
+    """
+    Проверяет, записан ли файл в формате архива.
+
+    :param file_path: путь к файлу
+    :return: True, если файл начинается с сигнатуры архива
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            return file.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+    except IOError:
+        return False
+
+
+def _table_for(histograms: Iterable[Dict[int, int]]) -> Optional[CodeTable]:
+    """
+    Строит кодовую таблицу по суммарным частотам группы файлов.
+
+    :param histograms: частоты байтов файлов группы
+    :return: экземпляр CodeTable или None, если все файлы группы пусты
+    """
+    counts = [0] * 256
+    for histogram in histograms:
+        for byte, count in histogram.items():
+            counts[byte] += count
+    frequencies = {byte: count for byte, count in enumerate(counts) if count}
+    if not frequencies:
+        return None
+    code_table = CodeTable()
+    code_table.build_from_frequencies(frequencies)
+    return code_table
+
+
+def _code_lengths(code_table: CodeTable) -> List[int]:
+    """
+    Возвращает длины кодов таблицы массивом по 256 байтам (0 — кода нет).
+    """
+    lengths = [0] * 256
+    for byte, code in code_table.codes.items():
+        lengths[byte] = len(code)
+    return lengths
+
+
+def _member_bits(histogram: Dict[int, int], lengths: List[int]) -> Optional[int]:
+    """
+    Вычисляет длину закодированного файла в битах.
+
+    :param histogram: частоты байтов файла
+    :param lengths: длины кодов таблицы по байтам
+    :return: количество бит или None, если в таблице нет кода для какого-то байта файла
+    """
+    bits = 0
+    for byte, count in histogram.items():
+        length = lengths[byte]
+        if not length:
+            return None
+        bits += count * length
+    return bits
+
+
+def _own_bits(histogram: Dict[int, int]) -> int:
+    """
+    Вычисляет длину файла в битах, закодированного собственной таблицей, — сколько он мог бы занимать.
+    """
+    return _table_for([histogram]).encoded_bit_length()
+
+
+def _assign(histograms: List[Dict[int, int]], members: List[int],
+            tables: List[CodeTable]) -> Tuple[List[int], List[int], List[List[int]]]:
+    """
+    Назначает каждому непустому файлу таблицу, дающую самую короткую запись.
+
+    :param histograms: частоты байтов всех файлов
+    :param members: номера непустых файлов
+    :param tables: кодовые таблицы
+    :return: кортеж из номеров таблиц по файлам, длин файлов в битах и номеров файлов по таблицам
+    """
+    lengths = [_code_lengths(table) for table in tables]
+    assignment = [0] * len(histograms)
+    bits = [0] * len(histograms)
+    groups: List[List[int]] = [[] for _ in tables]
+    for member in members:
+        best_bits, best_index = None, 0
+        for index, table_lengths in enumerate(lengths):
+            member_bits = _member_bits(histograms[member], table_lengths)
+            if member_bits is not None and (best_bits is None or member_bits < best_bits):
+                best_bits, best_index = member_bits, index
+        assignment[member] = best_index
+        bits[member] = best_bits
+        groups[best_index].append(member)
+    return assignment, bits, groups
+
+
+def _refine(histograms: List[Dict[int, int]], members: List[int],
+            tables: List[CodeTable]) -> Tuple[List[CodeTable], List[int], int]:
+    """
+    Уточняет разбиение файлов по таблицам: файлы перераспределяются по таблицам,
+    таблицы перестраиваются по своим файлам, таблицы без файлов удаляются.
+    Таблица группы всегда содержит коды всех байтов своих файлов, поэтому
+    каждому файлу находится подходящая таблица.
+
+    :param histograms: частоты байтов всех файлов
+    :param members: номера непустых файлов
+    :param tables: начальные кодовые таблицы
+    :return: кортеж из таблиц, номеров таблиц по файлам и общего размера в битах вместе с таблицами
+    """
+    for _ in range(REFINE_ROUNDS):
+        _, _, groups = _assign(histograms, members, tables)
+        tables = [_table_for(histograms[member] for member in group) for group in groups if group]
+    assignment, bits, groups = _assign(histograms, members, tables)
+    used = [index for index, group in enumerate(groups) if group]
+    renumbered = {index: new_index for new_index, index in enumerate(used)}
+    tables = [tables[index] for index in used]
+    total_bits = sum(bits) + 8 * sum(len(table.serialize()) for table in tables)
+    return tables, [renumbered.get(index, 0) for index in assignment], total_bits
+
+
+def build_tables(histograms: List[Dict[int, int]],
+                 max_tables: int = DEFAULT_MAX_TABLES) -> Tuple[List[CodeTable], List[int]]:
+    """
+    Подбирает общие кодовые таблицы для файлов архива. Сначала строится одна таблица
+    по суммарным частотам. Пока таблиц меньше max_tables, добавляется собственная таблица
+    файла, больше всех проигрывающего на общих таблицах, и разбиение уточняется
+    перераспределением файлов. Новая таблица остаётся, только если выигрыш в данных
+    больше её собственного размера.
+
+    :param histograms: частоты байтов каждого файла (пустой словарь — пустой файл)
+    :param max_tables: наибольшее количество таблиц
+    :return: кортеж из таблиц и номеров таблиц по файлам (у пустых файлов — 0)
+    """
+    table = _table_for(histograms)
+    if table is None:
+        return [], [0] * len(histograms)
+    tables = [table]
+    assignment = [0] * len(histograms)
+    if max_tables <= 1:
+        return tables, assignment
+
+    members = [index for index, histogram in enumerate(histograms) if histogram]
+    bounds = {member: _own_bits(histograms[member]) for member in members}
+    tables, assignment, total_bits = _refine(histograms, members, tables)
+    while len(tables) < max_tables:
+        lengths = [_code_lengths(table) for table in tables]
+        worst = max(members, key=lambda member: _member_bits(histograms[member], lengths[assignment[member]]) -
+                    bounds[member])
+        candidate = _refine(histograms, members, tables + [_table_for([histograms[worst]])])
+        if len(candidate[0]) <= len(tables) or candidate[2] >= total_bits:
+            break
+        tables, assignment, total_bits = candidate
+    return tables, assignment
+
+
+def member_name(path: str, root: str) -> Tuple[str, str]:
+    """
+    Возвращает имя файла в архиве: путь относительно корня с разделителем '/' и расширение.
+
+    :param path: путь к файлу
+    :param root: корневой каталог архива
+    :return: кортеж из имени без расширения и расширения
+    """
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root)).replace(os.sep, '/')
+    return os.path.splitext(relative)
+
+
+class ArchiveCodec:
+    def __init__(self, archive_path: str, backend: str = 'auto', buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        """
+        Упаковывает много файлов в один архив с общими кодовыми таблицами и центральным
+        каталогом в конце. Список файлов читается из одного каталога, а отдельный файл
+        извлекается переходом к его данным по смещению из каталога.
+
+        :param archive_path: путь к архиву
+        :param backend: движок кодирования: 'auto', 'python' или 'numpy'
+        :param buffer_size: размер блока чтения в байтах
+        """
+        self.archive_path: str = archive_path
+        self.backend: str = resolve_backend(backend)
+        self.buffer_size: int = buffer_size
+
+    def create(self, paths: List[str], root: Optional[str] = None, max_tables: int = DEFAULT_MAX_TABLES) -> bool:
+        """
+        Создаёт архив из файлов. Частоты байтов считаются первым проходом, затем файлы
+        кодируются общими таблицами один за другим в открытый файл архива.
+
+        :param paths: пути к файлам
+        :param root: корневой каталог, относительно которого записываются имена
+                     (None — общий каталог всех файлов)
+        :param max_tables: наибольшее количество общих кодовых таблиц
+        :return: True, если архив успешно записан
+        """
+        if root is None:
+            root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else '.'
+        names = [member_name(path, root) for path in paths]
+        histograms: List[Dict[int, int]] = []
+        cached: Dict[int, bytes] = {}
+        cache_left = READ_CACHE_SIZE
+        try:
+            for index, path in enumerate(paths):
+                histogram = ByteHistogram(self.backend)
+                if os.path.getsize(path) <= cache_left:
+                    with open(path, 'rb') as file:
+                        data = file.read()
+                    histogram.update(data)
+                    cached[index] = data
+                    cache_left -= len(data)
+                else:
+                    for chunk in FileHandler(path).iter_chunks(self.buffer_size):
+                        histogram.update(chunk)
+                histograms.append(dict(histogram))
+        except IOError as e:
+            logging.error(f"Ошибка при чтении файла для архива: {e}")
+            return False
+
+        tables, assignment = build_tables(histograms, min(max_tables, MAX_TABLES))
+        bit_writers = [make_bit_writer(table.codes, self.backend) for table in tables]
+        covered = [bytes(table.codes) for table in tables]
+        members: List[ArchiveMember] = []
+        try:
+            with open(self.archive_path, 'wb') as file:
+                file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_FORMAT_VERSION, 0))
+                for index, path in enumerate(paths):
+                    table_index = assignment[index]
+                    offset = file.tell()
+                    checksum = ContentChecksum()
+                    extra_bits = 0
+                    if histograms[index]:
+                        data = cached.pop(index, None)
+                        chunks = [data] if data is not None else FileHandler(path).iter_chunks(self.buffer_size)
+                        bit_writer = bit_writers[table_index]
+                        for chunk in chunks:
+                            # Перечитанный файл мог измениться после подсчёта частот
+                            if chunk.translate(None, covered[table_index]):
+                                raise ValueError(f"Файл '{path}' изменился во время создания архива.")
+                            checksum.update(chunk)
+                            file.write(bit_writer.write(chunk))
+                        last_byte, extra_bits = bit_writer.flush()
+                        file.write(last_byte)
+                    members.append(ArchiveMember(names[index][0], names[index][1], offset, checksum.original_length,
+                                                 file.tell() - offset, checksum.crc32, extra_bits, table_index))
+
+                directory_offset = file.tell()
+                file.write(self._serialize_directory(tables, members))
+                file.seek(0)
+                file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_FORMAT_VERSION, directory_offset))
+            return True
+        except (IOError, ValueError) as e:
+            logging.exception(f"Ошибка при записи архива '{self.archive_path}': {e}")
+            return False
+
+    @staticmethod
+    def _serialize_directory(tables: List[CodeTable], members: List[ArchiveMember]) -> bytes:
+        """
+        Сериализует центральный каталог: таблицы и записи файлов.
+
+        :param tables: общие кодовые таблицы
+        :param members: записи файлов
+        :return: байтовая строка каталога
+        """
+        parts = [DIRECTORY_HEADER.pack(len(tables), len(members))]
+        for table in tables:
+            serialized = table.serialize()
+            parts.append(TABLE_LENGTH.pack(len(serialized)))
+            parts.append(serialized)
+        for member in members:
+            name = member.name.encode('utf-8')
+            extension = member.extension.encode('utf-8')
+            if len(name) > MAX_NAME_LENGTH or len(extension) > MAX_NAME_LENGTH:
+                raise ValueError(f"Слишком длинное имя файла в архиве: '{member.path}'.")
+            parts.append(ARCHIVE_ENTRY.pack(member.offset, member.original_length, member.payload_size, member.crc32,
+                                            member.extra_bits, member.table_index, len(name), len(extension)))
+            parts.append(name)
+            parts.append(extension)
+        return b''.join(parts)
+
+    def read_directory(self) -> Optional[Tuple[List[bytes], List[ArchiveMember]]]:
+        """
+        Читает центральный каталог, не затрагивая данные файлов.
+
+        :return: кортеж из сериализованных таблиц и записей файлов или None в случае ошибки
+        """
+        try:
+            with open(self.archive_path, 'rb') as file:
+                header = file.read(ARCHIVE_HEADER.size)
+                if len(header) < ARCHIVE_HEADER.size:
+                    logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для заголовка архива).")
+                    return None
+                magic, version, directory_offset = ARCHIVE_HEADER.unpack(header)
+                if magic != ARCHIVE_MAGIC or version != ARCHIVE_FORMAT_VERSION:
+                    logging.error(f"Неподдерживаемая версия формата архива: {version}.")
+                    return None
+                file.seek(directory_offset)
+                directory = file.read()
+            return self._parse_directory(directory, directory_offset)
+        except (IOError, struct.error, UnicodeDecodeError, ValueError) as e:
+            logging.error(f"Каталог архива '{self.archive_path}' повреждён: {e}")
+            return None
+
+    @staticmethod
+    def _parse_directory(directory: bytes, directory_offset: int) -> Tuple[List[bytes], List[ArchiveMember]]:
+        """
+        Разбирает центральный каталог.
+
+        :param directory: байты каталога
+        :param directory_offset: смещение каталога в архиве (данные файлов должны лежать до него)
+        :return: кортеж из сериализованных таблиц и записей файлов
+        :raises ValueError, struct.error: если каталог повреждён
+        """
+        table_count, member_count = DIRECTORY_HEADER.unpack_from(directory)
+        # Количества сверяются с длиной каталога до разбора: повреждённый заголовок
+        # иначе заставил бы перебирать миллиарды несуществующих записей
+        if DIRECTORY_HEADER.size + TABLE_LENGTH.size * table_count + ARCHIVE_ENTRY.size * member_count > \
+                len(directory):
+            raise ValueError("количество таблиц и записей не помещается в каталог")
+        position = DIRECTORY_HEADER.size
+        tables: List[bytes] = []
+        for _ in range(table_count):
+            table_length, = TABLE_LENGTH.unpack_from(directory, position)
+            position += TABLE_LENGTH.size
+            if position + table_length > len(directory):
+                raise ValueError("таблица выходит за пределы каталога")
+            tables.append(directory[position:position + table_length])
+            position += table_length
+
+        members: List[ArchiveMember] = []
+        for number in range(member_count):
+            if position + ARCHIVE_ENTRY.size > len(directory):
+                raise ValueError(f"запись {number} выходит за пределы каталога")
+            offset, original_length, payload_size, crc32, extra_bits, table_index, name_length, extension_length = \
+                ARCHIVE_ENTRY.unpack_from(directory, position)
+            position += ARCHIVE_ENTRY.size
+            if position + name_length + extension_length > len(directory):
+                raise ValueError(f"имя файла записи {number} выходит за пределы каталога")
+            name = directory[position:position + name_length].decode('utf-8')
+            position += name_length
+            extension = directory[position:position + extension_length].decode('utf-8')
+            position += extension_length
+            if offset + payload_size > directory_offset or payload_size and table_index >= table_count:
+                raise ValueError(f"запись файла '{name}{extension}' выходит за пределы архива")
+            members.append(ArchiveMember(name, extension, offset, original_length, payload_size, crc32, extra_bits,
+                                         table_index))
+        if position != len(directory):
+            raise ValueError("длина каталога не совпадает с записанной")
+        return tables, members
+
+    def list_members(self) -> Optional[List[ArchiveMember]]:
+        """
+        Возвращает записи файлов архива.
+
+        :return: список записей каталога или None в случае ошибки
+        """
+        directory = self.read_directory()
+        return directory[1] if directory is not None else None
+
+    def read_member(self, path: str) -> Optional[bytes]:
+        """
+        Декодирует один файл архива в память.
+
+        :param path: путь файла относительно корня архива (ArchiveMember.path)
+        :return: исходные данные файла или None, если файла нет или он повреждён
+        """
+        directory = self.read_directory()
+        if directory is None:
+            return None
+        tables, members = directory
+        member = next((member for member in members if member.path == path), None)
+        if member is None:
+            logging.error(f"Файл '{path}' не найден в архиве '{self.archive_path}'.")
+            return None
+        try:
+            with open(self.archive_path, 'rb') as file:
+                return b''.join(self._decode_member(file, member, tables, {}))
+        except (IOError, ValueError, IndexError) as e:
+            logging.error(f"Не удалось извлечь файл '{path}': {e}")
+            return None
+
+    def extract(self, output_dir: str, paths: Optional[List[str]] = None) -> bool:
+        """
+        Извлекает файлы архива в каталог, восстанавливая относительные пути и расширения.
+        Существующие файлы перезаписываются: имена уже уникальны в пределах архива.
+
+        :param output_dir: каталог назначения
+        :param paths: пути файлов относительно корня архива (None — все файлы)
+        :return: True, если все выбранные файлы извлечены и совпали с контрольными суммами
+        """
+        directory = self.read_directory()
+        if directory is None:
+            return False
+        tables, members = directory
+        if paths is not None:
+            wanted = set(paths)
+            members = [member for member in members if member.path in wanted]
+            missing = wanted - {member.path for member in members}
+            for path in sorted(missing):
+                logging.error(f"Файл '{path}' не найден в архиве '{self.archive_path}'.")
+            ok = not missing
+        else:
+            ok = True
+
+        decoders: Dict[int, Union[TableDecoder, FixedLengthDecoder, LookupDecoder, NumpyTableDecoder]] = {}
+        created_dirs = set()
+        try:
+            with open(self.archive_path, 'rb') as file:
+                for member in members:
+                    if not is_safe_name(member.path):
+                        logging.error(f"Небезопасное имя файла в архиве: '{member.path}', файл пропущен.")
+                        ok = False
+                        continue
+                    output_path = os.path.join(output_dir, *member.path.split('/'))
+                    parent = os.path.dirname(output_path)
+                    if parent not in created_dirs:
+                        os.makedirs(parent, exist_ok=True)
+                        created_dirs.add(parent)
+                    ok = FileHandler.write_file_chunks(output_path,
+                                                       self._decode_member(file, member, tables, decoders)) and ok
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении архива '{self.archive_path}': {e}")
+            return False
+        return ok
+
+    def _decode_member(self, file: BinaryIO, member: ArchiveMember, tables: List[bytes],
+                       decoders: Dict[int, Union[TableDecoder, FixedLengthDecoder, LookupDecoder, NumpyTableDecoder]]) -> Iterator[bytes]:
+        """
+        Декодирует данные одного файла блоками по buffer_size байт, сверяя длину и CRC32 с каталогом.
+
+        :param file: открытый файл архива
+        :param member: запись файла
+        :param tables: сериализованные таблицы архива
+        :param decoders: декодеры, уже построенные по номерам таблиц (пополняется)
+        :return: итератор по блокам декодированных данных
+        :raises ValueError: если таблица повреждена или данные не совпали с каталогом
+        """
+        if not member.payload_size:
+            if member.original_length:
+                raise ValueError(f"Файл '{member.path}' повреждён: нет закодированных данных.")
+            return
+        table_decoder = decoders.get(member.table_index)
+        if table_decoder is None:
+            table_decoder = make_table_decoder(CodeTable.deserialize(tables[member.table_index]).codes, self.backend)
+            decoders[member.table_index] = table_decoder
+        # Декодер таблицы общий для всех её файлов, поэтому состояние потока сбрасывается явно
+        table_decoder.reset()
+        expected = ContentChecksum()
+        expected.original_length = member.original_length
+        expected.crc32 = member.crc32
+        checksum = ContentChecksum()
+
+        remaining = member.payload_size
+        position = member.offset
+        final = False
+        while not final:
+            file.seek(position)
+            chunk = file.read(min(self.buffer_size, remaining))
+            position += len(chunk)
+            remaining -= len(chunk)
+            final = not remaining or not chunk
+            decoded_data = table_decoder.decode_chunk(chunk, final, member.extra_bits if final else 0)
+            checksum.update(decoded_data)
+            if checksum.original_length > expected.original_length or final and not checksum.matches(expected):
+                raise ValueError(f"Файл '{member.path}': {checksum.describe_mismatch(expected)}")
+            yield decoded_data
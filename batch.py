@@ -0,0 +1,406 @@
+import argparse
+import glob
+import logging
+import os
+import time
+from itertools import zip_longest
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from archiveCodec import ARCHIVE_EXTENSION, DEFAULT_MAX_TABLES, ArchiveCodec
+from blockCodec import DEFAULT_BLOCK_SIZE
+from codeDictionary import DICTIONARY_EXTENSION, CodeDictionary
+from decoder import Decoder
+from encoder import Encoder
+from fileHandler import DEFAULT_BUFFER_SIZE, DEFAULT_SAMPLE_SIZE, FileHandler
+from instrumentation import DISABLED, Instrumentation, json_lines_observer
+from numpyBackend import BACKENDS
+
+ENCODED_SUFFIX = '_encoded.bin'
+
+
+class BatchOptions(NamedTuple):
+    backend: str = 'auto'
+    streaming: bool = False
+    buffer_size: int = DEFAULT_BUFFER_SIZE
+    block_size: Optional[int] = None
+    workers: Optional[int] = None
+    sync_interval: Optional[int] = None
+    dictionary: Optional[str] = None
+    dictionary_dir: Optional[str] = None
+    report: Optional[str] = None
+    profile: bool = False
+    context_model: bool = False
+    sample_size: Optional[int] = None
+    append: bool = False
+
+
+class FileResult(NamedTuple):
+    path: str
+    output_path: str
+    ok: bool
+    original_size: int
+    encoded_size: int
+    elapsed: float
+
+    @property
+    def ratio(self) -> float:
+        """
+        Возвращает отношение размера закодированного файла к исходному.
+        """
+        return self.encoded_size / self.original_size if self.original_size else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Возвращает скорость обработки в МБ/с по исходным данным.
+        """
+        return self.original_size / self.elapsed / 1e6 if self.elapsed else 0.0
+
+
+def collect_files(patterns: List[str], command: str) -> List[str]:
+    """
+    Раскрывает пути, шаблоны и каталоги в список файлов. Из каталогов и шаблонов для
+    кодирования и проверки берутся исходные файлы, для декодирования — файлы *_encoded.bin.
+
+    :param patterns: пути к файлам, шаблоны glob или каталоги
+    :param command: 'encode', 'decode' или 'verify' (для архива — 'encode')
+    :return: список путей без повторов в порядке перечисления
+    """
+    def selected(path: str) -> bool:
+        is_encoded = path.endswith(ENCODED_SUFFIX)
+        if command == 'decode':
+            return is_encoded
+        return not is_encoded and not path.endswith((DICTIONARY_EXTENSION, ARCHIVE_EXTENSION))
+
+    files: Dict[str, None] = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, subdirectories, names in os.walk(pattern):
+                subdirectories.sort()
+                files.update((os.path.join(directory, name), None)
+                             for name in sorted(names) if selected(name))
+        elif glob.has_magic(pattern):
+            files.update((path, None) for path in sorted(glob.glob(pattern, recursive=True))
+                         if os.path.isfile(path) and selected(path))
+        else:
+            # Явно указанный путь обрабатывается всегда, отсутствующий файл попадёт в ошибки
+            files[pattern] = None
+    return list(files)
+
+
+def _file_size(path: str) -> int:
+    """
+    Возвращает размер файла или 0, если файла нет.
+
+    :param path: путь к файлу
+    :return: размер файла в байтах
+    """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _load_dictionary(options: BatchOptions) -> Optional[CodeDictionary]:
+    """
+    Загружает словарь, указанный в параметрах; в каждом процессе он загружается один раз.
+
+    :param options: параметры пакетной обработки
+    :return: экземпляр CodeDictionary или None, если словарь не указан
+    """
+    if options.dictionary is None:
+        return None
+    dictionary = CodeDictionary.load(options.dictionary_dir or '.', options.dictionary)
+    if dictionary is None:
+        raise IOError(f"Словарь '{options.dictionary}' не загружен.")
+    return dictionary
+
+
+def _instrumentation(options: BatchOptions) -> Instrumentation:
+    """
+    Создаёт инструментацию, дописывающую отчёты операций в файл JSON Lines, если он указан.
+
+    :param options: параметры пакетной обработки
+    :return: экземпляр Instrumentation (DISABLED, если отчёт не нужен)
+    """
+    if options.report is None:
+        return DISABLED
+    return Instrumentation([json_lines_observer(options.report)], profile=options.profile)
+
+
+def encode_file(path: str, options: BatchOptions) -> FileResult:
+    """
+    Кодирует один файл. Выполняется в процессе-исполнителе.
+
+    :param path: путь к исходному файлу
+    :param options: параметры пакетной обработки
+    :return: результат обработки файла
+    """
+    start_time = time.perf_counter()
+    encoder = Encoder(path, options.backend, options.streaming, options.buffer_size, options.block_size,
+                      options.workers, options.sync_interval, _load_dictionary(options), _instrumentation(options),
+                      options.context_model, options.sample_size, options.append)
+    output_path = encoder.file_handler.get_encoded_filename()
+    ok = encoder.encode()
+    return FileResult(path, output_path, ok, _file_size(path), _file_size(output_path),
+                      time.perf_counter() - start_time)
+
+
+def decode_file(path: str, options: BatchOptions) -> FileResult:
+    """
+    Декодирует один файл. Выполняется в процессе-исполнителе.
+
+    :param path: путь к закодированному файлу
+    :param options: параметры пакетной обработки
+    :return: результат обработки файла
+    """
+    start_time = time.perf_counter()
+    decoder = Decoder(path, options.backend, options.streaming, options.buffer_size, options.workers,
+                      options.dictionary_dir, _instrumentation(options))
+    ok = decoder.decode()
+    return FileResult(path, decoder.decoded_file_name, ok, _file_size(decoder.decoded_file_name),
+                      _file_size(path), time.perf_counter() - start_time)
+
+
+def verify_file(path: str, options: BatchOptions) -> FileResult:
+    """
+    Проверяет, что закодированный файл декодируется в исходный. Если в файле записаны
+    контрольные суммы, он декодируется в никуда и сверяется с ними, а исходный файл
+    сверяется с теми же контрольными суммами; иначе файл декодируется рядом с исходным,
+    содержимое сравнивается и декодированная копия удаляется.
+
+    :param path: путь к исходному файлу
+    :param options: параметры пакетной обработки
+    :return: результат обработки файла
+    """
+    start_time = time.perf_counter()
+    encoded_path = FileHandler(path).get_encoded_filename()
+    decoder = Decoder(encoded_path, options.backend, options.streaming, options.buffer_size, options.workers,
+                      options.dictionary_dir, _instrumentation(options))
+    if decoder.file_handler.file_exists() and decoder.has_checksum():
+        ok = decoder.verify() and decoder.matches_original(path)
+    else:
+        ok = decoder.decode() and files_equal(path, decoder.decoded_file_name, options.buffer_size)
+        if decoder.decoded_file_name and os.path.exists(decoder.decoded_file_name):
+            os.remove(decoder.decoded_file_name)
+    if not ok:
+        logging.error(f"Файл '{encoded_path}' не декодируется в исходный '{path}'.")
+    return FileResult(path, encoded_path, ok, _file_size(path), _file_size(encoded_path),
+                      time.perf_counter() - start_time)
+
+
+def files_equal(first_path: str, second_path: str, buffer_size: int) -> bool:
+    """
+    Сравнивает содержимое двух файлов блоками.
+
+    :param first_path: путь к первому файлу
+    :param second_path: путь ко второму файлу
+    :param buffer_size: размер блока в байтах
+    :return: True, если файлы совпадают
+    """
+    if _file_size(first_path) != _file_size(second_path):
+        return False
+    return all(first == second for first, second in zip_longest(
+        FileHandler(first_path).iter_chunks(buffer_size), FileHandler(second_path).iter_chunks(buffer_size)))
+
+
+COMMAND_FUNCTIONS: Dict[str, Callable[[str, BatchOptions], FileResult]] = {
+    'encode': encode_file,
+    'decode': decode_file,
+    'verify': verify_file,
+}
+
+
+def process_file(command: str, path: str, options: BatchOptions) -> FileResult:
+    """
+    Обрабатывает один файл; ошибка в одном файле не прерывает обработку остальных.
+
+    :param command: 'encode', 'decode' или 'verify'
+    :param path: путь к файлу
+    :param options: параметры пакетной обработки
+    :return: результат обработки файла
+    """
+    try:
+        return COMMAND_FUNCTIONS[command](path, options)
+    except Exception as e:
+        logging.exception(f"Ошибка при обработке файла '{path}': {e}")
+        return FileResult(path, '', False, 0, 0, 0.0)
+
+
+def run_batch(command: str, paths: List[str], options: BatchOptions, jobs: int = 1) -> Iterator[FileResult]:
+    """
+    Обрабатывает файлы в пуле из jobs процессов, возвращая результаты в порядке файлов.
+
+    :param command: 'encode', 'decode' или 'verify'
+    :param paths: пути к файлам
+    :param options: параметры пакетной обработки
+    :param jobs: количество процессов (1 — без пула)
+    :return: итератор по результатам обработки файлов
+    """
+    if jobs == 1 or len(paths) <= 1:
+        for path in paths:
+            yield process_file(command, path, options)
+        return
+
+    if options.workers is None:
+        # Файлы уже распределены по процессам, блоки внутри файла кодируются без своего пула
+        options = options._replace(workers=1)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(process_file, [command] * len(paths), paths, [options] * len(paths))
+
+
+def format_result(result: FileResult) -> str:
+    """
+    Форматирует строку отчёта по одному файлу.
+
+    :param result: результат обработки файла
+    :return: строка отчёта
+    """
+    status = 'OK    ' if result.ok else 'ОШИБКА'
+    return (f"{status} {result.path} -> {result.output_path}: {result.original_size} Б / "
+            f"{result.encoded_size} Б, коэффициент {result.ratio:.3f}, {result.elapsed:.3f} с, "
+            f"{result.throughput:.2f} МБ/с")
+
+
+def format_summary(results: List[FileResult], elapsed: float) -> str:
+    """
+    Форматирует итоговую строку отчёта.
+
+    :param results: результаты обработки файлов
+    :param elapsed: общее время обработки в секундах
+    :return: строка отчёта
+    """
+    original_size = sum(result.original_size for result in results)
+    encoded_size = sum(result.encoded_size for result in results)
+    failed = sum(not result.ok for result in results)
+    ratio = encoded_size / original_size if original_size else 0.0
+    throughput = original_size / elapsed / 1e6 if elapsed else 0.0
+    return (f"Итого: файлов {len(results)}, ошибок {failed}, {original_size} Б / {encoded_size} Б, "
+            f"коэффициент {ratio:.3f}, {elapsed:.3f} с, {throughput:.2f} МБ/с")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Создаёт разбор аргументов командной строки.
+
+    :return: экземпляр ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description="Пакетное кодирование и декодирование файлов кодом Шеннона-Фано.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('encode', "закодировать файлы"),
+                               ('decode', "декодировать файлы *_encoded.bin"),
+                               ('verify', "проверить, что *_encoded.bin декодируются в исходные файлы"),
+                               ('worker', "постоянный исполнитель заданий JSON Lines из stdin или Unix-сокета")):
+        subparser = subparsers.add_parser(command, help=help_text)
+        if command == 'worker':
+            subparser.add_argument('--socket', help="принимать задания через Unix-сокет по этому пути")
+        else:
+            subparser.add_argument('paths', nargs='+', help="файлы, шаблоны glob или каталоги")
+            subparser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                                   help="количество параллельно обрабатываемых файлов")
+        subparser.add_argument('--backend', choices=BACKENDS, default='auto', help="движок кодирования")
+        subparser.add_argument('--streaming', action='store_true', help="потоковая обработка с постоянной памятью")
+        subparser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE,
+                               help="размер блока чтения в байтах")
+        subparser.add_argument('--workers', type=int, help="количество процессов для блоков одного файла")
+        subparser.add_argument('--dictionary-dir', help="каталог словарей")
+        subparser.add_argument('--report', help="дописывать отчёты о фазах каждой операции в файл JSON Lines")
+        subparser.add_argument('--profile', action='store_true', help="добавлять в отчёт профиль cProfile")
+        if command in ('encode', 'worker'):
+            subparser.add_argument('--block-size', type=int, nargs='?', const=DEFAULT_BLOCK_SIZE,
+                                   help="кодировать независимыми блоками указанного размера")
+            subparser.add_argument('--sync-interval', type=int, help="интервал точек синхронизации в байтах")
+            subparser.add_argument('--dictionary', help="имя словаря для кодирования")
+            subparser.add_argument('--context-model', action='store_true',
+                                   help="модель порядка 1: отдельные таблицы по предыдущему байту")
+            subparser.add_argument('--sample-size', type=int, nargs='?', const=DEFAULT_SAMPLE_SIZE,
+                                   help="строить таблицу по выборке из указанного числа байт "
+                                        f"(по умолчанию {DEFAULT_SAMPLE_SIZE})")
+            subparser.add_argument('--append', action='store_true',
+                                   help="дописывать к закодированному файлу только новый хвост растущего файла "
+                                        "(прежние данные сверяются по выборочным окнам, а не целиком)")
+
+    subparser = subparsers.add_parser('archive', help="упаковать файлы в один архив с общими кодовыми таблицами")
+    subparser.add_argument('archive', help=f"путь к создаваемому архиву (*{ARCHIVE_EXTENSION})")
+    subparser.add_argument('paths', nargs='+', help="файлы, шаблоны glob или каталоги")
+    subparser.add_argument('--root', help="каталог, относительно которого записываются имена файлов")
+    subparser.add_argument('--tables', type=int, default=DEFAULT_MAX_TABLES,
+                           help="наибольшее количество общих кодовых таблиц")
+    subparser = subparsers.add_parser('list', help="показать содержимое архива, прочитав только его каталог")
+    subparser.add_argument('archive', help="путь к архиву")
+    subparser = subparsers.add_parser('extract', help="извлечь файлы из архива")
+    subparser.add_argument('archive', help="путь к архиву")
+    subparser.add_argument('members', nargs='*', help="пути файлов внутри архива (по умолчанию все)")
+    subparser.add_argument('-o', '--output-dir', default='.', help="каталог назначения")
+    for command in ('archive', 'list', 'extract'):
+        subparser = subparsers.choices[command]
+        subparser.add_argument('--backend', choices=BACKENDS, default='auto', help="движок кодирования")
+        subparser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE,
+                               help="размер блока чтения в байтах")
+    return parser
+
+
+def run_archive_command(arguments: argparse.Namespace) -> int:
+    """
+    Создаёт архив, печатает его содержимое или извлекает из него файлы.
+
+    :param arguments: разобранные аргументы команды archive, list или extract
+    :return: код завершения: 0 — успешно, 1 — ошибка, 2 — нет файлов для архива
+    """
+    codec = ArchiveCodec(arguments.archive, arguments.backend, arguments.buffer_size)
+    if arguments.command == 'list':
+        members = codec.list_members()
+        if members is None:
+            return 1
+        for member in members:
+            print(f"{member.original_length:>12} {member.payload_size:>12}  {member.path}")
+        print(f"Итого: файлов {len(members)}, {sum(member.original_length for member in members)} Б / "
+              f"{_file_size(arguments.archive)} Б")
+        return 0
+    if arguments.command == 'extract':
+        return 0 if codec.extract(arguments.output_dir, arguments.members or None) else 1
+
+    archive_path = os.path.abspath(arguments.archive)
+    paths = [path for path in collect_files(arguments.paths, 'encode') if os.path.abspath(path) != archive_path]
+    if not paths:
+        logging.error("Не найдено ни одного файла для архивирования.")
+        return 2
+    start_time = time.perf_counter()
+    ok = codec.create(paths, arguments.root, arguments.tables)
+    print(format_result(FileResult(f"{len(paths)} файлов", arguments.archive, ok, sum(map(_file_size, paths)),
+                                   _file_size(arguments.archive), time.perf_counter() - start_time)))
+    return 0 if ok else 1
+
+
+def run_cli(argv: List[str]) -> int:
+    """
+    Выполняет пакетную команду и печатает отчёт, работает с архивом либо запускает постоянный исполнитель.
+
+    :param argv: аргументы командной строки без имени программы
+    :return: код завершения: 0 — все файлы обработаны, 1 — есть ошибки, 2 — нет файлов
+    """
+    arguments = build_parser().parse_args(argv)
+    if arguments.command in ('archive', 'list', 'extract'):
+        return run_archive_command(arguments)
+    options = BatchOptions(arguments.backend, arguments.streaming, arguments.buffer_size,
+                           getattr(arguments, 'block_size', None), arguments.workers,
+                           getattr(arguments, 'sync_interval', None), getattr(arguments, 'dictionary', None),
+                           arguments.dictionary_dir, arguments.report, arguments.profile,
+                           getattr(arguments, 'context_model', False), getattr(arguments, 'sample_size', None),
+                           getattr(arguments, 'append', False))
+    if arguments.command == 'worker':
+        from codecWorker import run_worker
+        return run_worker(options, arguments.socket)
+    paths = collect_files(arguments.paths, arguments.command)
+    if not paths:
+        logging.error("Не найдено ни одного файла для обработки.")
+        return 2
+
+    start_time = time.perf_counter()
+    results = []
+    for result in run_batch(arguments.command, paths, options, max(1, arguments.jobs)):
+        print(format_result(result))
+        results.append(result)
+    print(format_summary(results, time.perf_counter() - start_time))
+    return 0 if all(result.ok for result in results) else 1
@@ -0,0 +1,446 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from batch import files_equal
+from blockCodec import DEFAULT_BLOCK_SIZE
+from decoder import Decoder
+from encoder import Encoder
+from fileHandler import DEFAULT_BUFFER_SIZE, DEFAULT_SAMPLE_SIZE
+from instrumentation import peak_rss_mb
+from numpyBackend import NUMPY_AVAILABLE
+
+BENCHMARK_FORMAT_VERSION = 1
+CORPUS_SEED = 20240501
+# Корпуса с неравномерным распределением собираются повторением базового блока
+CORPUS_BASE_SIZE = 1 << 20
+SIZE_SUFFIXES = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+DEFAULT_SIZES = '1K,64K,1M,16M'
+FULL_SIZES = '1K,64K,1M,16M,256M,1G'
+DEFAULT_MAX_SLOWDOWN = 0.1
+DEFAULT_COLD_START_RUNS = 5
+COLD_START_SIZE = 1 << 10
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+SKEWED_WORDS = (b'the', b'of', b'and', b'to', b'in', b'is', b'that', b'for', b'it', b'as', b'was', b'with',
+                b'be', b'by', b'on', b'not', b'he', b'this', b'are', b'or', b'his', b'from', b'at', b'which',
+                b'encoder', b'decoder', b'Shannon', b'Fano', b'2024-05-01', b'ERROR', b'INFO', b'\n')
+
+
+def _uniform_corpus(size: int, rng: random.Random) -> bytes:
+    return rng.randbytes(size)
+
+
+def _skewed_text_corpus(size: int, rng: random.Random) -> bytes:
+    # Частоты слов убывают по закону Ципфа, как в естественном тексте и логах
+    weights = [1 / rank for rank in range(1, len(SKEWED_WORDS) + 1)]
+    words = rng.choices(SKEWED_WORDS, weights, k=min(size, CORPUS_BASE_SIZE) // 4 + 1)
+    return b' '.join(words)
+
+
+def _single_symbol_corpus(size: int, rng: random.Random) -> bytes:
+    return b'a' * size
+
+
+def _all_symbols_corpus(size: int, rng: random.Random) -> bytes:
+    # Все 256 байтов с экспоненциально убывающими частотами: длинные коды и большая таблица
+    return bytes(range(256)) + bytes(rng.choices(range(256), [0.97 ** byte for byte in range(256)],
+                                                 k=min(size, CORPUS_BASE_SIZE)))
+
+
+def _dna_corpus(size: int, rng: random.Random) -> bytes:
+    # Четыре равновероятных символа: все коды по 2 бита
+    return bytes(rng.choices(b'ACGT', k=min(size, CORPUS_BASE_SIZE)))
+
+
+def _dna_skew_corpus(size: int, rng: random.Random) -> bytes:
+    # Четыре символа с неравными частотами: коды длиной 1, 2, 3 и 3 бита декодирует LookupDecoder
+    return bytes(rng.choices(b'ACGT', [50, 25, 13, 12], k=min(size, CORPUS_BASE_SIZE)))
+
+
+def _numeric_csv_corpus(size: int, rng: random.Random) -> bytes:
+    # Алфавит из 14 символов с кодами разной длины
+    rows = (b','.join(b'%d.%02d' % (rng.randrange(-999, 1000), rng.randrange(100)) for _ in range(8))
+            for _ in range(min(size, CORPUS_BASE_SIZE) // 56 + 1))
+    return b'\n'.join(rows)
+
+
+PROFILES: Dict[str, Callable[[int, random.Random], bytes]] = {
+    'uniform': _uniform_corpus,
+    'skewed-text': _skewed_text_corpus,
+    'single-symbol': _single_symbol_corpus,
+    'all-symbols': _all_symbols_corpus,
+    'dna': _dna_corpus,
+    'dna-skew': _dna_skew_corpus,
+    'numeric-csv': _numeric_csv_corpus,
+}
+
+
+class Engine(NamedTuple):
+    encoder_options: Dict[str, Any]
+    decoder_options: Dict[str, Any]
+    # Наибольший размер корпуса, на котором движок ещё имеет смысл запускать (None — без ограничения)
+    max_size: Optional[int] = None
+    legacy: bool = False
+
+
+ENGINES: Dict[str, Engine] = {
+    'python': Engine({'backend': 'python'}, {'backend': 'python'}),
+    'numpy': Engine({'backend': 'numpy'}, {'backend': 'numpy'}),
+    'streaming': Engine({'streaming': True}, {'streaming': True}),
+    'blocks': Engine({'block_size': DEFAULT_BLOCK_SIZE}, {}),
+    'context': Engine({'context_model': True}, {}),
+    'sampled': Engine({'sample_size': DEFAULT_SAMPLE_SIZE}, {}),
+    'legacy': Engine({}, {}, 1 << 20, True),
+}
+
+
+def parse_size(text: str) -> int:
+    """
+    Разбирает размер вида 64K, 16M или 1G.
+
+    :param text: размер с необязательным суффиксом K, M или G
+    :return: размер в байтах
+    """
+    text = text.strip().upper()
+    multiplier = SIZE_SUFFIXES.get(text[-1:], 1)
+    return int(text[:-1] if multiplier != 1 else text) * multiplier
+
+
+def write_corpus(path: str, profile: str, size: int) -> None:
+    """
+    Записывает детерминированный корпус: одинаковые профиль и размер всегда дают одинаковые данные.
+
+    :param path: путь к файлу корпуса
+    :param profile: имя профиля из PROFILES
+    :param size: размер корпуса в байтах
+    """
+    rng = random.Random(f"{CORPUS_SEED}:{profile}")
+    with open(path, 'wb') as file:
+        if profile == 'uniform':
+            for offset in range(0, size, CORPUS_BASE_SIZE):
+                file.write(_uniform_corpus(min(CORPUS_BASE_SIZE, size - offset), rng))
+            return
+        base = PROFILES[profile](size, rng)
+        for offset in range(0, size, len(base)):
+            file.write(base[:size - offset])
+
+
+def _run_encode(engine_name: str, corpus_path: str, repeat: int) -> Tuple[float, Optional[float], str]:
+    """
+    Кодирует корпус repeat раз. Выполняется в отдельном процессе, чтобы пиковая память
+    относилась только к одной операции.
+
+    :param engine_name: имя движка из ENGINES
+    :param corpus_path: путь к файлу корпуса
+    :param repeat: количество повторов
+    :return: кортеж из лучшего времени, пикового RSS и пути к закодированному файлу
+    """
+    engine = ENGINES[engine_name]
+    best = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        if engine.legacy:
+            from algorithm import ShannonFanoCodec
+            codec = ShannonFanoCodec(os.path.splitext(corpus_path)[0])
+            with contextlib.redirect_stdout(io.StringIO()):
+                codec.encode()
+            encoded_path = codec.encoded_file
+        else:
+            encoder = Encoder(corpus_path, **engine.encoder_options)
+            if not encoder.encode():
+                raise RuntimeError("кодирование завершилось с ошибкой")
+            encoded_path = encoder.file_handler.get_encoded_filename()
+        best = min(best, time.perf_counter() - start_time)
+    return best, peak_rss_mb(), encoded_path
+
+
+def _run_decode(engine_name: str, encoded_path: str, repeat: int) -> Tuple[float, Optional[float], str]:
+    """
+    Декодирует файл repeat раз в отдельном процессе.
+
+    :param engine_name: имя движка из ENGINES
+    :param encoded_path: путь к закодированному файлу
+    :param repeat: количество повторов
+    :return: кортеж из лучшего времени, пикового RSS и пути к декодированному файлу
+    """
+    engine = ENGINES[engine_name]
+    best = float('inf')
+    decoded_path = ''
+    for _ in range(repeat):
+        if decoded_path and os.path.exists(decoded_path):
+            os.remove(decoded_path)
+        start_time = time.perf_counter()
+        if engine.legacy:
+            from algorithm import ShannonFanoCodec
+            codec = ShannonFanoCodec(encoded_path[:-len('_encoded.bin')])
+            with contextlib.redirect_stdout(io.StringIO()):
+                codec.decode()
+            decoded_path = codec.decoded_file
+        else:
+            decoder = Decoder(encoded_path, **engine.decoder_options)
+            if not decoder.decode():
+                raise RuntimeError("декодирование завершилось с ошибкой")
+            decoded_path = decoder.decoded_file_name
+        best = min(best, time.perf_counter() - start_time)
+    return best, peak_rss_mb(), decoded_path
+
+
+def _in_fresh_process(function: Callable, *args: Any) -> Any:
+    """
+    Выполняет функцию в новом процессе, запущенном методом spawn.
+
+    :param function: функция уровня модуля
+    :param args: аргументы функции
+    :return: результат функции
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(function, *args).result()
+
+
+def run_case(engine_name: str, profile: str, size: int, work_dir: str, repeat: int) -> Dict[str, Any]:
+    """
+    Измеряет кодирование и декодирование одного корпуса одним движком.
+
+    :param engine_name: имя движка из ENGINES
+    :param profile: имя профиля корпуса
+    :param size: размер корпуса в байтах
+    :param work_dir: каталог для корпусов и результатов
+    :param repeat: количество повторов, учитывается лучшее время
+    :return: запись результата
+    """
+    result: Dict[str, Any] = {'engine': engine_name, 'profile': profile, 'size': size}
+    case_dir = os.path.join(work_dir, f"{engine_name}-{profile}-{size}")
+    os.makedirs(case_dir, exist_ok=True)
+    # Старый кодек принимает только файлы .txt
+    corpus_path = os.path.join(case_dir, 'corpus.txt')
+    write_corpus(corpus_path, profile, size)
+    try:
+        encode_time, encode_rss, encoded_path = _in_fresh_process(_run_encode, engine_name, corpus_path, repeat)
+        decode_time, decode_rss, decoded_path = _in_fresh_process(_run_decode, engine_name, encoded_path, repeat)
+        result.update({
+            'encode_mb_s': size / encode_time / 1e6 if encode_time else None,
+            'decode_mb_s': size / decode_time / 1e6 if decode_time else None,
+            'encode_seconds': encode_time,
+            'decode_seconds': decode_time,
+            'ratio': os.path.getsize(encoded_path) / size if size else None,
+            'encode_peak_rss_mb': encode_rss,
+            'decode_peak_rss_mb': decode_rss,
+            'roundtrip_ok': files_equal(corpus_path, decoded_path, DEFAULT_BUFFER_SIZE),
+        })
+    except Exception as e:
+        logging.error(f"Замер {engine_name}/{profile}/{size} завершился с ошибкой: {e}")
+        result['error'] = str(e)
+    finally:
+        shutil.rmtree(case_dir, ignore_errors=True)
+    return result
+
+
+def _best_run_ms(command: List[str], runs: int) -> float:
+    """
+    Запускает команду runs раз и возвращает лучшее время.
+
+    :param command: команда с аргументами
+    :param runs: количество запусков
+    :return: лучшее время в миллисекундах
+    """
+    best = float('inf')
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=os.path.dirname(MAIN_SCRIPT))
+        best = min(best, time.perf_counter() - start_time)
+    return best * 1000
+
+
+def _worker_job_ms(corpus_path: str, runs: int) -> float:
+    """
+    Измеряет время задания кодирования, отправленного уже запущенному постоянному исполнителю.
+
+    :param corpus_path: путь к файлу корпуса
+    :param runs: количество заданий
+    :return: лучшее время от отправки задания до получения ответа в миллисекундах
+    """
+    worker = subprocess.Popen([sys.executable, MAIN_SCRIPT, 'worker', '--workers', '1'], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    best = float('inf')
+    try:
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            worker.stdin.write(json.dumps({'command': 'encode', 'path': corpus_path}) + '\n')
+            worker.stdin.flush()
+            response = json.loads(worker.stdout.readline())
+            best = min(best, time.perf_counter() - start_time)
+            if not response.get('ok'):
+                raise RuntimeError(f"исполнитель вернул ошибку: {response}")
+        worker.stdin.write(json.dumps({'command': 'shutdown'}) + '\n')
+        worker.stdin.flush()
+        worker.stdout.readline()
+    finally:
+        worker.stdin.close()
+        worker.wait()
+    return best * 1000
+
+
+def measure_cold_start(work_dir: str, runs: int) -> Dict[str, Any]:
+    """
+    Измеряет стоимость запуска короткого вызова: пустого интерпретатора, импорта модулей,
+    кодирования маленького файла отдельным процессом и того же задания через постоянный исполнитель.
+
+    :param work_dir: каталог для корпуса
+    :param runs: количество запусков каждого замера, учитывается лучшее время
+    :return: запись результата с временами в миллисекундах
+    """
+    corpus_path = os.path.join(work_dir, 'cold-start.txt')
+    write_corpus(corpus_path, 'skewed-text', COLD_START_SIZE)
+    try:
+        return {
+            'interpreter_ms': _best_run_ms([sys.executable, '-c', 'pass'], runs),
+            'import_ms': _best_run_ms([sys.executable, '-c', 'import main'], runs),
+            'encode_process_ms': _best_run_ms([sys.executable, MAIN_SCRIPT, 'encode', corpus_path, '-j', '1'], runs),
+            'worker_job_ms': _worker_job_ms(corpus_path, runs),
+        }
+    except (OSError, subprocess.CalledProcessError, RuntimeError, ValueError) as e:
+        logging.error(f"Замер времени запуска завершился с ошибкой: {e}")
+        return {'error': str(e)}
+
+
+def find_regressions(results: List[Dict[str, Any]], baseline: Dict[str, Any], max_slowdown: float) -> List[str]:
+    """
+    Сравнивает скорость с сохранённым прогоном.
+
+    :param results: записи текущего прогона
+    :param baseline: содержимое JSON-файла предыдущего прогона
+    :param max_slowdown: допустимая доля замедления, например 0.1 — на 10%
+    :return: описания регрессий
+    """
+    previous = {(item['engine'], item['profile'], item['size']): item for item in baseline.get('results', [])}
+    regressions = []
+    for item in results:
+        old = previous.get((item['engine'], item['profile'], item['size']))
+        if 'error' in item or not item.get('roundtrip_ok', True):
+            regressions.append(f"{item['engine']}/{item['profile']}/{item['size']}: ошибка или несовпадение данных")
+            continue
+        if old is None:
+            continue
+        for metric in ('encode_mb_s', 'decode_mb_s'):
+            if old.get(metric) and item.get(metric) is not None and item[metric] < old[metric] * (1 - max_slowdown):
+                regressions.append(f"{item['engine']}/{item['profile']}/{item['size']}: {metric} "
+                                   f"{item[metric]:.2f} < {old[metric]:.2f} МБ/с")
+    return regressions
+
+
+def find_cold_start_regressions(cold_start: Dict[str, Any], baseline: Dict[str, Any],
+                                max_slowdown: float) -> List[str]:
+    """
+    Сравнивает время запуска с сохранённым прогоном.
+
+    :param cold_start: замер времени запуска текущего прогона
+    :param baseline: содержимое JSON-файла предыдущего прогона
+    :param max_slowdown: допустимая доля замедления
+    :return: описания регрессий
+    """
+    previous = baseline.get('cold_start') or {}
+    regressions = []
+    for metric, value in cold_start.items():
+        old = previous.get(metric)
+        if metric.endswith('_ms') and old and value > old * (1 + max_slowdown):
+            regressions.append(f"запуск: {metric} {value:.1f} > {old:.1f} мс")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Создаёт разбор аргументов командной строки.
+
+    :return: экземпляр ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description="Замеры скорости, памяти и степени сжатия кодеков.")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="движки через запятую")
+    parser.add_argument('--profiles', default=','.join(PROFILES), help="профили корпусов через запятую")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"размеры через запятую или 'full' ({FULL_SIZES})")
+    parser.add_argument('--repeat', type=int, default=3, help="количество повторов, учитывается лучшее время")
+    parser.add_argument('--output', default='benchmark.json', help="файл результатов JSON")
+    parser.add_argument('--baseline', help="файл результатов предыдущего прогона для поиска регрессий")
+    parser.add_argument('--max-slowdown', type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help="допустимая доля замедления относительно --baseline")
+    parser.add_argument('--cold-start-runs', type=int, default=DEFAULT_COLD_START_RUNS,
+                        help="количество запусков для замера времени старта (0 — не замерять)")
+    parser.add_argument('--work-dir', help="каталог для временных корпусов (по умолчанию временный)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Запускает замеры и сохраняет результаты.
+
+    :param argv: аргументы командной строки без имени программы
+    :return: код завершения: 0 — без регрессий, 1 — есть регрессии или ошибки
+    """
+    arguments = build_parser().parse_args(argv)
+    engines = [name for name in arguments.engines.split(',') if name]
+    for name in engines:
+        if name not in ENGINES:
+            raise SystemExit(f"Неизвестный движок '{name}', допустимые значения: {', '.join(ENGINES)}")
+    if 'numpy' in engines and not NUMPY_AVAILABLE:
+        logging.warning("NumPy не установлен, движок numpy пропущен.")
+        engines.remove('numpy')
+    profiles = [name for name in arguments.profiles.split(',') if name]
+    sizes = [parse_size(size) for size in (FULL_SIZES if arguments.sizes == 'full' else arguments.sizes).split(',')]
+
+    results = []
+    cold_start: Optional[Dict[str, Any]] = None
+    with tempfile.TemporaryDirectory(dir=arguments.work_dir) as work_dir:
+        if arguments.cold_start_runs > 0:
+            cold_start = measure_cold_start(work_dir, arguments.cold_start_runs)
+            print(json.dumps({'cold_start': cold_start}, ensure_ascii=False))
+        for profile in profiles:
+            for size in sizes:
+                for engine_name in engines:
+                    max_size = ENGINES[engine_name].max_size
+                    if max_size is not None and size > max_size:
+                        continue
+                    result = run_case(engine_name, profile, size, work_dir, arguments.repeat)
+                    results.append(result)
+                    print(json.dumps(result, ensure_ascii=False))
+
+    report = {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': NUMPY_AVAILABLE,
+        'cold_start': cold_start,
+        'results': results,
+    }
+    with open(arguments.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    failed = any('error' in item or not item.get('roundtrip_ok', False) for item in results)
+    failed = failed or (cold_start is not None and 'error' in cold_start)
+    if arguments.baseline:
+        with open(arguments.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, arguments.max_slowdown)
+        if cold_start is not None:
+            regressions += find_cold_start_regressions(cold_start, baseline, arguments.max_slowdown)
+        for regression in regressions:
+            print(f"Регрессия: {regression}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
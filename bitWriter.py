@@ -0,0 +1,139 @@
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+BLOCK_SYMBOLS = 64
+
+
+class BitWriter:
+    def __init__(self, codes: Dict[int, str]) -> None:
+        """
+        Подготавливает коды в виде целочисленных пар (значение, длина) для упаковки битов.
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'}
+        """
+        self.bit_codes: List[Tuple[int, int]] = [(0, 0)] * 256
+        for byte, code in codes.items():
+            self.bit_codes[byte] = (int(code, 2), len(code))
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+        self.elapsed: float = 0.0
+        self._pending: int = 0
+        self._pending_bits: int = 0
+
+    def bit_length(self, data: bytes) -> int:
+        """
+        Вычисляет длину закодированных данных в битах без их кодирования.
+
+        :param data: исходные данные в виде байтовой строки
+        :return: количество бит закодированных данных
+        """
+        # byteHistogram зависит от smallAlphabet, который наследует BitWriter
+        from byteHistogram import ByteHistogram
+
+        counts = ByteHistogram.from_data(data, 'python').counts
+        return sum(length * count for (_, length), count in zip(self.bit_codes, counts) if count)
+
+    def pack(self, data: bytes, bit_length: Optional[int] = None) -> Tuple[bytearray, int]:
+        """
+        Упаковывает коды байтов данных в заранее выделенный буфер.
+
+        :param data: исходные данные в виде байтовой строки
+        :param bit_length: длина результата в битах, если уже известна
+        :return: кортеж из закодированных байтов и количества дополнительных битов
+        """
+        if bit_length is None:
+            bit_length = self.bit_length(data)
+        encoded_bytes = bytearray((bit_length + 7) // 8)
+        return encoded_bytes, self.pack_into(data, encoded_bytes, bit_length)
+
+    def pack_into(self, data: bytes, encoded_bytes: Union[bytearray, memoryview], bit_length: int) -> int:
+        """
+        Упаковывает коды байтов данных в переданный буфер, например в отображённый в память файл.
+
+        :param data: исходные данные (bytes, memoryview или mmap)
+        :param encoded_bytes: буфер размером (bit_length + 7) // 8 байт
+        :param bit_length: длина результата в битах
+        :return: количество дополнительных битов
+        """
+        start_time = time.perf_counter()
+        extra_bits = (8 - bit_length % 8) % 8
+
+        self._pending = 0
+        self._pending_bits = 0
+        position = self._pack_into(data, encoded_bytes, 0)
+        if self._pending_bits:
+            encoded_bytes[position] = self._pending << extra_bits
+        self._pending = 0
+        self._pending_bits = 0
+
+        self.bytes_in += len(data)
+        self.bytes_out += len(encoded_bytes)
+        self.elapsed += time.perf_counter() - start_time
+        return extra_bits
+
+    def write(self, data: bytes) -> bytearray:
+        """
+        Упаковывает очередной блок потока; неполный последний байт переносится в следующий вызов.
+
+        :param data: очередной блок исходных данных
+        :return: полностью заполненные байты закодированных данных
+        """
+        start_time = time.perf_counter()
+        encoded_bytes = bytearray()
+        self._pack_into(data, encoded_bytes, 0)
+        self.bytes_in += len(data)
+        self.bytes_out += len(encoded_bytes)
+        self.elapsed += time.perf_counter() - start_time
+        return encoded_bytes
+
+    def flush(self) -> Tuple[bytes, int]:
+        """
+        Завершает поток, дополняя последний байт нулями.
+
+        :return: кортеж из последнего байта (или пустой строки) и количества дополнительных битов
+        """
+        if not self._pending_bits:
+            return b'', 0
+        extra_bits = 8 - self._pending_bits
+        last_byte = bytes((self._pending << extra_bits,))
+        self._pending = 0
+        self._pending_bits = 0
+        self.bytes_out += 1
+        return last_byte, extra_bits
+
+    def _pack_into(self, data: bytes, encoded_bytes: bytearray, position: int) -> int:
+        """
+        Дописывает коды данных в буфер с позиции position, сохраняя неполный байт в состоянии.
+
+        :param data: исходные данные в виде байтовой строки
+        :param encoded_bytes: буфер результата (присваивание за концом bytearray расширяет буфер)
+        :param position: индекс первого записываемого байта
+        :return: индекс байта, следующего за последним записанным
+        """
+        bit_codes = self.bit_codes
+        pending = self._pending
+        pending_bits = self._pending_bits
+        for block_start in range(0, len(data), BLOCK_SYMBOLS):
+            acc = pending
+            acc_bits = pending_bits
+            for byte in data[block_start:block_start + BLOCK_SYMBOLS]:
+                value, length = bit_codes[byte]
+                acc = (acc << length) | value
+                acc_bits += length
+            pending_bits = acc_bits & 7
+            whole_bytes = acc_bits >> 3
+            encoded_bytes[position:position + whole_bytes] = (acc >> pending_bits).to_bytes(whole_bytes, 'big')
+            position += whole_bytes
+            pending = acc & ((1 << pending_bits) - 1)
+        self._pending = pending
+        self._pending_bits = pending_bits
+        return position
+
+    @property
+    def throughput(self) -> float:
+        """
+        Возвращает скорость упаковки в МБ/с по исходным данным.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.bytes_in / self.elapsed / 1e6
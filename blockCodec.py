@@ -0,0 +1,253 @@
+import os
+import struct
+import logging
+import zlib
+from collections import deque
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from codeTable import CodeTable
+from fileHandler import FileHandler
+from numpyBackend import make_bit_writer, make_table_decoder
+
+BLOCK_MAGIC = b'SFBK'
+BLOCK_FORMAT_VERSION = 2
+DEFAULT_BLOCK_SIZE = 1 << 20
+# Заголовок контейнера: сигнатура, версия, размер блока, количество блоков, длина расширения
+BLOCK_HEADER = struct.Struct('<4sBIII')
+# Запись индекса: смещение блока, исходная длина, размер таблицы, размер данных, дополнительные биты, CRC32 блока
+BLOCK_ENTRY = struct.Struct('<QIIIBI')
+# Записи индекса по версиям формата; в версии 1 контрольных сумм блоков нет
+BLOCK_ENTRIES: Dict[int, struct.Struct] = {1: struct.Struct('<QIIIB'), BLOCK_FORMAT_VERSION: BLOCK_ENTRY}
+
+BlockEntry = Tuple[int, int, int, int, int, Optional[int]]
+
+
+def is_block_container(file_path: str) -> bool:
+    """
+    Проверяет, записан ли файл в блочном формате.
+
+    :param file_path: путь к закодированному файлу
+    :return: True, если файл начинается с сигнатуры блочного контейнера
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            return file.read(len(BLOCK_MAGIC)) == BLOCK_MAGIC
+    except IOError:
+        return False
+
+
+def encode_block(data: bytes, backend: str) -> Tuple[int, bytes, bytes, int, int]:
+    """
+    Кодирует один блок с собственной кодовой таблицей. Выполняется в процессе-исполнителе.
+
+    :param data: исходные данные блока
+    :param backend: движок кодирования, 'python' или 'numpy'
+    :return: кортеж из исходной длины, сериализованной таблицы, закодированных данных,
+             количества дополнительных битов и CRC32 исходных данных
+    """
+    code_table = CodeTable()
+    code_table.build(data, backend)
+    encoded_bytes, extra_bits = make_bit_writer(code_table.codes, backend).pack(data, code_table.encoded_bit_length())
+    return len(data), code_table.serialize(), bytes(encoded_bytes), extra_bits, zlib.crc32(data)
+
+
+def decode_block(codes_serialized: bytes, encoded_bytes: bytes, extra_bits: int, backend: str) -> bytes:
+    """
+    Декодирует один блок. Выполняется в процессе-исполнителе.
+
+    :param codes_serialized: сериализованная кодовая таблица блока
+    :param encoded_bytes: закодированные данные блока
+    :param extra_bits: количество дополнительных битов блока
+    :param backend: движок декодирования, 'python' или 'numpy'
+    :return: декодированные данные блока
+    """
+    code_table = CodeTable.deserialize(codes_serialized)
+    return make_table_decoder(code_table.codes, backend).decode(encoded_bytes, extra_bits)
+
+
+class BlockCodec:
+    def __init__(self, workers: Optional[int] = None, backend: str = 'python') -> None:
+        """
+        Кодирует и декодирует блочный контейнер, распределяя блоки по процессам.
+
+        :param workers: количество процессов (None — по числу процессоров, 1 — без пула)
+        :param backend: фактический движок, 'python' или 'numpy'
+        """
+        self.workers: int = workers or os.cpu_count() or 1
+        self.backend: str = backend
+        # Номера блоков, не совпавших с исходной длиной или CRC32 при последнем декодировании
+        self.corrupted_blocks: List[int] = []
+
+    def encode(self, file_handler: FileHandler, encoded_file_path: str, block_size: int = DEFAULT_BLOCK_SIZE) -> bool:
+        """
+        Кодирует файл независимыми блоками фиксированного размера.
+
+        :param file_handler: обработчик исходного файла
+        :param encoded_file_path: путь к закодированному файлу
+        :param block_size: размер блока исходных данных в байтах
+        :return: True, если контейнер успешно записан
+        """
+        file_size = os.path.getsize(file_handler.file_path)
+        block_count = (file_size + block_size - 1) // block_size
+        extension_bytes = file_handler.extension.encode('utf-8')
+        entries: List[BlockEntry] = []
+
+        try:
+            with open(encoded_file_path, 'wb') as file:
+                file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, BLOCK_FORMAT_VERSION, block_size, block_count,
+                                             len(extension_bytes)))
+                file.write(extension_bytes)
+                index_offset = file.tell()
+                # Индекс заполняется после записи блоков, когда известны их смещения
+                file.write(bytes(BLOCK_ENTRY.size * block_count))
+
+                blocks = ((block, self.backend) for block in file_handler.iter_chunks(block_size))
+                for original_length, codes_serialized, encoded_bytes, extra_bits, crc32 in self._map(encode_block, blocks):
+                    entries.append((file.tell(), original_length, len(codes_serialized), len(encoded_bytes), extra_bits,
+                                    crc32))
+                    file.write(codes_serialized)
+                    file.write(encoded_bytes)
+
+                file.seek(index_offset)
+                for entry in entries:
+                    file.write(BLOCK_ENTRY.pack(*entry))
+            return True
+        except IOError as e:
+            logging.exception(f"Ошибка при записи блочного файла '{encoded_file_path}': {e}")
+            return False
+
+    def read_header(self, file_path: str) -> Optional[Tuple[str, List[BlockEntry]]]:
+        """
+        Читает заголовок и индекс блоков контейнера.
+
+        :param file_path: путь к закодированному файлу
+        :return: кортеж из расширения исходного файла и списка записей индекса (CRC32 блоков версии 1 — None)
+                 или None в случае ошибки
+        """
+        try:
+            with open(file_path, 'rb') as file:
+                header = file.read(BLOCK_HEADER.size)
+                if len(header) < BLOCK_HEADER.size:
+                    logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для заголовка блочного файла).")
+                    return None
+                magic, version, _, block_count, extension_length = BLOCK_HEADER.unpack(header)
+                entry_struct = BLOCK_ENTRIES.get(version)
+                if magic != BLOCK_MAGIC or entry_struct is None:
+                    logging.error(f"Неподдерживаемая версия блочного формата: {version}.")
+                    return None
+
+                # Количество блоков и длина расширения сверяются с размером файла до чтения:
+                # повреждённый заголовок иначе заставил бы выделить память под несуществующий индекс
+                file_size = os.fstat(file.fileno()).st_size
+                if extension_length + entry_struct.size * block_count > file_size - BLOCK_HEADER.size:
+                    logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для индекса блоков).")
+                    return None
+                extension_data = file.read(extension_length)
+                index_data = file.read(entry_struct.size * block_count)
+                if len(extension_data) < extension_length or len(index_data) < entry_struct.size * block_count:
+                    logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для индекса блоков).")
+                    return None
+                entries = [entry_struct.unpack_from(index_data, i * entry_struct.size) for i in range(block_count)]
+                if any(offset + table_size + payload_size > file_size
+                       for offset, _, table_size, payload_size, *_ in entries):
+                    logging.error("Файл поврежден или имеет неверный формат (блок выходит за пределы файла).")
+                    return None
+                if entry_struct is not BLOCK_ENTRY:
+                    entries = [entry + (None,) for entry in entries]
+                return extension_data.decode('utf-8'), entries
+        except (IOError, UnicodeDecodeError) as e:
+            logging.exception(f"Ошибка при чтении заголовка блочного файла '{file_path}': {e}")
+            return None
+
+    def decode(self, file_path: str, entries: List[BlockEntry], first_block: int = 0,
+               first_offset: int = 0) -> Iterator[bytes]:
+        """
+        Декодирует блоки контейнера, возвращая их в исходном порядке. Каждый блок сверяется
+        с исходной длиной и CRC32 из индекса; номера несовпавших блоков попадают в corrupted_blocks.
+
+        :param file_path: путь к закодированному файлу
+        :param entries: записи индекса блоков
+        :param first_block: номер первого из переданных блоков в контейнере
+        :param first_offset: смещение первого из переданных блоков в исходных данных
+        :return: итератор по декодированным блокам
+        """
+        self.corrupted_blocks = []
+        block_start = first_offset
+        with open(file_path, 'rb') as file:
+            for block_number, (decoded_block, (_, original_length, _, _, _, crc32)) in enumerate(
+                    zip(self._map(decode_block, self._read_blocks(file, entries)), entries), first_block):
+                if len(decoded_block) != original_length:
+                    logging.error(f"Блок {block_number} (смещение {block_start}) повреждён: длина декодированного блока "
+                                  f"{len(decoded_block)} не совпадает с исходной {original_length}.")
+                    self.corrupted_blocks.append(block_number)
+                elif crc32 is not None and zlib.crc32(decoded_block) != crc32:
+                    logging.error(f"Блок {block_number} (смещение {block_start}) повреждён: CRC32 не совпадает.")
+                    self.corrupted_blocks.append(block_number)
+                block_start += original_length
+                yield decoded_block
+
+    def decode_range(self, file_path: str, entries: List[BlockEntry], start: int, length: int) -> bytes:
+        """
+        Декодирует только блоки, задевающие диапазон исходных данных.
+
+        :param file_path: путь к закодированному файлу
+        :param entries: записи индекса блоков
+        :param start: индекс первого байта диапазона в исходных данных
+        :param length: длина диапазона в байтах
+        :return: декодированные байты диапазона
+        """
+        end = start + length
+        selected: List[BlockEntry] = []
+        first_block = first_block_start = block_start = 0
+        for block_number, entry in enumerate(entries):
+            block_end = block_start + entry[1]
+            if block_end > start and block_start < end:
+                if not selected:
+                    first_block, first_block_start = block_number, block_start
+                selected.append(entry)
+            block_start = block_end
+        if not selected:
+            return b''
+        decoded_data = b''.join(self.decode(file_path, selected, first_block, first_block_start))
+        return decoded_data[start - first_block_start:end - first_block_start]
+
+    def _read_blocks(self, file: BinaryIO, entries: List[BlockEntry]) -> Iterator[Tuple[bytes, bytes, int, str]]:
+        """
+        Читает таблицы и данные блоков по индексу.
+
+        :param file: файловый объект контейнера
+        :param entries: записи индекса блоков
+        :return: итератор по аргументам decode_block
+        """
+        for offset, _, table_size, payload_size, extra_bits, _ in entries:
+            file.seek(offset)
+            codes_serialized = file.read(table_size)
+            encoded_bytes = file.read(payload_size)
+            yield codes_serialized, encoded_bytes, extra_bits, self.backend
+
+    def _map(self, function: Callable, arguments: Iterable[tuple]) -> Iterator:
+        """
+        Выполняет функцию над аргументами в пуле процессов, сохраняя порядок результатов.
+        Одновременно в работе не больше 2 * workers задач, поэтому память ограничена
+        несколькими блоками независимо от размера файла.
+
+        :param function: функция уровня модуля
+        :param arguments: итератор по кортежам аргументов
+        :return: итератор по результатам в порядке аргументов
+        """
+        if self.workers == 1:
+            for args in arguments:
+                yield function(*args)
+            return
+
+        # Пул процессов импортируется только при параллельной обработке: его загрузка
+        # заметна на фоне времени запуска короткого вызова
+        from concurrent.futures import Future, ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending: Deque['Future'] = deque()
+            for args in arguments:
+                pending.append(executor.submit(function, *args))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -0,0 +1,114 @@
+from array import array
+from collections import Counter
+from typing import Iterable, Iterator, Mapping
+
+from numpyBackend import np, resolve_backend
+from smallAlphabet import SMALL_ALPHABET_SIZE
+
+HISTOGRAM_SIZE = 256
+# Знаковый 64-битный счётчик, чтобы массив можно было складывать с результатом np.bincount на месте
+COUNTER_TYPECODE = 'q'
+COUNT_BLOCK_SIZE = 1 << 16
+
+
+class ByteHistogram(Mapping[int, int]):
+    def __init__(self, backend: str = 'auto', initial: int = 0) -> None:
+        """
+        Гистограмма байтов на массиве из 256 счётчиков. Как словарь {байт: частота} содержит
+        только встретившиеся байты, поэтому передаётся в CodeTable.build_from_frequencies напрямую.
+
+        :param backend: движок подсчёта: 'auto', 'python' (Counter) или 'numpy' (np.bincount)
+        :param initial: начальное значение каждого счётчика
+        """
+        self.backend: str = resolve_backend(backend)
+        self.counts: array = array(COUNTER_TYPECODE, [initial]) * HISTOGRAM_SIZE
+
+    @staticmethod
+    def from_data(data: bytes, backend: str = 'auto') -> 'ByteHistogram':
+        """
+        Строит гистограмму по одному блоку данных.
+
+        :param data: байтовые данные
+        :param backend: движок подсчёта
+        :return: экземпляр ByteHistogram
+        """
+        histogram = ByteHistogram(backend)
+        histogram.update(data)
+        return histogram
+
+    @staticmethod
+    def from_chunks(chunks: Iterable[bytes], backend: str = 'auto') -> 'ByteHistogram':
+        """
+        Строит гистограмму по последовательности блоков данных.
+
+        :param chunks: итератор по блокам данных
+        :param backend: движок подсчёта
+        :return: экземпляр ByteHistogram
+        """
+        histogram = ByteHistogram(backend)
+        for chunk in chunks:
+            histogram.update(chunk)
+        return histogram
+
+    def update(self, data: bytes) -> None:
+        """
+        Добавляет к счётчикам частоты байтов очередного блока.
+
+        :param data: блок байтовых данных (bytes, bytearray или memoryview)
+        """
+        if not data:
+            return
+        if self.backend == 'numpy':
+            counts = np.frombuffer(self.counts, dtype=np.int64)
+            counts += np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=HISTOGRAM_SIZE)
+            return
+        counts = self.counts
+        view = memoryview(data)
+        for block_start in range(0, len(view), COUNT_BLOCK_SIZE):
+            block = bytes(view[block_start:block_start + COUNT_BLOCK_SIZE])
+            symbols = bytes(byte for byte in range(HISTOGRAM_SIZE) if counts[byte])
+            if len(symbols) > SMALL_ALPHABET_SIZE:
+                # Большой алфавит: дальше считает Counter
+                for byte, count in Counter(view[block_start:]).items():
+                    counts[byte] += count
+                return
+            # Маленький алфавит: по одному проходу bytes.count на уже встреченный символ,
+            # новые символы ищутся только среди байтов, оставшихся после их удаления
+            for byte in symbols:
+                counts[byte] += block.count(byte)
+            for byte, count in Counter(block.translate(None, symbols)).items():
+                counts[byte] += count
+
+    def merge(self, other: 'ByteHistogram') -> None:
+        """
+        Добавляет к счётчикам частоты другой гистограммы, например посчитанной
+        в процессе-исполнителе по своей части данных.
+
+        :param other: частичная гистограмма
+        """
+        self.counts = array(COUNTER_TYPECODE, map(int.__add__, self.counts, other.counts))
+
+    @property
+    def total(self) -> int:
+        """
+        Возвращает количество учтённых байтов.
+        """
+        return sum(self.counts)
+
+    def __getitem__(self, byte: int) -> int:
+        count = self.counts[byte] if 0 <= byte < HISTOGRAM_SIZE else 0
+        if not count:
+            raise KeyError(byte)
+        return count
+
+    def __contains__(self, byte: object) -> bool:
+        return isinstance(byte, int) and 0 <= byte < HISTOGRAM_SIZE and self.counts[byte] != 0
+
+    def __iter__(self) -> Iterator[int]:
+        return (byte for byte, count in enumerate(self.counts) if count)
+
+    def __len__(self) -> int:
+        return HISTOGRAM_SIZE - self.counts.count(0)
+
+    def __bool__(self) -> bool:
+        return any(self.counts)
@@ -0,0 +1,301 @@
+import os
+import struct
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple, Union
+
+from codeTable import CodeTable
+from fileHandler import FileHandler, is_safe_name
+from numpyBackend import NumpyTableDecoder, make_table_decoder
+from tableDecoder import TableDecoder
+
+DICTIONARY_MAGIC = b'SFD'
+DICTIONARY_FORMAT_VERSION = 1
+DICTIONARY_EXTENSION = '.sfd'
+DEFAULT_CACHE_SIZE = 16
+# Ссылка на словарь вместо кодовой таблицы: сигнатура, версия, контрольная сумма таблицы; затем имя словаря
+DICTIONARY_REFERENCE = struct.Struct('<3sBI')
+
+
+class LRUCache:
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        """
+        Кэш с вытеснением давно не использованных записей. Безопасен для вызова из нескольких
+        потоков и считает попадания, промахи и вытеснения.
+
+        :param max_size: максимальное количество записей
+        """
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._items: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Возвращает значение по ключу и отмечает запись как недавно использованную.
+
+        :param key: ключ записи
+        :return: значение или None, если записи нет
+        """
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Добавляет запись, вытесняя самые старые при превышении размера.
+
+        :param key: ключ записи
+        :param value: значение
+        """
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            self._evict()
+
+    def resize(self, max_size: int) -> None:
+        """
+        Меняет максимальный размер кэша, вытесняя лишние записи.
+
+        :param max_size: максимальное количество записей
+        """
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Удаляет самые старые записи сверх максимального размера; вызывается под блокировкой.
+        """
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Очищает кэш; счётчики сохраняются.
+        """
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает размер кэша и счётчики попаданий, промахов и вытеснений.
+
+        :return: словарь со счётчиками
+        """
+        with self._lock:
+            return {'size': len(self._items), 'max_size': self.max_size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# Загруженные словари и построенные по ним таблицы декодирования живут в процессе между вызовами
+dictionary_cache = LRUCache()
+decoder_cache = LRUCache()
+# Таблицы декодирования по сериализованной кодовой таблице из заголовка файла
+table_decoder_cache = LRUCache()
+
+
+def set_cache_size(max_size: int) -> None:
+    """
+    Меняет размер кэшей словарей и таблиц декодирования.
+
+    :param max_size: максимальное количество записей в каждом кэше
+    """
+    dictionary_cache.resize(max_size)
+    decoder_cache.resize(max_size)
+    table_decoder_cache.resize(max_size)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Возвращает счётчики кэшей процесса.
+
+    :return: словарь {имя кэша: счётчики LRUCache.stats}
+    """
+    return {'dictionaries': dictionary_cache.stats(), 'dictionary_decoders': decoder_cache.stats(),
+            'table_decoders': table_decoder_cache.stats()}
+
+
+def is_dictionary_reference(codes_serialized: bytes) -> bool:
+    """
+    Проверяет, записана ли в заголовке ссылка на словарь вместо кодовой таблицы.
+
+    :param codes_serialized: содержимое поля кодовой таблицы заголовка
+    :return: True для ссылки на словарь
+    """
+    return codes_serialized[:len(DICTIONARY_MAGIC)] == DICTIONARY_MAGIC
+
+
+def is_valid_name(name: str) -> bool:
+    """
+    Проверяет, что имя словаря — имя файла в каталоге словарей, а не путь за его пределы.
+
+    :param name: имя словаря
+    :return: True, если имя не содержит разделителей каталогов, '..' и имени диска
+    """
+    # os.path.splitdrive в is_safe_name распознаёт имя диска только в Windows, поэтому ':' проверяется отдельно
+    return is_safe_name(name) and '/' not in name and ':' not in name
+
+
+def parse_reference(reference: bytes) -> Tuple[str, int]:
+    """
+    Разбирает ссылку на словарь.
+
+    :param reference: ссылка из заголовка закодированного файла
+    :return: кортеж из имени словаря и контрольной суммы его таблицы
+    :raises ValueError: если ссылка повреждена или имя словаря ведёт за пределы каталога словарей
+    """
+    if len(reference) < DICTIONARY_REFERENCE.size:
+        raise ValueError("Ссылка на словарь повреждена.")
+    _, version, checksum = DICTIONARY_REFERENCE.unpack_from(reference)
+    if version != DICTIONARY_FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия ссылки на словарь: {version}.")
+    name = reference[DICTIONARY_REFERENCE.size:].decode('utf-8')
+    # Имя читается из заголовка закодированного файла и становится частью пути
+    if not is_valid_name(name):
+        raise ValueError(f"Недопустимое имя словаря: '{name}'.")
+    return name, checksum
+
+
+class CodeDictionary:
+    def __init__(self, name: str, code_table: CodeTable) -> None:
+        """
+        Именованная кодовая таблица, общая для многих файлов. В закодированный файл
+        вместо таблицы записывается только ссылка: имя словаря и контрольная сумма таблицы.
+
+        :param name: имя словаря (имя файла без расширения .sfd)
+        :param code_table: кодовая таблица, покрывающая все кодируемые байты
+        """
+        self.name: str = name
+        self.code_table: CodeTable = code_table
+        self.serialized: bytes = code_table.serialize()
+        self.checksum: int = zlib.crc32(self.serialized)
+        self._covered_bytes: bytes = bytes(sorted(code_table.codes))
+
+    @staticmethod
+    def train(name: str, samples: Iterable[bytes]) -> 'CodeDictionary':
+        """
+        Обучает словарь на образцах данных.
+
+        :param name: имя словаря
+        :param samples: итератор по образцам данных
+        :return: экземпляр CodeDictionary
+        """
+        code_table = CodeTable()
+        code_table.train(samples)
+        return CodeDictionary(name, code_table)
+
+    @staticmethod
+    def get_path(directory: str, name: str) -> str:
+        """
+        Возвращает путь к файлу словаря.
+
+        :param directory: каталог словарей
+        :param name: имя словаря
+        :return: путь к файлу словаря
+        """
+        return os.path.join(directory, name + DICTIONARY_EXTENSION)
+
+    def save(self, directory: str) -> Optional[str]:
+        """
+        Сохраняет таблицу словаря в каталог словарей.
+
+        :param directory: каталог словарей
+        :return: путь к файлу словаря или None в случае ошибки
+        """
+        if not is_valid_name(self.name):
+            logging.error(f"Недопустимое имя словаря: '{self.name}'.")
+            return None
+        path = self.get_path(directory, self.name)
+        if not FileHandler.write_file(path, self.serialized):
+            return None
+        return path
+
+    @staticmethod
+    def load(directory: str, name: str) -> Optional['CodeDictionary']:
+        """
+        Загружает словарь, используя кэш; изменённый на диске файл загружается заново.
+
+        :param directory: каталог словарей
+        :param name: имя словаря
+        :return: экземпляр CodeDictionary или None в случае ошибки
+        """
+        if not is_valid_name(name):
+            logging.error(f"Недопустимое имя словаря: '{name}'.")
+            return None
+        path = CodeDictionary.get_path(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            logging.error(f"Словарь '{name}' не найден в каталоге '{directory}'.")
+            return None
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        dictionary = dictionary_cache.get(key)
+        if dictionary is not None:
+            return dictionary
+
+        serialized = FileHandler(path).read_file()
+        if serialized is None:
+            return None
+        try:
+            dictionary = CodeDictionary(name, CodeTable.deserialize(serialized))
+        except (ValueError, IndexError) as e:
+            logging.error(f"Не удалось загрузить словарь '{name}': {e}")
+            return None
+        dictionary_cache.put(key, dictionary)
+        return dictionary
+
+    def reference(self) -> bytes:
+        """
+        Возвращает ссылку на словарь для записи в заголовок вместо кодовой таблицы.
+
+        :return: байтовая строка ссылки
+        """
+        return DICTIONARY_REFERENCE.pack(DICTIONARY_MAGIC, DICTIONARY_FORMAT_VERSION, self.checksum) + \
+            self.name.encode('utf-8')
+
+    def covers(self, frequencies: Dict[int, int]) -> bool:
+        """
+        Проверяет, что для всех байтов данных в словаре есть код.
+
+        :param frequencies: словарь {байт: частота} кодируемых данных
+        :return: True, если все байты можно закодировать
+        """
+        return all(byte in self.code_table.codes for byte in frequencies)
+
+    def covers_data(self, data: bytes) -> bool:
+        """
+        Проверяет покрытие блока данных без подсчёта частот: после удаления всех байтов,
+        для которых в словаре есть код, блок должен оказаться пустым.
+
+        :param data: блок кодируемых данных
+        :return: True, если все байты блока можно закодировать
+        """
+        return not bytes(data).translate(None, self._covered_bytes)
+
+    def table_decoder(self, backend: str) -> Union[TableDecoder, NumpyTableDecoder]:
+        """
+        Возвращает таблицу декодирования словаря, построенную один раз на процесс.
+
+        :param backend: фактический движок, 'python' или 'numpy'
+        :return: экземпляр TableDecoder или NumpyTableDecoder
+        """
+        key = (self.name, self.checksum, backend)
+        table_decoder = decoder_cache.get(key)
+        if table_decoder is None:
+            table_decoder = make_table_decoder(self.code_table.codes, backend)
+            decoder_cache.put(key, table_decoder)
+        return table_decoder
@@ -1,67 +1,293 @@
-from collections import Counter
-import pickle
-from typing import List, Tuple, Dict
+from bisect import bisect_left
+import io
+import math
+from typing import Iterable, List, Tuple, Dict, Optional
+
+from byteHistogram import ByteHistogram
+
+TABLE_MAGIC = b'SFT'
+TABLE_FORMAT_VERSION = 1
+LEGACY_TABLE_FORMAT = 0
+# Флаги компактного формата: символы списком вместо битовой карты, длины по 4 бита
+FLAG_SYMBOL_LIST = 0x01
+FLAG_NIBBLE_LENGTHS = 0x02
+BITMAP_SIZE = 32
+# Первый байт таблицы старого формата (pickle.PROTO): сам pickle загружается только для таких таблиц
+PICKLE_PROTO = b'\x80'
+# Опкоды, которыми pickle протоколов 0-5 записывает словарь {int: str}; прочие в старой таблице не встречаются
+LEGACY_TABLE_OPCODES = frozenset({
+    'PROTO', 'FRAME', 'STOP', 'MARK', 'EMPTY_DICT', 'DICT', 'SETITEM', 'SETITEMS',
+    'INT', 'BININT', 'BININT1', 'BININT2', 'UNICODE', 'BINUNICODE', 'SHORT_BINUNICODE',
+    'PUT', 'BINPUT', 'LONG_BINPUT', 'MEMOIZE', 'GET', 'BINGET', 'LONG_BINGET',
+})
 
 
 class CodeTable:
     def __init__(self):
         self.codes: Dict[int, str] = {}
+        self.frequencies: Dict[int, int] = {}
 
-    def build(self, data: bytes) -> None:
+    def build(self, data: bytes, backend: str = 'auto') -> None:
         """
         Строит кодовую таблицу Шеннона-Фано на основе входных данных.
 
         :param data: байтовые данные, для которых необходимо построить кодовую таблицу
+        :param backend: движок подсчёта частот, 'auto', 'python' или 'numpy'
+        """
+        self.build_from_frequencies(ByteHistogram.from_data(data, backend))
+
+    def train(self, samples: Iterable[bytes]) -> None:
+        """
+        Строит кодовую таблицу по суммарным частотам образцов. Каждому из 256 байтов
+        добавляется единичная частота, чтобы таблица могла кодировать любые данные.
+
+        :param samples: итератор по образцам данных
+        """
+        frequencies = ByteHistogram(initial=1)
+        for sample in samples:
+            frequencies.update(sample)
+        self.build_from_frequencies(frequencies)
+
+    def build_from_frequencies(self, frequencies: Dict[int, int]) -> None:
         """
-        freq_counter = Counter(data)
-        symbols: List[Tuple[int, int]] = list(freq_counter.items())
-        self.encode_symbols(symbols, self.codes)
+        Строит кодовую таблицу Шеннона-Фано по заранее подсчитанным частотам байтов.
 
-    def encode_symbols(
-            self,
-            symbols: List[Tuple[int, int]],
-            codes: Dict[int, str],
-            prefix: str = ''
-    ) -> None:
+        :param frequencies: словарь {байт: частота} или ByteHistogram
         """
-        Кодирует байты из файла рекурсивным вызовом с помощью алгоритма Shannon-Fano.
+        self.frequencies = dict(frequencies)
+        symbols: List[Tuple[int, int]] = sorted(self.frequencies.items(), key=lambda item: (-item[1], item[0]))
+        self.codes = self.canonical_codes(self.code_lengths(symbols))
 
-        :param symbols: список кортежей (байт, частота)
-        :param codes: словарь для хранения кодов
-        :param prefix: текущий префикс для кодов
+    def canonicalize(self) -> None:
+        """
+        Заменяет коды каноническими кодами тех же длин, чтобы таблицу можно было
+        сохранить одними длинами кодов.
+        """
+        self.codes = self.canonical_codes({byte: len(code) for byte, code in self.codes.items()})
+
+    @staticmethod
+    def canonical_codes(lengths: Dict[int, int]) -> Dict[int, str]:
+        """
+        Назначает канонические коды по длинам: символы упорядочиваются по (длина, байт),
+        каждый следующий код на единицу больше предыдущего с дополнением нулями до своей длины.
+
+        :param lengths: словарь {байт: длина кода}
+        :return: словарь кодов {байт: строка из '0' и '1'}
+        """
+        codes: Dict[int, str] = {}
+        code = 0
+        previous_length = 0
+        for byte, length in sorted(lengths.items(), key=lambda item: (item[1], item[0])):
+            code <<= length - previous_length
+            if code >> length:
+                raise ValueError("Длины кодов не образуют префиксный код.")
+            codes[byte] = format(code, f'0{length}b')
+            code += 1
+            previous_length = length
+        return codes
+
+    def encoded_bit_length(self, frequencies: Optional[Dict[int, int]] = None) -> int:
+        """
+        Вычисляет длину закодированных данных в битах по частотам.
+
+        :param frequencies: словарь {байт: частота} кодируемых данных (None — частоты, собранные в build)
+        :return: количество бит закодированных данных
+        """
+        if frequencies is None:
+            frequencies = self.frequencies
+        return sum(freq * len(self.codes[byte]) for byte, freq in frequencies.items())
+
+    @staticmethod
+    def code_lengths(symbols: List[Tuple[int, int]]) -> Dict[int, int]:
+        """
+        Вычисляет длины кодов Шеннона-Фано. Каждый участок списка делится там, где суммы
+        частот двух половин отличаются меньше всего; граница ищется двоичным поиском по
+        префиксным суммам, поэтому частоты не пересчитываются на каждом уровне.
+
+        :param symbols: список кортежей (байт, частота), упорядоченный по убыванию частоты
+        :return: словарь {байт: длина кода}
         """
         if len(symbols) == 1:
-            symbol = symbols[0][0]
-            codes[symbol] = prefix or '0'
-            return
-        total = sum(freq for _, freq in symbols)
-        acc = 0
-        split_index = 0
-        for i, (_, freq) in enumerate(symbols):
-            acc += freq
-            if acc >= total / 2:
-                split_index = i + 1
-                break
-        self.encode_symbols(symbols[:split_index], codes, prefix + '0')
-        self.encode_symbols(symbols[split_index:], codes, prefix + '1')
+            return {symbols[0][0]: 1}
+        prefix_sums = [0]
+        for _, freq in symbols:
+            prefix_sums.append(prefix_sums[-1] + freq)
+
+        lengths: Dict[int, int] = {}
+        stack = [(0, len(symbols), 0)]
+        while stack:
+            low, high, depth = stack.pop()
+            if high - low == 1:
+                lengths[symbols[low][0]] = depth
+                continue
+            # Первая граница, левее которой набирается не меньше половины суммы участка
+            target = prefix_sums[low] + (prefix_sums[high] - prefix_sums[low]) / 2
+            split = min(max(bisect_left(prefix_sums, target, low + 1, high), low + 1), high - 1)
+            if split > low + 1 and \
+                    target - prefix_sums[split - 1] <= prefix_sums[split] - target:
+                split -= 1
+            stack.append((low, split, depth + 1))
+            stack.append((split, high, depth + 1))
+        return lengths
+
+    def average_code_length(self) -> float:
+        """
+        Вычисляет среднюю длину кода по частотам, собранным в build.
+
+        :return: ожидаемое количество бит на символ
+        """
+        total = sum(self.frequencies.values())
+        return self.encoded_bit_length() / total if total else 0.0
+
+    def entropy(self) -> float:
+        """
+        Вычисляет энтропию распределения байтов — нижнюю границу средней длины кода.
+
+        :return: энтропия в битах на символ
+        """
+        total = sum(self.frequencies.values())
+        return -sum(freq / total * math.log2(freq / total) for freq in self.frequencies.values() if freq) \
+            if total else 0.0
 
     def serialize(self) -> bytes:
         """
-        Сериализует кодовую таблицу для сохранения в файл.
+        Сериализует кодовую таблицу в компактный формат: сигнатура, версия, флаги,
+        набор символов (битовая карта или список) и длины кодов в порядке возрастания байтов.
 
         :return: байтовая строка сериализованной кодовой таблицы
         """
-        return pickle.dumps(self.codes)
+        symbols = sorted(self.codes)
+        lengths = [len(self.codes[byte]) for byte in symbols]
+        flags = 0
+
+        if len(symbols) < BITMAP_SIZE:
+            flags |= FLAG_SYMBOL_LIST
+            presence = bytes([len(symbols) - 1]) + bytes(symbols)
+        else:
+            bitmap = bytearray(BITMAP_SIZE)
+            for byte in symbols:
+                bitmap[byte >> 3] |= 0x80 >> (byte & 7)
+            presence = bytes(bitmap)
+
+        if max(lengths) <= 15:
+            flags |= FLAG_NIBBLE_LENGTHS
+            lengths.append(0)
+            packed_lengths = bytes((lengths[i] << 4) | lengths[i + 1] for i in range(0, len(lengths) - 1, 2))
+        else:
+            packed_lengths = bytes(lengths)
+
+        return TABLE_MAGIC + bytes([TABLE_FORMAT_VERSION, flags]) + presence + packed_lengths
+
+    @staticmethod
+    def get_format_version(serialized_data: bytes) -> Optional[int]:
+        """
+        Определяет формат сериализованной кодовой таблицы.
+
+        :param serialized_data: байтовая строка сериализованной кодовой таблицы
+        :return: версия компактного формата, LEGACY_TABLE_FORMAT для таблицы pickle
+                 или None для неизвестного формата
+        """
+        if serialized_data[:len(TABLE_MAGIC)] == TABLE_MAGIC:
+            version = serialized_data[len(TABLE_MAGIC):len(TABLE_MAGIC) + 1]
+            return version[0] if version == bytes([TABLE_FORMAT_VERSION]) else None
+        if serialized_data[:1] == PICKLE_PROTO:
+            return LEGACY_TABLE_FORMAT
+        return None
 
     @staticmethod
     def deserialize(serialized_data: bytes) -> 'CodeTable':
         """
-        Десериализует кодовую таблицу из байтовой строки.
+        Десериализует кодовую таблицу из байтовой строки; таблицы старого формата pickle
+        загружаются без возможности создания произвольных объектов.
 
         :param serialized_data: байтовая строка сериализованной кодовой таблицы
         :return: экземпляр класса CodeTable с восстановленной кодовой таблицей
+        :raises ValueError: если формат неизвестен или таблица повреждена
         """
-        codes = pickle.loads(serialized_data)
+        version = CodeTable.get_format_version(serialized_data)
+        if version is None:
+            raise ValueError("Неизвестный формат кодовой таблицы.")
         code_table = CodeTable()
-        code_table.codes = codes
+        if version == LEGACY_TABLE_FORMAT:
+            code_table.codes = CodeTable._load_legacy_codes(serialized_data)
+        else:
+            code_table.codes = CodeTable.canonical_codes(CodeTable._load_lengths(serialized_data))
         return code_table
+
+    @staticmethod
+    def _load_lengths(serialized_data: bytes) -> Dict[int, int]:
+        """
+        Читает длины кодов из компактного формата.
+
+        :param serialized_data: байтовая строка сериализованной кодовой таблицы
+        :return: словарь {байт: длина кода}
+        :raises ValueError: если таблица обрезана или повреждена
+        """
+        position = len(TABLE_MAGIC) + 2
+        if len(serialized_data) <= position:
+            raise ValueError("Кодовая таблица повреждена.")
+        flags = serialized_data[position - 1]
+
+        if flags & FLAG_SYMBOL_LIST:
+            count = serialized_data[position] + 1
+            symbols = list(serialized_data[position + 1:position + 1 + count])
+            if len(symbols) < count:
+                raise ValueError("Кодовая таблица повреждена.")
+            position += 1 + count
+        else:
+            bitmap = serialized_data[position:position + BITMAP_SIZE]
+            if len(bitmap) < BITMAP_SIZE:
+                raise ValueError("Кодовая таблица повреждена.")
+            symbols = [byte for byte in range(256) if bitmap[byte >> 3] & (0x80 >> (byte & 7))]
+            position += BITMAP_SIZE
+
+        if flags & FLAG_NIBBLE_LENGTHS:
+            packed_lengths = serialized_data[position:position + (len(symbols) + 1) // 2]
+            lengths = [length for pair in packed_lengths for length in (pair >> 4, pair & 0x0F)]
+        else:
+            lengths = list(serialized_data[position:position + len(symbols)])
+
+        if len(lengths) < len(symbols) or not symbols or 0 in lengths[:len(symbols)]:
+            raise ValueError("Кодовая таблица повреждена.")
+        return dict(zip(symbols, lengths))
+
+    @staticmethod
+    def _load_legacy_codes(serialized_data: bytes) -> Dict[int, str]:
+        """
+        Загружает кодовую таблицу старого формата pickle. Модуль pickle импортируется
+        здесь, чтобы не замедлять запуск для файлов в компактном формате.
+
+        :param serialized_data: байтовая строка сериализованной кодовой таблицы
+        :return: словарь кодов {байт: строка из '0' и '1'}
+        """
+        import pickle
+        import pickletools
+
+        class LegacyTableUnpickler(pickle.Unpickler):
+            def find_class(self, module: str, name: str):
+                """
+                Запрещает загрузку любых классов: старая таблица — это словарь из int и str,
+                для которого find_class не нужен.
+                """
+                raise pickle.UnpicklingError(f"Недопустимый объект в кодовой таблице: {module}.{name}")
+
+        # Повреждённые данные pickle приводят не только к UnpicklingError: опкоды с неверными
+        # аргументами вызывают ValueError, TypeError, KeyError и другие исключения, а длины и номера
+        # ячеек памяти из повреждённых данных заставляют выделять память до чтения. Поэтому опкоды
+        # сначала проверяются без выполнения: допустимы только опкоды словаря, а номер ячейки памяти
+        # не может превышать количество опкодов, которое меньше длины данных
+        try:
+            for opcode, argument, _ in pickletools.genops(serialized_data):
+                if opcode.name not in LEGACY_TABLE_OPCODES or \
+                        opcode.name.endswith(('PUT', 'GET')) and not 0 <= argument < len(serialized_data):
+                    raise pickle.UnpicklingError(f"недопустимый опкод {opcode.name}")
+            codes = LegacyTableUnpickler(io.BytesIO(serialized_data)).load()
+        except (pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, IndexError, KeyError,
+                OverflowError, RecursionError) as e:
+            raise ValueError(f"Кодовая таблица повреждена: {e}") from e
+        # bool — подкласс int, поэтому тип ключа сравнивается точно
+        if type(codes) is not dict or not all(
+                type(byte) is int and 0 <= byte < 256 and type(code) is str and code and not code.strip('01')
+                for byte, code in codes.items()):
+            raise ValueError("Кодовая таблица повреждена.")
+        return codes
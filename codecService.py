@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterable, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+from codeDictionary import CodeDictionary
+from fileHandler import DEFAULT_BUFFER_SIZE
+from memoryCodec import StreamDecoder, decode_bytes, encode_bytes
+from numpyBackend import resolve_backend
+
+DEFAULT_LATENCY_WINDOW = 1024
+# encode_stream накапливает поток в памяти целиком
+DEFAULT_MAX_PAYLOAD = 256 << 20
+
+
+class ServiceOverloadedError(RuntimeError):
+    """
+    Очередь сервиса заполнена; вызывающий код может ответить клиенту отказом и повторить позже.
+    """
+
+
+class ServiceMetrics:
+    def __init__(self, window: int = DEFAULT_LATENCY_WINDOW) -> None:
+        """
+        Счётчики сервиса и задержки последних window вызовов.
+
+        :param window: количество последних вызовов, по которым считаются задержки
+        """
+        self.submitted: int = 0
+        self.completed: int = 0
+        self.failed: int = 0
+        self.rejected: int = 0
+        self.queued: int = 0
+        self.running: int = 0
+        self.max_queued: int = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.wait_times: Deque[float] = deque(maxlen=window)
+
+    def latency_percentile(self, percentile: float) -> float:
+        """
+        Возвращает перцентиль полной задержки вызова (ожидание в очереди и обработка).
+
+        :param percentile: перцентиль от 0 до 100
+        :return: задержка в секундах или 0.0, если вызовов ещё не было
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Возвращает текущие значения метрик, например для экспорта в систему мониторинга.
+
+        :return: словарь {имя метрики: значение}
+        """
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'queued': self.queued,
+            'running': self.running,
+            'max_queued': self.max_queued,
+            'latency_p50': self.latency_percentile(50),
+            'latency_p99': self.latency_percentile(99),
+            'wait_mean': sum(self.wait_times) / len(self.wait_times) if self.wait_times else 0.0,
+        }
+
+
+class CodecService:
+    def __init__(self, max_workers: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 max_queue: Optional[int] = None, backend: str = 'auto',
+                 dictionary: Optional[CodeDictionary] = None, dictionary_dir: str = '.',
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, executor: Optional[Executor] = None,
+                 max_payload: Optional[int] = DEFAULT_MAX_PAYLOAD) -> None:
+        """
+        Асинхронный интерфейс кодирования и декодирования данных в памяти для сервисов на asyncio.
+        Кодирование выполняется в пуле процессов, не блокируя цикл событий. Одновременно
+        в пуле не больше max_concurrency вызовов, остальные ждут своей очереди (backpressure);
+        если ждущих больше max_queue, новый вызов сразу отклоняется. Потоковое декодирование
+        обрабатывает поток по блокам; потоковое кодирование накапливает поток целиком,
+        поэтому его размер ограничен max_payload.
+
+        :param max_workers: количество процессов пула (None — по числу процессоров)
+        :param max_concurrency: количество одновременно выполняемых вызовов (None — по числу процессов)
+        :param max_queue: максимальное количество ждущих вызовов (None — без ограничения)
+        :param backend: движок кодирования, 'auto', 'python' или 'numpy'
+        :param dictionary: словарь для кодирования
+        :param dictionary_dir: каталог словарей для декодирования
+        :param buffer_size: размер блоков, которыми отдаются результаты потоковых вызовов
+        :param executor: готовый пул исполнителей; сервис не закрывает переданный пул
+        :param max_payload: наибольший размер потока для encode_stream в байтах (None — без ограничения)
+        """
+        self.max_workers: int = max_workers or os.cpu_count() or 1
+        self.max_concurrency: int = max_concurrency or self.max_workers
+        self.max_queue: Optional[int] = max_queue
+        self.backend: str = resolve_backend(backend)
+        self.dictionary: Optional[CodeDictionary] = dictionary
+        self.dictionary_dir: str = dictionary_dir
+        self.buffer_size: int = buffer_size
+        self.max_payload: Optional[int] = max_payload
+        self.metrics: ServiceMetrics = ServiceMetrics()
+        self._owns_executor: bool = executor is None
+        self.executor: Executor = executor or ProcessPoolExecutor(max_workers=self.max_workers)
+        self._slots: asyncio.Semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def encode(self, data: bytes, extension: str = '') -> Optional[bytes]:
+        """
+        Кодирует данные.
+
+        :param data: исходные данные
+        :param extension: расширение, записываемое в заголовок
+        :return: закодированные данные или None в случае ошибки
+        """
+        return await self._run(encode_bytes, bytes(data), self.backend, extension, self.dictionary)
+
+    async def decode(self, encoded: bytes) -> Optional[bytes]:
+        """
+        Декодирует данные.
+
+        :param encoded: закодированные данные вместе с заголовком
+        :return: декодированные данные или None в случае ошибки
+        """
+        return await self._run(decode_bytes, bytes(encoded), self.backend, self.dictionary_dir)
+
+    async def encode_stream(self, chunks: AsyncIterable[bytes], extension: str = '') -> AsyncIterator[bytes]:
+        """
+        Кодирует поток и отдаёт результат блоками по buffer_size байт. Кодовая таблица
+        строится по всему потоку, а количество дополнительных битов последнего байта
+        записывается в заголовок перед данными, поэтому поток сначала читается целиком
+        и память растёт с его размером: поток длиннее max_payload отклоняется.
+
+        :param chunks: асинхронный итератор по блокам исходных данных
+        :param extension: расширение, записываемое в заголовок
+        :return: асинхронный итератор по блокам закодированных данных
+        :raises ValueError: если поток длиннее max_payload или кодирование не удалось
+        """
+        encoded = await self.encode(await self._gather(chunks, self.max_payload), extension)
+        if encoded is None:
+            raise ValueError("Не удалось закодировать поток.")
+        for chunk in self._split(encoded):
+            yield chunk
+
+    async def decode_stream(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+        """
+        Декодирует поток по мере поступления блоков и отдаёт результат блоками не больше
+        buffer_size байт. Каждый блок декодируется отдельным вызовом с общим ограничением
+        max_concurrency в пуле потоков цикла событий: состояние декодера остаётся в процессе.
+        CRC32 сверяется в конце потока, после отдачи всех данных; поток с индексом
+        точек синхронизации декодируется только целиком через decode.
+
+        :param chunks: асинхронный итератор по блокам закодированных данных
+        :return: асинхронный итератор по блокам декодированных данных
+        :raises ValueError: если поток повреждён; уже отданные данные нужно отбросить
+        """
+        stream_decoder = StreamDecoder(self.backend, self.dictionary_dir)
+        async for chunk in chunks:
+            for decoded in self._split(await self._run(stream_decoder.feed, bytes(chunk), in_process=True)):
+                yield decoded
+        for decoded in self._split(await self._run(stream_decoder.finish, in_process=True)):
+            yield decoded
+
+    async def close(self) -> None:
+        """
+        Дожидается завершения выполняемых вызовов и закрывает собственный пул процессов.
+        """
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+    async def __aenter__(self) -> 'CodecService':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _run(self, function: Callable, *args, in_process: bool = False) -> Optional[bytes]:
+        """
+        Выполняет функцию в пуле, ограничивая число одновременных вызовов и длину очереди.
+
+        :param function: функция уровня модуля или, для пула потоков, метод объекта с состоянием
+        :param args: аргументы функции
+        :param in_process: выполнить в пуле потоков цикла событий, а не в пуле сервиса
+        :return: результат функции
+        """
+        executor = None if in_process else self.executor
+        metrics = self.metrics
+        if self.max_queue is not None and self._slots.locked() and metrics.queued >= self.max_queue:
+            metrics.rejected += 1
+            raise ServiceOverloadedError(f"Очередь сервиса заполнена: {metrics.queued} вызовов ожидают.")
+
+        metrics.submitted += 1
+        start_time = time.perf_counter()
+        metrics.queued += 1
+        metrics.max_queued = max(metrics.max_queued, metrics.queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            metrics.queued -= 1
+        metrics.wait_times.append(time.perf_counter() - start_time)
+
+        metrics.running += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(executor, partial(function, *args))
+        except Exception as e:
+            metrics.failed += 1
+            logging.exception(f"Ошибка при выполнении {function.__name__}: {e}")
+            raise
+        finally:
+            metrics.running -= 1
+            self._slots.release()
+            metrics.latencies.append(time.perf_counter() - start_time)
+
+        if result is None:
+            metrics.failed += 1
+        else:
+            metrics.completed += 1
+        return result
+
+    @staticmethod
+    async def _gather(chunks: AsyncIterable[bytes], max_size: Optional[int] = None) -> bytes:
+        """
+        Собирает асинхронный поток в одну байтовую строку.
+
+        :param chunks: асинхронный итератор по блокам данных
+        :param max_size: наибольший размер потока в байтах (None — без ограничения)
+        :return: данные потока
+        :raises ValueError: если поток длиннее max_size
+        """
+        data = bytearray()
+        async for chunk in chunks:
+            data += chunk
+            if max_size is not None and len(data) > max_size:
+                raise ValueError(f"Поток длиннее {max_size} байт.")
+        return bytes(data)
+
+    def _split(self, data: bytes) -> Iterator[bytes]:
+        """
+        Делит результат на блоки по buffer_size байт.
+
+        :param data: данные
+        :return: итератор по блокам
+        """
+        return (data[position:position + self.buffer_size] for position in range(0, len(data), self.buffer_size))
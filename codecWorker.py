@@ -0,0 +1,168 @@
+import io
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+from typing import Any, Dict, Iterable, Optional, TextIO
+
+from batch import COMMAND_FUNCTIONS, BatchOptions, process_file
+from codeDictionary import cache_stats
+
+# Служебные команды исполнителя, не обрабатывающие файлов
+PING_COMMAND = 'ping'
+SHUTDOWN_COMMAND = 'shutdown'
+
+
+def handle_job(job: Dict[str, Any], options: BatchOptions) -> Dict[str, Any]:
+    """
+    Выполняет одно задание исполнителя. Задание — объект JSON с полями command ('encode',
+    'decode', 'verify', 'ping' или 'shutdown'), path, необязательным id, который возвращается
+    в ответе, и необязательным options — параметрами BatchOptions, заменяющими параметры исполнителя.
+
+    :param job: задание
+    :param options: параметры пакетной обработки, с которыми запущен исполнитель
+    :return: ответ: id, command и поля FileResult либо ok=False и описание ошибки в error;
+             на ping — также счётчики кэшей процесса
+    """
+    command = job.get('command')
+    response: Dict[str, Any] = {'id': job.get('id'), 'command': command}
+    if command in (PING_COMMAND, SHUTDOWN_COMMAND):
+        response.update(ok=True, pid=os.getpid())
+        if command == PING_COMMAND:
+            response['caches'] = cache_stats()
+        return response
+    if not isinstance(command, str) or command not in COMMAND_FUNCTIONS:
+        response.update(ok=False, error=f"Неизвестная команда '{command}'.")
+        return response
+    path = job.get('path')
+    if not isinstance(path, str):
+        response.update(ok=False, error="В задании не указан путь к файлу.")
+        return response
+    overrides = job.get('options') or {}
+    if not isinstance(overrides, dict):
+        response.update(ok=False, error="Параметры задания должны быть объектом JSON.")
+        return response
+    unknown = sorted(set(overrides) - set(BatchOptions._fields))
+    if unknown:
+        response.update(ok=False, error=f"Неизвестные параметры: {', '.join(unknown)}.")
+        return response
+
+    # Ошибка одного задания не должна завершать исполнитель, обслуживающий остальных клиентов
+    try:
+        response.update(process_file(command, path, options._replace(**overrides))._asdict())
+    except Exception as e:
+        logging.exception(f"Ошибка выполнения задания {job.get('id')!r}: {e}")
+        response.update(ok=False, error=f"{type(e).__name__}: {e}")
+    return response
+
+
+def serve_stream(reader: Iterable[str], writer: TextIO, options: BatchOptions) -> bool:
+    """
+    Читает задания построчно в формате JSON Lines и пишет ответ на каждое отдельной строкой
+    сразу после его выполнения.
+
+    :param reader: источник строк заданий, например sys.stdin
+    :param writer: текстовый поток ответов, например sys.stdout
+    :param options: параметры пакетной обработки по умолчанию
+    :return: True, если получена команда shutdown, False, если задания закончились
+    """
+    for line in reader:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("задание должно быть объектом JSON")
+        except ValueError as e:
+            job = {}
+            response: Dict[str, Any] = {'id': None, 'ok': False, 'error': f"Некорректное задание: {e}"}
+        else:
+            response = handle_job(job, options)
+        writer.write(json.dumps(response, ensure_ascii=False) + '\n')
+        writer.flush()
+        if job.get('command') == SHUTDOWN_COMMAND:
+            return True
+    return False
+
+
+def serve_socket(socket_path: str, options: BatchOptions) -> int:
+    """
+    Принимает задания через Unix-сокет. Соединения обслуживаются по очереди одним процессом,
+    поэтому загруженные модули, словари и таблицы декодирования используются всеми клиентами.
+
+    :param socket_path: путь к сокету
+    :param options: параметры пакетной обработки по умолчанию
+    :return: код завершения
+    """
+    import socketserver
+
+    server_class = getattr(socketserver, 'UnixStreamServer', None)
+    if server_class is None:
+        logging.error("Unix-сокеты не поддерживаются на этой платформе.")
+        return 1
+
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            reader = io.TextIOWrapper(self.rfile, encoding='utf-8')
+            writer = io.TextIOWrapper(self.wfile, encoding='utf-8')
+            try:
+                self.server.stopping = serve_stream(reader, writer, options)
+            finally:
+                reader.detach()
+                writer.detach()
+
+    try:
+        # Сокет мог остаться от аварийно завершившегося исполнителя
+        if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+    try:
+        server = server_class(socket_path, JobHandler)
+    except OSError as e:
+        logging.error(f"Не удалось открыть сокет '{socket_path}': {e}")
+        return 1
+
+    server.stopping = False
+    with server:
+        try:
+            while not server.stopping:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+    return 0
+
+
+def submit(socket_path: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Отправляет задание исполнителю, запущенному с сокетом, и ждёт ответа.
+
+    :param socket_path: путь к сокету исполнителя
+    :param job: задание (см. handle_job)
+    :return: ответ исполнителя
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        with connection.makefile('rw', encoding='utf-8') as stream:
+            stream.write(json.dumps(job, ensure_ascii=False) + '\n')
+            stream.flush()
+            return json.loads(stream.readline())
+
+
+def run_worker(options: BatchOptions, socket_path: Optional[str] = None) -> int:
+    """
+    Запускает постоянный исполнитель: интерпретатор и модули загружаются один раз,
+    после чего каждое задание стоит только собственно кодирования.
+
+    :param options: параметры пакетной обработки по умолчанию
+    :param socket_path: путь к Unix-сокету (None — задания читаются из stdin, ответы пишутся в stdout)
+    :return: код завершения
+    """
+    if socket_path is not None:
+        return serve_socket(socket_path, options)
+    serve_stream(sys.stdin, sys.stdout, options)
+    return 0
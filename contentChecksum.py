@@ -0,0 +1,86 @@
+import os
+import struct
+import zlib
+from typing import BinaryIO, Optional
+
+CHECKSUM_MAGIC = b'SFCK'
+# Окончание файла: исходная длина, длина закодированных данных, CRC32 исходных данных, сигнатура
+CHECKSUM_FOOTER = struct.Struct('<QQI4s')
+
+
+class ContentChecksum:
+    def __init__(self) -> None:
+        """
+        Длина и CRC32 исходных данных, накапливаемые блоками при кодировании или декодировании.
+        Записываются последними байтами закодированного файла, после индекса точек синхронизации.
+        """
+        self.original_length: int = 0
+        self.crc32: int = 0
+        self.payload_length: int = 0
+
+    def update(self, data: bytes) -> None:
+        """
+        Добавляет очередной блок исходных данных.
+
+        :param data: блок исходных данных
+        """
+        self.crc32 = zlib.crc32(data, self.crc32)
+        self.original_length += len(data)
+
+    def matches(self, other: 'ContentChecksum') -> bool:
+        """
+        Сравнивает длину и контрольную сумму с другой.
+
+        :param other: контрольная сумма, например записанная в файле
+        :return: True, если длина и CRC32 совпадают
+        """
+        return self.original_length == other.original_length and self.crc32 == other.crc32
+
+    def describe_mismatch(self, expected: 'ContentChecksum') -> str:
+        """
+        Описывает расхождение декодированных данных с записанной контрольной суммой.
+
+        :param expected: контрольная сумма, записанная в файле
+        :return: сообщение об ошибке со смещением, с которого данные расходятся
+        """
+        if self.original_length != expected.original_length:
+            return (f"Данные повреждены: декодировано {self.original_length} байт вместо {expected.original_length}, "
+                    f"расхождение начинается не позже смещения {min(self.original_length, expected.original_length)}.")
+        return (f"Данные повреждены: CRC32 {self.crc32:08x} декодированных {self.original_length} байт "
+                f"не совпадает с записанной {expected.crc32:08x}.")
+
+    def serialize(self, payload_length: int) -> bytes:
+        """
+        Сериализует окончание файла с контрольной суммой.
+
+        :param payload_length: длина закодированных данных в байтах
+        :return: байтовая строка окончания
+        """
+        return CHECKSUM_FOOTER.pack(self.original_length, payload_length, self.crc32, CHECKSUM_MAGIC)
+
+    @staticmethod
+    def read(file: BinaryIO, payload_offset: int) -> Optional['ContentChecksum']:
+        """
+        Читает контрольную сумму из конца закодированного файла. Она считается найденной,
+        если совпадает сигнатура; закодированные данные должны помещаться перед окончанием,
+        а точное совпадение длины с индексом точек синхронизации проверяет FileHandler.read_trailer.
+
+        :param file: файловый объект закодированного файла (с произвольным доступом, в том числе io.BytesIO)
+        :param payload_offset: смещение начала закодированных данных в файле
+        :return: экземпляр ContentChecksum или None, если контрольной суммы в файле нет
+        :raises ValueError: если сигнатура есть, но записанная длина данных не помещается в файл
+        """
+        file_size = file.seek(0, os.SEEK_END)
+        if file_size - payload_offset < CHECKSUM_FOOTER.size:
+            return None
+        file.seek(file_size - CHECKSUM_FOOTER.size)
+        original_length, payload_length, crc32, magic = CHECKSUM_FOOTER.unpack(file.read(CHECKSUM_FOOTER.size))
+        if magic != CHECKSUM_MAGIC:
+            return None
+        if payload_offset + payload_length + CHECKSUM_FOOTER.size > file_size:
+            raise ValueError("Файл поврежден: длина закодированных данных не совпадает с записанной в окончании.")
+        checksum = ContentChecksum()
+        checksum.original_length = original_length
+        checksum.crc32 = crc32
+        checksum.payload_length = payload_length
+        return checksum
@@ -0,0 +1,508 @@
+import struct
+import sys
+from array import array
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+from bitWriter import BLOCK_SYMBOLS, BitWriter
+from codeTable import CodeTable
+from numpyBackend import np, resolve_backend
+from tableDecoder import REFILL_BYTES
+
+CONTEXT_MAGIC = b'SFC'
+CONTEXT_FORMAT_VERSION = 1
+# Первый байт данных кодируется так, будто ему предшествует нулевой байт
+INITIAL_CONTEXT = 0
+CONTEXT_COUNT = 256
+PAIR_COUNT = CONTEXT_COUNT * CONTEXT_COUNT
+# Длина сериализованной таблицы перед её содержимым
+TABLE_LENGTH = struct.Struct('<H')
+BITMAP_SIZE = CONTEXT_COUNT // 8
+# Индексы пар строятся блоками, чтобы не копировать весь входной файл
+PAIR_BLOCK_SYMBOLS = 1 << 16
+# Каждая таблица декодирования занимает 2^k записей на каждый контекст со своей таблицей
+CONTEXT_WINDOW_BITS = 8
+
+
+def is_context_model(codes_serialized: bytes) -> bool:
+    """
+    Проверяет, записана ли в заголовке контекстная модель вместо кодовой таблицы.
+
+    :param codes_serialized: содержимое поля кодовой таблицы заголовка
+    :return: True для контекстной модели
+    """
+    return codes_serialized[:len(CONTEXT_MAGIC)] == CONTEXT_MAGIC
+
+
+def pair_indices(previous: int, data: bytes) -> array:
+    """
+    Вычисляет для каждого байта данных индекс пары (предыдущий байт << 8) | байт.
+
+    :param previous: байт, предшествующий данным
+    :param data: блок данных
+    :return: массив индексов пар той же длины, что и данные
+    """
+    count = len(data)
+    extended = bytes((previous,)) + bytes(data)
+    # Пары с чётным и нечётным началом читаются как 16-битные числа без цикла по байтам
+    even = array('H')
+    even.frombytes(extended[:2 * ((count + 1) // 2)])
+    odd = array('H')
+    odd.frombytes(extended[1:1 + 2 * (count // 2)])
+    indices = array('H', bytes(2 * count))
+    indices[0::2] = even
+    indices[1::2] = odd
+    if sys.byteorder == 'little':
+        indices.byteswap()
+    return indices
+
+
+class ContextModel:
+    def __init__(self, backend: str = 'auto') -> None:
+        """
+        Модель порядка 1: отдельная таблица Шеннона-Фано для каждого предыдущего байта (контекста).
+        Контексты, для которых своя таблица не окупает место в заголовке, кодируются общей таблицей.
+
+        :param backend: движок подсчёта пар, 'auto', 'python' или 'numpy'
+        """
+        self.backend: str = resolve_backend(backend)
+        self.pair_counts: array = array('q', [0]) * PAIR_COUNT
+        self.global_table: CodeTable = CodeTable()
+        self.context_tables: Dict[int, CodeTable] = {}
+        self._previous: int = INITIAL_CONTEXT
+
+    def update(self, data: bytes) -> None:
+        """
+        Добавляет к счётчикам пары байтов очередного блока; контекст переносится между блоками.
+
+        :param data: блок исходных данных
+        """
+        counts = self.pair_counts
+        view = memoryview(data)
+        for block_start in range(0, len(view), PAIR_BLOCK_SYMBOLS):
+            block = view[block_start:block_start + PAIR_BLOCK_SYMBOLS]
+            indices = pair_indices(self._previous, block)
+            self._previous = block[-1]
+            if self.backend == 'numpy':
+                np.frombuffer(counts, dtype=np.int64)[:] += np.bincount(
+                    np.frombuffer(indices, dtype=np.uint16), minlength=PAIR_COUNT)
+                continue
+            for index, count in Counter(indices).items():
+                counts[index] += count
+
+    def context_frequencies(self, context: int) -> Dict[int, int]:
+        """
+        Возвращает частоты байтов, следующих за байтом context.
+
+        :param context: предыдущий байт
+        :return: словарь {байт: частота}
+        """
+        row = self.pair_counts[context << 8:(context + 1) << 8]
+        return {byte: count for byte, count in enumerate(row) if count}
+
+    def build(self) -> None:
+        """
+        Строит общую таблицу по частотам всех байтов и собственные таблицы контекстов.
+        Контекст получает свою таблицу, только если она экономит больше бит, чем занимает в заголовке.
+        """
+        rows = [self.context_frequencies(context) for context in range(CONTEXT_COUNT)]
+        frequencies: Counter = Counter()
+        for row in rows:
+            frequencies.update(row)
+        self.global_table = CodeTable()
+        self.global_table.build_from_frequencies(frequencies)
+        global_codes = self.global_table.codes
+
+        self.context_tables = {}
+        for context, row in enumerate(rows):
+            if not row:
+                continue
+            table = CodeTable()
+            table.build_from_frequencies(row)
+            saved_bits = sum(count * len(global_codes[byte]) for byte, count in row.items()) - \
+                table.encoded_bit_length()
+            if saved_bits > 8 * (TABLE_LENGTH.size + len(table.serialize())):
+                self.context_tables[context] = table
+
+    def table_for(self, context: int) -> CodeTable:
+        """
+        Возвращает таблицу, которой кодируется байт после байта context.
+
+        :param context: предыдущий байт
+        :return: таблица контекста или общая таблица
+        """
+        return self.context_tables.get(context, self.global_table)
+
+    def encoded_bit_length(self) -> int:
+        """
+        Вычисляет длину закодированных данных в битах по подсчитанным парам.
+
+        :return: количество бит закодированных данных
+        """
+        return sum(self.table_for(context).encoded_bit_length(self.context_frequencies(context))
+                   for context in range(CONTEXT_COUNT))
+
+    def average_code_length(self) -> float:
+        """
+        Вычисляет среднюю длину кода модели.
+
+        :return: ожидаемое количество бит на символ
+        """
+        total = sum(self.pair_counts)
+        return self.encoded_bit_length() / total if total else 0.0
+
+    def serialize(self) -> bytes:
+        """
+        Сериализует модель: сигнатура, версия, общая таблица, битовая карта контекстов
+        со своими таблицами и их таблицы в порядке возрастания контекста. Каждая таблица
+        записывается в компактном формате CodeTable с двухбайтовой длиной.
+
+        :return: байтовая строка сериализованной модели
+        """
+        bitmap = bytearray(BITMAP_SIZE)
+        tables = [self.global_table.serialize()]
+        for context in sorted(self.context_tables):
+            bitmap[context >> 3] |= 0x80 >> (context & 7)
+            tables.append(self.context_tables[context].serialize())
+        return CONTEXT_MAGIC + bytes([CONTEXT_FORMAT_VERSION]) + TABLE_LENGTH.pack(len(tables[0])) + tables[0] + \
+            bytes(bitmap) + b''.join(TABLE_LENGTH.pack(len(table)) + table for table in tables[1:])
+
+    @staticmethod
+    def deserialize(serialized_data: bytes) -> 'ContextModel':
+        """
+        Восстанавливает таблицы модели из байтовой строки.
+
+        :param serialized_data: байтовая строка сериализованной модели
+        :return: экземпляр ContextModel без счётчиков пар
+        """
+        if not is_context_model(serialized_data) or serialized_data[len(CONTEXT_MAGIC):len(CONTEXT_MAGIC) + 1] != \
+                bytes([CONTEXT_FORMAT_VERSION]):
+            raise ValueError("Неизвестный формат контекстной модели.")
+        position = len(CONTEXT_MAGIC) + 1
+
+        def read_table() -> CodeTable:
+            nonlocal position
+            length, = TABLE_LENGTH.unpack_from(serialized_data, position)
+            position += TABLE_LENGTH.size
+            table_data = serialized_data[position:position + length]
+            if len(table_data) < length:
+                raise ValueError("Контекстная модель повреждена.")
+            position += length
+            return CodeTable.deserialize(table_data)
+
+        model = ContextModel('python')
+        model.global_table = read_table()
+        bitmap = serialized_data[position:position + BITMAP_SIZE]
+        if len(bitmap) < BITMAP_SIZE:
+            raise ValueError("Контекстная модель повреждена.")
+        position += BITMAP_SIZE
+        for context in range(CONTEXT_COUNT):
+            if bitmap[context >> 3] & (0x80 >> (context & 7)):
+                model.context_tables[context] = read_table()
+        return model
+
+    def bit_writer(self) -> 'ContextBitWriter':
+        """
+        Создаёт упаковщик битов по таблицам модели.
+
+        :return: экземпляр ContextBitWriter
+        """
+        return ContextBitWriter(self)
+
+    def table_decoder(self) -> 'ContextTableDecoder':
+        """
+        Создаёт декодер по таблицам модели.
+
+        :return: экземпляр ContextTableDecoder
+        """
+        return ContextTableDecoder(self)
+
+
+class ContextBitWriter(BitWriter):
+    def __init__(self, model: ContextModel) -> None:
+        """
+        Упаковщик битов для контекстной модели. Коды всех таблиц сведены в одну таблицу
+        на 65536 пар (предыдущий байт, байт), поэтому на символ приходится один поиск, как в BitWriter.
+
+        :param model: контекстная модель с построенными таблицами
+        """
+        super().__init__(model.global_table.codes)
+        self.pair_codes: List[Tuple[int, int]] = []
+        for context in range(CONTEXT_COUNT):
+            row = [(0, 0)] * CONTEXT_COUNT
+            for byte, code in model.table_for(context).codes.items():
+                row[byte] = (int(code, 2), len(code))
+            self.pair_codes.extend(row)
+        self.coded_pairs: FrozenSet[int] = frozenset(index for index, (_, length) in enumerate(self.pair_codes) if length)
+        self._previous: int = INITIAL_CONTEXT
+
+    def covers_data(self, data: bytes) -> bool:
+        """
+        Проверяет, что у каждой пары байтов блока есть код. Контекст берётся из состояния,
+        поэтому блок нужно проверять перед его упаковкой через write.
+
+        :param data: очередной блок исходных данных
+        :return: True, если все пары блока можно закодировать
+        """
+        coded_pairs = self.coded_pairs
+        previous = self._previous
+        view = memoryview(data)
+        for block_start in range(0, len(view), PAIR_BLOCK_SYMBOLS):
+            block = view[block_start:block_start + PAIR_BLOCK_SYMBOLS]
+            if not coded_pairs.issuperset(pair_indices(previous, block)):
+                return False
+            previous = block[-1]
+        return True
+
+    def bit_length(self, data: bytes) -> int:
+        """
+        Вычисляет длину закодированных данных в битах без их кодирования.
+
+        :param data: исходные данные в виде байтовой строки
+        :return: количество бит закодированных данных
+        """
+        pair_codes = self.pair_codes
+        return sum(pair_codes[index][1] for index in pair_indices(INITIAL_CONTEXT, data))
+
+    def pack_into(self, data: bytes, encoded_bytes: Union[bytearray, memoryview], bit_length: int) -> int:
+        """
+        Упаковывает коды байтов данных в переданный буфер, начиная с начального контекста.
+
+        :param data: исходные данные (bytes, memoryview или mmap)
+        :param encoded_bytes: буфер размером (bit_length + 7) // 8 байт
+        :param bit_length: длина результата в битах
+        :return: количество дополнительных битов
+        """
+        self._previous = INITIAL_CONTEXT
+        return super().pack_into(data, encoded_bytes, bit_length)
+
+    def _pack_into(self, data: bytes, encoded_bytes: bytearray, position: int) -> int:
+        """
+        Дописывает коды данных в буфер с позиции position, сохраняя неполный байт и контекст в состоянии.
+
+        :param data: исходные данные в виде байтовой строки
+        :param encoded_bytes: буфер результата (присваивание за концом bytearray расширяет буфер)
+        :param position: индекс первого записываемого байта
+        :return: индекс байта, следующего за последним записанным
+        """
+        pair_codes = self.pair_codes
+        pending = self._pending
+        pending_bits = self._pending_bits
+        view = memoryview(data)
+        for pair_start in range(0, len(view), PAIR_BLOCK_SYMBOLS):
+            block = view[pair_start:pair_start + PAIR_BLOCK_SYMBOLS]
+            indices = pair_indices(self._previous, block)
+            self._previous = block[-1]
+            for block_start in range(0, len(indices), BLOCK_SYMBOLS):
+                acc = pending
+                acc_bits = pending_bits
+                for index in indices[block_start:block_start + BLOCK_SYMBOLS]:
+                    value, length = pair_codes[index]
+                    acc = (acc << length) | value
+                    acc_bits += length
+                pending_bits = acc_bits & 7
+                whole_bytes = acc_bits >> 3
+                encoded_bytes[position:position + whole_bytes] = (acc >> pending_bits).to_bytes(whole_bytes, 'big')
+                position += whole_bytes
+                pending = acc & ((1 << pending_bits) - 1)
+        self._pending = pending
+        self._pending_bits = pending_bits
+        return position
+
+
+class ContextTableDecoder:
+    def __init__(self, model: ContextModel, window_bits: int = CONTEXT_WINDOW_BITS) -> None:
+        """
+        Декодер контекстной модели окнами по window_bits бит. Запись таблицы окна содержит
+        все байты, целиком декодируемые внутри окна с переключением таблиц по каждому
+        декодированному байту, и номер таблицы, которой декодируется следующий код.
+
+        :param model: контекстная модель с таблицами
+        :param window_bits: ширина окна поиска в битах
+        """
+        self.window_bits: int = window_bits
+        tables = [model.global_table] + [model.context_tables[context] for context in sorted(model.context_tables)]
+        table_numbers = {context: number for number, context in enumerate(sorted(model.context_tables), 1)}
+        # Номер таблицы, которой декодируется байт после данного
+        self.next_table: List[int] = [table_numbers.get(context, 0) for context in range(CONTEXT_COUNT)]
+        self.codes_by_key: List[Dict[Tuple[int, int], int]] = [
+            {(len(code), int(code, 2)): byte for byte, code in table.codes.items()} for table in tables
+        ]
+        self.max_code_lengths: List[int] = [max(map(len, table.codes.values()), default=0) for table in tables]
+        self.entries: List[List[Tuple[bytes, int, int]]] = self._build_entries(tables)
+        self.reset()
+
+    def _build_entries(self, tables: List[CodeTable]) -> List[List[Tuple[bytes, int, int]]]:
+        """
+        Заполняет таблицы окон всех таблиц модели динамическим программированием по длине остатка окна.
+
+        :param tables: общая таблица и таблицы контекстов
+        :return: для каждой таблицы список записей (декодированные байты, использованные биты,
+                 номер следующей таблицы) для всех 2^k окон
+        """
+        k = self.window_bits
+        next_table = self.next_table
+        firsts: List[List[Tuple[int, int]]] = []
+        for table in tables:
+            first: List[Tuple[int, int]] = [(0, 0)] * (1 << k)
+            for byte, code in table.codes.items():
+                length = len(code)
+                if length > k:
+                    continue
+                start = int(code, 2) << (k - length)
+                first[start:start + (1 << (k - length))] = [(byte, length)] * (1 << (k - length))
+            firsts.append(first)
+
+        # rest[t][r][v] — жадное декодирование r-битной строки v, начиная с таблицы t
+        rest: List[List[List[Tuple[bytes, int, int]]]] = [[[(b'', 0, number)]] for number in range(len(tables))]
+        for r in range(1, k + 1):
+            shift = k - r
+            for number, first in enumerate(firsts):
+                row: List[Tuple[bytes, int, int]] = []
+                for v in range(1 << r):
+                    byte, length = first[v << shift]
+                    if length and length <= r:
+                        tail_bytes, tail_length, tail_table = \
+                            rest[next_table[byte]][r - length][v & ((1 << (r - length)) - 1)]
+                        row.append((bytes((byte,)) + tail_bytes, length + tail_length, tail_table))
+                    else:
+                        row.append((b'', 0, number))
+                rest[number].append(row)
+        return [table_rest[k] for table_rest in rest]
+
+    def _match_code(self, table: int, value: int, bit_count: int) -> Optional[Tuple[int, int]]:
+        """
+        Ищет в таблице кратчайший код, являющийся префиксом битовой строки.
+
+        :param table: номер таблицы
+        :param value: битовая строка в виде целого числа
+        :param bit_count: количество бит в строке
+        :return: кортеж (байт, длина кода) или None, если код не найден
+        """
+        codes_by_key = self.codes_by_key[table]
+        for length in range(1, min(bit_count, self.max_code_lengths[table]) + 1):
+            byte = codes_by_key.get((length, value >> (bit_count - length)))
+            if byte is not None:
+                return byte, length
+        return None
+
+    def decode(self, encoded_bytes: bytes, extra_bits_count: int) -> bytes:
+        """
+        Декодирует битовый поток целиком.
+
+        :param encoded_bytes: закодированные данные в виде байтовой строки
+        :param extra_bits_count: количество дополнительных битов в последнем байте
+        :return: декодированные данные в виде байтовой строки
+        """
+        self.reset()
+        return self.decode_chunk(encoded_bytes, True, extra_bits_count)
+
+    def reset(self) -> None:
+        """
+        Сбрасывает состояние потокового декодирования.
+        """
+        self._acc: int = 0
+        self._bit_count: int = 0
+        self._stopped: bool = False
+        self._table: int = self.next_table[INITIAL_CONTEXT]
+
+    def decode_chunk(self, encoded_bytes: bytes, final: bool = False, extra_bits_count: int = 0) -> bytes:
+        """
+        Декодирует очередной блок потока. Последний байт блока, биты незавершённого кода
+        и текущий контекст сохраняются до следующего вызова.
+
+        :param encoded_bytes: очередной блок закодированных данных
+        :param final: True для последнего блока потока
+        :param extra_bits_count: количество дополнительных битов в последнем байте последнего блока
+        :return: декодированные данные в виде байтовой строки
+        """
+        decoded_bytes = bytearray()
+        if self._stopped:
+            return bytes(decoded_bytes)
+        if not encoded_bytes:
+            if final:
+                self._decode_tail(self._acc >> extra_bits_count, self._bit_count - extra_bits_count, decoded_bytes)
+                self.reset()
+            return bytes(decoded_bytes)
+
+        k = self.window_bits
+        mask = (1 << k) - 1
+        entries = self.entries
+        next_table = self.next_table
+        refill_bits = REFILL_BYTES * 8
+        limit = len(encoded_bytes) - REFILL_BYTES - 1
+
+        acc = self._acc
+        bit_count = self._bit_count
+        table = self._table
+        pos = 0
+        while True:
+            if bit_count < k:
+                if pos > limit:
+                    break
+                acc = ((acc & ((1 << bit_count) - 1)) << refill_bits) | \
+                    int.from_bytes(encoded_bytes[pos:pos + REFILL_BYTES], 'big')
+                pos += REFILL_BYTES
+                bit_count += refill_bits
+
+            symbols, used, table = entries[table][(acc >> (bit_count - k)) & mask]
+            if used:
+                decoded_bytes += symbols
+                bit_count -= used
+                continue
+
+            # Код длиннее окна: догружаем биты и ищем код медленным путём
+            max_code_length = self.max_code_lengths[table]
+            while bit_count < max_code_length and pos <= limit:
+                acc = ((acc & ((1 << bit_count) - 1)) << refill_bits) | \
+                    int.from_bytes(encoded_bytes[pos:pos + REFILL_BYTES], 'big')
+                pos += REFILL_BYTES
+                bit_count += refill_bits
+            if bit_count < max_code_length:
+                break
+            match = self._match_code(table, (acc >> (bit_count - max_code_length)) & ((1 << max_code_length) - 1),
+                                     max_code_length)
+            if match is None:
+                self._stopped = True
+                return bytes(decoded_bytes)
+            decoded_bytes.append(match[0])
+            bit_count -= match[1]
+            table = next_table[match[0]]
+
+        tail = encoded_bytes[pos:]
+        value = ((acc & ((1 << bit_count) - 1)) << (len(tail) * 8)) | int.from_bytes(tail, 'big')
+        bit_count += len(tail) * 8
+        self._table = table
+        if final:
+            self._decode_tail(value >> extra_bits_count, bit_count - extra_bits_count, decoded_bytes)
+            self.reset()
+        else:
+            self._acc = value
+            self._bit_count = bit_count
+        return bytes(decoded_bytes)
+
+    def _decode_tail(self, value: int, bit_count: int, decoded_bytes: bytearray) -> None:
+        """
+        Декодирует хвост потока с точным учётом оставшихся бит; неполный код в конце отбрасывается.
+
+        :param value: оставшиеся биты в виде целого числа
+        :param bit_count: количество оставшихся бит
+        :param decoded_bytes: буфер, в который дописываются декодированные байты
+        """
+        k = self.window_bits
+        mask = (1 << k) - 1
+        table = self._table
+        while bit_count > 0:
+            if bit_count >= k:
+                symbols, used, next_table = self.entries[table][(value >> (bit_count - k)) & mask]
+                if used:
+                    decoded_bytes += symbols
+                    bit_count -= used
+                    table = next_table
+                    continue
+            match = self._match_code(table, value & ((1 << bit_count) - 1), bit_count)
+            if match is None:
+                return
+            decoded_bytes.append(match[0])
+            bit_count -= match[1]
+            table = self.next_table[match[0]]
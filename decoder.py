@@ -1,23 +1,460 @@
+import copy
+import struct
+
 from fileHandler import *
 from codeTable import CodeTable
+from blockCodec import BlockCodec, BlockEntry, is_block_container
+from codeDictionary import CodeDictionary, is_dictionary_reference, parse_reference, table_decoder_cache
+from contentChecksum import ContentChecksum
+from contextModel import ContextModel, ContextTableDecoder, is_context_model
+from instrumentation import DISABLED, Instrumentation, OperationReport
+from numpyBackend import NumpyTableDecoder, make_table_decoder, resolve_backend
+from segmentCodec import SegmentCodec, is_segmented_file
+from tableDecoder import TableDecoder
+
+
+def load_table_decoder(codes_serialized: bytes, backend: str,
+                       dictionary_dir: str) -> Optional[Union[TableDecoder, NumpyTableDecoder, ContextTableDecoder]]:
+    """
+    Восстанавливает кодовую таблицу из заголовка и строит по ней декодер. Для ссылки
+    на словарь декодер берётся из кэша словарей, остальные — из кэша по байтам самой
+    сериализованной таблицы, поэтому файлы с одинаковыми таблицами декодируются без
+    повторного построения. Возвращается копия декодера с собственным состоянием потока:
+    таблицы поиска общие, и одну таблицу могут одновременно декодировать несколько потоков.
+
+    :param codes_serialized: содержимое поля кодовой таблицы заголовка
+    :param backend: фактический движок, 'python' или 'numpy'
+    :param dictionary_dir: каталог словарей
+    :return: экземпляр TableDecoder, NumpyTableDecoder или ContextTableDecoder или None в случае ошибки
+    """
+    if is_dictionary_reference(codes_serialized):
+        try:
+            name, checksum = parse_reference(codes_serialized)
+        except (ValueError, UnicodeDecodeError) as e:
+            logging.error(f"Не удалось прочитать ссылку на словарь: {e}")
+            return None
+        dictionary = CodeDictionary.load(dictionary_dir, name)
+        if dictionary is None:
+            return None
+        if dictionary.checksum != checksum:
+            logging.error(f"Словарь '{name}' не совпадает со словарём, использованным при кодировании.")
+            return None
+        table_decoder = dictionary.table_decoder(backend)
+    else:
+        # Ключ — сами байты таблицы: совпадение хэша проверяется сравнением, коллизии исключены
+        key = (bytes(codes_serialized), backend)
+        table_decoder = table_decoder_cache.get(key)
+        if table_decoder is None:
+            table_decoder = build_table_decoder(codes_serialized, backend)
+            if table_decoder is None:
+                return None
+            table_decoder_cache.put(key, table_decoder)
+    table_decoder = copy.copy(table_decoder)
+    table_decoder.reset()
+    return table_decoder
+
+
+def build_table_decoder(codes_serialized: bytes,
+                        backend: str) -> Optional[Union[TableDecoder, NumpyTableDecoder, ContextTableDecoder]]:
+    """
+    Строит декодер по сериализованной кодовой таблице без кэша; контекстная модель
+    декодируется ContextTableDecoder при любом движке.
+
+    :param codes_serialized: сериализованная кодовая таблица или контекстная модель
+    :param backend: фактический движок, 'python' или 'numpy'
+    :return: экземпляр TableDecoder, NumpyTableDecoder или ContextTableDecoder или None в случае ошибки
+    """
+    if is_context_model(codes_serialized):
+        try:
+            return ContextModel.deserialize(codes_serialized).table_decoder()
+        except (ValueError, IndexError, struct.error) as e:
+            logging.error(f"Не удалось десериализовать контекстную модель: {e}")
+            return None
+
+    if CodeTable.get_format_version(codes_serialized) is None:
+        logging.error("Неизвестный формат кодовой таблицы.")
+        return None
+    try:
+        code_table = CodeTable.deserialize(codes_serialized)
+    except (ValueError, IndexError) as e:
+        logging.error(f"Не удалось десериализовать кодовую таблицу: {e}")
+        return None
+    return make_table_decoder(code_table.codes, backend)
 
 
 class Decoder:
-    def __init__(self, encoded_file_path: str):
+    def __init__(self, encoded_file_path: str, backend: str = 'auto', streaming: bool = False,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, workers: Optional[int] = None,
+                 dictionary_dir: Optional[str] = None, instrumentation: Instrumentation = DISABLED):
         self.file_handler = FileHandler(encoded_file_path)
+        self.backend: str = resolve_backend(backend)
+        self.streaming: bool = streaming
+        self.buffer_size: int = buffer_size
+        self.workers: Optional[int] = workers
+        # Словари по умолчанию ищутся рядом с закодированным файлом
+        self.dictionary_dir: str = dictionary_dir if dictionary_dir is not None else self.file_handler.directory
         self.decoded_file_name: str = ''
+        # По умолчанию инструментация выключена и замеры фаз ничего не делают
+        self.instrumentation: Instrumentation = instrumentation
+        self.report: OperationReport = DISABLED.null_report
 
-    def decode(self) -> None:
+    def decode(self) -> bool:
+        """
+        Декодирует файл в файл с исходным расширением и уникальным именем рядом с закодированным.
+
+        :return: True, если декодированный файл успешно записан
+        """
+        with self.instrumentation.operation('decode', self.file_handler.file_path) as report:
+            self.report = report
+            ok = self._decode()
+            report.ok = ok
+            if ok:
+                report.add_bytes(os.path.getsize(self.file_handler.file_path), os.path.getsize(self.decoded_file_name))
+            return ok
+
+    def _decode(self) -> bool:
+        """
+        Выбирает способ декодирования по формату файла и параметрам декодера и декодирует файл.
+
+        :return: True, если декодированный файл успешно записан
+        """
         if not self.file_handler.file_exists():
             # logging.error(f"Файл '{self.file_handler.file_path}' не найден.")
-            return
+            return False
+
+        if is_block_container(self.file_handler.file_path):
+            with self.report.phase('blocks'):
+                return self._decode_blocks()
+        if is_segmented_file(self.file_handler.file_path):
+            with self.report.phase('segments'):
+                return self._decode_segments()
+
+        with self.report.phase('read_header'):
+            header = self.file_handler.read_encoded_header()
+        if header is None:
+            return False
+        codes_serialized, extra_bits, extension, payload_offset = header
+
+        self.decoded_file_name = self._get_decoded_file_name(extension)
+
+        if not codes_serialized:
+            return self._handle_empty_decoded_file()
+
+        with self.report.phase('load_table'):
+            table_decoder = self._load_table_decoder(codes_serialized)
+        if table_decoder is None:
+            return False
+        if self.streaming:
+            # Чтение и декодирование блоков замеряются внутри _decode_chunks, в 'write' остаётся запись
+            with self.report.phase('write'):
+                return self.file_handler.write_file_chunks(
+                    self.decoded_file_name, self._decode_chunks(payload_offset, extra_bits, table_decoder))
+
+        # Закодированные данные декодируются прямо из отображённого в память файла
+        trailer = self.file_handler.read_encoded_trailer(payload_offset, extra_bits)
+        if trailer is None:
+            return False
+        payload_length, _, expected = trailer
+        with self.file_handler.map_file(payload_offset, payload_length) as encoded_bytes:
+            if encoded_bytes is None:
+                return False
+            if not encoded_bytes and extra_bits != 0:
+                logging.error("Файл поврежден или имеет неверный формат (нет закодированных данных, но указано наличие дополнительных битов).")
+                return False
+            with self.report.phase('decode'):
+                decoded_data = self._decode_data(encoded_bytes, extra_bits, table_decoder)
+
+        if expected is not None:
+            with self.report.phase('checksum'):
+                checksum = ContentChecksum()
+                checksum.update(decoded_data)
+            if not checksum.matches(expected):
+                logging.error(checksum.describe_mismatch(expected))
+                return False
+
+        with self.report.phase('write'):
+            return self.file_handler.write_file(self.decoded_file_name, decoded_data)
+
+    def verify(self) -> bool:
+        """
+        Проверяет целостность закодированного файла без записи результата: данные декодируются
+        потоково и сверяются с записанными при кодировании длиной и CRC32 исходных данных.
+
+        :return: True, если файл содержит контрольные суммы и декодированные данные им соответствуют
+        """
+        with self.instrumentation.operation('verify', self.file_handler.file_path) as report:
+            self.report = report
+            ok = self._verify()
+            report.ok = ok
+            if ok:
+                report.add_bytes(os.path.getsize(self.file_handler.file_path))
+            return ok
+
+    def _verify(self) -> bool:
+        """
+        Декодирует файл в никуда, проверяя контрольные суммы.
+
+        :return: True, если декодированные данные соответствуют контрольным суммам
+        """
+        if not self.file_handler.file_exists():
+            logging.error(f"Файл '{self.file_handler.file_path}' не найден.")
+            return False
+        if not self.has_checksum():
+            logging.error(f"Файл '{self.file_handler.file_path}' не содержит контрольных сумм.")
+            return False
+
+        if is_block_container(self.file_handler.file_path):
+            block_codec = BlockCodec(self.workers, self.backend)
+            header = block_codec.read_header(self.file_handler.file_path)
+            if header is None:
+                return False
+            try:
+                with self.report.phase('blocks'):
+                    for _ in block_codec.decode(self.file_handler.file_path, header[1]):
+                        pass
+            except (IOError, ValueError) as e:
+                logging.error(f"Ошибка проверки файла '{self.file_handler.file_path}': {e}")
+                return False
+            return not block_codec.corrupted_blocks
+        if is_segmented_file(self.file_handler.file_path):
+            segment_codec = self._segment_codec()
+            directory = segment_codec.read_directory()
+            if directory is None:
+                return False
+            try:
+                with self.report.phase('segments'):
+                    for _ in segment_codec.decode(directory):
+                        pass
+            except (IOError, ValueError) as e:
+                logging.error(f"Ошибка проверки файла '{self.file_handler.file_path}': {e}")
+                return False
+            return True
+
+        with self.report.phase('read_header'):
+            header = self.file_handler.read_encoded_header()
+        if header is None:
+            return False
+        codes_serialized, extra_bits, _, payload_offset = header
+        if not codes_serialized:
+            return True
+
+        with self.report.phase('load_table'):
+            table_decoder = self._load_table_decoder(codes_serialized)
+        if table_decoder is None:
+            return False
+        try:
+            for _ in self._decode_chunks(payload_offset, extra_bits, table_decoder):
+                pass
+        except (IOError, ValueError) as e:
+            logging.error(f"Ошибка проверки файла '{self.file_handler.file_path}': {e}")
+            return False
+        return True
+
+    def has_checksum(self) -> bool:
+        """
+        Проверяет, записаны ли в закодированном файле контрольные суммы исходных данных.
+        Их нет в файлах, записанных до появления контрольных сумм.
+
+        :return: True, если целостность файла можно проверить методом verify
+        """
+        if is_block_container(self.file_handler.file_path):
+            header = BlockCodec(self.workers, self.backend).read_header(self.file_handler.file_path)
+            return header is not None and all(entry[5] is not None for entry in header[1])
+        if is_segmented_file(self.file_handler.file_path):
+            # CRC32 записывается для каждого сегмента
+            return self._segment_codec().read_directory() is not None
+
+        header = self.file_handler.read_encoded_header()
+        if header is None:
+            return False
+        codes_serialized, _, _, payload_offset = header
+        # Пустой файл записывается одним заголовком, проверять в нём нечего
+        return not codes_serialized or self.file_handler.read_checksum(payload_offset) is not None
+
+    def matches_original(self, original_path: str) -> bool:
+        """
+        Сверяет исходный файл с контрольными суммами закодированного, читая его блоками
+        без декодирования. Вместе с verify заменяет декодирование и побайтовое сравнение.
 
-        read_result = self.file_handler.read_encoded_file()
-        if read_result is None:
-            return
+        :param original_path: путь к исходному файлу
+        :return: True, если длина и CRC32 исходного файла совпадают с записанными
+        """
+        original = FileHandler(original_path)
+        try:
+            if is_block_container(self.file_handler.file_path):
+                header = BlockCodec(self.workers, self.backend).read_header(self.file_handler.file_path)
+                if header is None:
+                    return False
+                offset = 0
+                for _, original_length, _, _, _, crc32 in header[1]:
+                    checksum = ContentChecksum()
+                    for chunk in original.iter_chunks(self.buffer_size, offset, original_length):
+                        checksum.update(chunk)
+                    if checksum.original_length != original_length or checksum.crc32 != crc32:
+                        return False
+                    offset += original_length
+                return offset == os.path.getsize(original_path)
+            if is_segmented_file(self.file_handler.file_path):
+                directory = self._segment_codec().read_directory()
+                if directory is None:
+                    return False
+                offset = 0
+                for segment in directory.segments:
+                    checksum = ContentChecksum()
+                    for chunk in original.iter_chunks(self.buffer_size, offset, segment.original_length):
+                        checksum.update(chunk)
+                    if checksum.original_length != segment.original_length or checksum.crc32 != segment.crc32:
+                        return False
+                    offset += segment.original_length
+                return offset == os.path.getsize(original_path)
+
+            header = self.file_handler.read_encoded_header()
+            if header is None:
+                return False
+            codes_serialized, _, _, payload_offset = header
+            expected = self.file_handler.read_checksum(payload_offset) if codes_serialized else ContentChecksum()
+            if expected is None:
+                return False
+            checksum = ContentChecksum()
+            for chunk in original.iter_chunks(self.buffer_size):
+                checksum.update(chunk)
+            return checksum.matches(expected)
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении файла '{original_path}': {e}")
+            return False
+
+    def decode_range(self, start: int, length: int) -> Optional[bytes]:
+        """
+        Декодирует только диапазон исходных данных. Для обычного файла нужен индекс точек
+        синхронизации (Encoder(sync_interval=...)): читаются лишь закодированные данные между
+        ближайшими точками. В блочном контейнере и файле с сегментами декодируются только блоки
+        или сегменты, задевающие диапазон.
+
+        :param start: индекс первого байта диапазона в исходных данных
+        :param length: длина диапазона в байтах
+        :return: декодированные байты диапазона (короче length у конца файла) или None в случае ошибки
+        """
+        if start < 0 or length < 0:
+            raise ValueError(f"Недопустимый диапазон: start={start}, length={length}")
+        if not self.file_handler.file_exists():
+            logging.error(f"Файл '{self.file_handler.file_path}' не найден.")
+            return None
+
+        if is_block_container(self.file_handler.file_path):
+            block_codec = BlockCodec(self.workers, self.backend)
+            header = block_codec.read_header(self.file_handler.file_path)
+            if header is None:
+                return None
+            try:
+                decoded_data = block_codec.decode_range(self.file_handler.file_path, header[1], start, length)
+            except (IOError, ValueError) as e:
+                logging.error(f"Ошибка декодирования диапазона файла '{self.file_handler.file_path}': {e}")
+                return None
+            return None if block_codec.corrupted_blocks else decoded_data
+        if is_segmented_file(self.file_handler.file_path):
+            segment_codec = self._segment_codec()
+            directory = segment_codec.read_directory()
+            if directory is None:
+                return None
+            try:
+                return segment_codec.decode_range(directory, start, length)
+            except (IOError, ValueError) as e:
+                logging.error(f"Ошибка декодирования диапазона файла '{self.file_handler.file_path}': {e}")
+                return None
+
+        header = self.file_handler.read_encoded_header()
+        if header is None:
+            return None
+        codes_serialized, extra_bits, _, payload_offset = header
+        if not codes_serialized:
+            return b''
+
+        sync_index = self.file_handler.read_sync_index(payload_offset, extra_bits)
+        if sync_index is None:
+            logging.error("Файл не содержит индекса точек синхронизации, декодирование диапазона невозможно.")
+            return None
+        end = min(start + length, sync_index.original_length)
+        if start >= end:
+            return b''
 
-        codes_serialized, extra_bits, encoded_bytes, extension = read_result
+        table_decoder = self._load_table_decoder(codes_serialized)
+        if table_decoder is None:
+            return None
+        segment_start, start_bit, end_bit = sync_index.locate(start, end)
+        payload = self.file_handler.read_payload_bits(payload_offset, start_bit, end_bit)
+        if payload is None:
+            return None
+        decoded_data = self._decode_data(payload[0], payload[1], table_decoder)
+        return decoded_data[start - segment_start:end - segment_start]
 
+    def _load_table_decoder(self, codes_serialized: bytes) -> Optional[Union[TableDecoder, NumpyTableDecoder]]:
+        """
+        Строит декодер по полю кодовой таблицы заголовка с движком и каталогом словарей декодера.
+
+        :param codes_serialized: содержимое поля кодовой таблицы заголовка
+        :return: экземпляр TableDecoder или NumpyTableDecoder или None в случае ошибки
+        """
+        return load_table_decoder(codes_serialized, self.backend, self.dictionary_dir)
+
+    def _decode_blocks(self) -> bool:
+        """
+        Декодирует блочный контейнер, распределяя блоки по процессам.
+
+        :return: True, если декодированный файл успешно записан
+        """
+        block_codec = BlockCodec(self.workers, self.backend)
+        header = block_codec.read_header(self.file_handler.file_path)
+        if header is None:
+            return False
+        extension, entries = header
+
+        self.decoded_file_name = self._get_decoded_file_name(extension)
+        return self.file_handler.write_file_chunks(self.decoded_file_name,
+                                                   self._checked_blocks(block_codec, entries))
+
+    def _checked_blocks(self, block_codec: BlockCodec, entries: List[BlockEntry]) -> Iterator[bytes]:
+        """
+        Декодирует все блоки контейнера, чтобы сообщить о каждом повреждённом, и после последнего
+        блока прерывает запись, если повреждённые были: файл с ними не должен остаться на диске.
+
+        :param block_codec: кодек блочного контейнера
+        :param entries: записи индекса блоков
+        :return: итератор по декодированным блокам
+        :raises ValueError: если хотя бы один блок повреждён
+        """
+        yield from block_codec.decode(self.file_handler.file_path, entries)
+        if block_codec.corrupted_blocks:
+            raise ValueError(f"Повреждены блоки {', '.join(map(str, block_codec.corrupted_blocks))}.")
+
+    def _segment_codec(self) -> SegmentCodec:
+        """
+        Создаёт кодек файла с сегментами с движком и размером блока декодера.
+
+        :return: экземпляр SegmentCodec
+        """
+        return SegmentCodec(self.file_handler.file_path, self.backend, self.buffer_size)
+
+    def _decode_segments(self) -> bool:
+        """
+        Декодирует файл с сегментами, записанный кодированием с дописыванием: сегменты
+        декодируются по порядку своими таблицами в один файл.
+
+        :return: True, если декодированный файл успешно записан
+        """
+        segment_codec = self._segment_codec()
+        directory = segment_codec.read_directory()
+        if directory is None:
+            return False
+        self.decoded_file_name = self._get_decoded_file_name(directory.extension)
+        return self.file_handler.write_file_chunks(self.decoded_file_name, segment_codec.decode(directory))
+
+    def _get_decoded_file_name(self, extension: str) -> str:
+        """
+        Генерирует уникальное имя декодированного файла по имени закодированного.
+
+        :param extension: оригинальное расширение файла
+        :return: уникальный путь к декодированному файлу
+        """
         encoded_file_name = os.path.basename(self.file_handler.file_path)
 
         if encoded_file_name.endswith('_encoded.bin'):
@@ -25,48 +462,61 @@ class Decoder:
         else:
             base_name = os.path.splitext(encoded_file_name)[0]
 
-        self.decoded_file_name = self.file_handler.generate_unique_filename(
-            base_name, extension)
-
-        if not codes_serialized:
-            self._handle_empty_decoded_file()
-            return
-
-        code_table = CodeTable.deserialize(codes_serialized)
-        decoded_data = self._decode_data(encoded_bytes, extra_bits, code_table)
-
-        self.file_handler.write_file(self.decoded_file_name, decoded_data)
+        return self.file_handler.generate_unique_filename(base_name, extension)
 
     @staticmethod
     def _decode_data(encoded_bytes: bytes, extra_bits_count: int,
-                     code_table: CodeTable) -> bytes:
+                     table_decoder: Union[TableDecoder, NumpyTableDecoder]) -> bytes:
         """
-        Декодирует данные с использованием кодовой таблицы.
+        Декодирует данные с использованием таблицы декодирования.
 
         :param encoded_bytes: закодированные данные в виде байтовой строки
         :param extra_bits_count: количество дополнительных битов
-        :param code_table: экземпляр CodeTable с восстановленной кодовой таблицей
+        :param table_decoder: декодер, построенный по кодовой таблице файла
         :return: декодированные данные в виде байтовой строки
         """
-        reverse_codes = {code: byte for byte, code in code_table.codes.items()}
+        return table_decoder.decode(encoded_bytes, extra_bits_count)
 
-        encoded_bits = ''.join(f'{byte:08b}' for byte in encoded_bytes)
-        if extra_bits_count:
-            encoded_bits = encoded_bits[:-extra_bits_count]
-
-        decoded_bytes = bytearray()
-        buffer = ''
-        for bit in encoded_bits:
-            buffer += bit
-            if buffer in reverse_codes:
-                decoded_bytes.append(reverse_codes[buffer])
-                buffer = ''
+    def _decode_chunks(self, payload_offset: int, extra_bits_count: int,
+                       table_decoder: Union[TableDecoder, NumpyTableDecoder]) -> Iterator[bytes]:
+        """
+        Декодирует закодированные данные блоками по buffer_size байт. Если в файле записана
+        контрольная сумма, длина и CRC32 декодированных данных считаются по тем же блокам.
 
-        return bytes(decoded_bytes)
+        :param payload_offset: смещение начала закодированных данных в файле
+        :param extra_bits_count: количество дополнительных битов
+        :param table_decoder: декодер, построенный по кодовой таблице файла
+        :return: итератор по блокам декодированных данных
+        :raises ValueError: если декодированные данные не соответствуют контрольной сумме
+        """
+        trailer = self.file_handler.read_encoded_trailer(payload_offset, extra_bits_count)
+        if trailer is None:
+            raise IOError(f"Не удалось прочитать окончание файла '{self.file_handler.file_path}'.")
+        payload_length, _, expected = trailer
+        checksum = ContentChecksum()
+        # Декодер мог уже декодировать поток в этом экземпляре, поэтому состояние сбрасывается явно
+        table_decoder.reset()
+        report = self.report
+        chunks = self.file_handler.iter_chunks(self.buffer_size, payload_offset, payload_length)
+        final = False
+        while not final:
+            with report.phase('read'):
+                chunk = next(chunks, None)
+            final = chunk is None
+            with report.phase('decode'):
+                decoded_data = table_decoder.decode_chunk(chunk or b'', final, extra_bits_count if final else 0)
+            if expected is not None:
+                with report.phase('checksum'):
+                    checksum.update(decoded_data)
+                # Лишние символы видны сразу, не дожидаясь конца потока
+                if checksum.original_length > expected.original_length or final and not checksum.matches(expected):
+                    raise ValueError(checksum.describe_mismatch(expected))
+            yield decoded_data
 
-    def _handle_empty_decoded_file(self) -> None:
+    def _handle_empty_decoded_file(self) -> bool:
         """
         Обрабатывает случай пустого закодированного файла при декодировании.
+
+        :return: True, если пустой декодированный файл успешно создан
         """
-        with open(self.decoded_file_name, 'wb'):
-            pass
+        return self.file_handler.write_file(self.decoded_file_name, b'')
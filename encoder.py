@@ -1,55 +1,373 @@
 from fileHandler import *
 from codeTable import *
+from bitWriter import BitWriter
+from blockCodec import BlockCodec
+from byteHistogram import ByteHistogram
+from codeDictionary import CodeDictionary
+from contentChecksum import ContentChecksum
+from contextModel import ContextBitWriter, ContextModel
+from instrumentation import DISABLED, Instrumentation, OperationReport
+from numpyBackend import NumpyBitWriter, make_bit_writer, resolve_backend
+from segmentCodec import SegmentCodec
+from syncIndex import SyncIndex
 
 class Encoder:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, backend: str = 'auto', streaming: bool = False,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, block_size: Optional[int] = None,
+                 workers: Optional[int] = None, sync_interval: Optional[int] = None,
+                 dictionary: Optional[CodeDictionary] = None, instrumentation: Instrumentation = DISABLED,
+                 context_model: bool = False, sample_size: Optional[int] = None, append: bool = False):
         self.file_handler = FileHandler(file_path)
+        self.backend: str = resolve_backend(backend)
+        self.streaming: bool = streaming
+        self.buffer_size: int = buffer_size
+        self.block_size: Optional[int] = block_size
+        self.workers: Optional[int] = workers
+        # Блочный контейнер уже содержит индекс блоков, точки синхронизации пишутся только в обычный файл
+        self.sync_interval: Optional[int] = sync_interval
+        # Со словарём таблица не строится и не записывается; блоки контейнера строят свои таблицы
+        self.dictionary: Optional[CodeDictionary] = dictionary
+        self.throughput: float = 0.0
+        # Количество дополнительных битов потокового кодирования известно только после упаковки последнего блока
+        self.extra_bits: int = 0
+        # По умолчанию инструментация выключена и замеры фаз ничего не делают
+        self.instrumentation: Instrumentation = instrumentation
+        self.report: OperationReport = DISABLED.null_report
+        self.encoded_file_path: str = ''
+        # Модель порядка 1: таблица выбирается по предыдущему байту; кодирует только движок Python
+        self.context_model: bool = context_model
+        # Таблица строится по выборке из sample_size байт, и кодирование начинается без полного
+        # прохода подсчёта; потери сжатия относительно точной таблицы записываются в sampling_loss
+        self.sample_size: Optional[int] = sample_size
+        self.sampling_loss: Optional[float] = None
+        # Растущий файл кодируется сегментами: повторное кодирование дописывает только новый хвост.
+        # Что прежние данные не менялись, проверяется по CRC32 окон, а не по всему файлу, поэтому
+        # файл, который переписывается не только в конце, нужно кодировать без append
+        self.append: bool = append
 
-    def encode(self) -> None:
+    def encode(self) -> bool:
+        """
+        Кодирует файл в файл с суффиксом _encoded.bin рядом с исходным.
+
+        :return: True, если закодированный файл успешно записан
+        """
+        with self.instrumentation.operation('encode', self.file_handler.file_path) as report:
+            self.report = report
+            ok = self._encode()
+            report.ok = ok
+            if ok:
+                report.add_bytes(os.path.getsize(self.file_handler.file_path), os.path.getsize(self.encoded_file_path))
+            return ok
+
+    def _encode(self) -> bool:
+        """
+        Выбирает способ кодирования по параметрам кодировщика и кодирует файл.
+
+        :return: True, если закодированный файл успешно записан
+        """
         if not self.file_handler.file_exists():
             logging.error(f"Файл '{self.file_handler.file_path}' не найден.")
-            return
+            return False
+        self.encoded_file_path = self.file_handler.get_encoded_filename()
+        if self.context_model and (self.block_size or self.sync_interval or self.dictionary is not None):
+            logging.error("Контекстная модель не сочетается с блочным режимом, точками синхронизации и словарём.")
+            return False
+        if self.sample_size is not None and (self.context_model or self.block_size or self.dictionary is not None):
+            logging.error("Таблица по выборке не сочетается с контекстной моделью, блочным режимом и словарём.")
+            return False
+        if self.append and (self.context_model or self.block_size or self.sync_interval or self.dictionary is not None
+                            or self.sample_size is not None):
+            logging.error("Кодирование с дописыванием не сочетается с контекстной моделью, блочным режимом, "
+                          "точками синхронизации, словарём и таблицей по выборке.")
+            return False
+
+        if self.append:
+            segment_codec = SegmentCodec(self.encoded_file_path, self.backend, self.buffer_size)
+            with self.report.phase('segments'):
+                ok = segment_codec.append(self.file_handler)
+            self.report.set_metric('appended_bytes', segment_codec.appended_bytes)
+            return ok
+
+        if self.block_size:
+            block_codec = BlockCodec(self.workers, self.backend)
+            with self.report.phase('blocks'):
+                return block_codec.encode(self.file_handler, self.encoded_file_path, self.block_size)
 
-        data = self.file_handler.read_file()
-        if data is None:
-            return
+        # Отображённому файлу длина результата нужна до упаковки, а её даёт только полный подсчёт
+        # частот, поэтому таблица по выборке всегда кодирует потоком
+        if self.streaming or self.sample_size is not None:
+            return self._encode_streaming()
 
-        if not data:
-            self._handle_empty_file()
-            return
+        # Файл отображается в память: частоты, индекс и упаковка читают его без копирования в кучу
+        with self.file_handler.map_file() as data:
+            if data is None:
+                return False
+            if not data:
+                return self._handle_empty_file()
+            if self.context_model:
+                return self._encode_context_mapped(data)
 
-        code_table = CodeTable()
-        code_table.build(data)
+            with self.report.phase('count'):
+                frequencies = ByteHistogram.from_data(data, self.backend)
+            prepared = self._prepare_code_table(frequencies)
+            if prepared is None:
+                return False
+            code_table, codes_serialized, bit_length = prepared
+            extra_bits = (8 - bit_length % 8) % 8
 
-        encoded_bytes, extra_bits = self._encode_data(data, code_table)
-        codes_serialized = code_table.serialize()
+            trailer = b''
+            if self.sync_interval:
+                with self.report.phase('sync_index'):
+                    sync_index = SyncIndex(self.sync_interval, code_table.codes)
+                    sync_index.update(data)
+                    trailer = sync_index.serialize()
+            with self.report.phase('checksum'):
+                checksum = ContentChecksum()
+                checksum.update(data)
+                trailer += checksum.serialize((bit_length + 7) // 8)
+            # Упаковка идёт прямо в отображённый файл и замеряется отдельно от записи заголовка и сброса на диск
+            with self.report.phase('write'):
+                return self.file_handler.write_encoded_mapped(
+                    self.encoded_file_path, codes_serialized, extra_bits, self.file_handler.extension,
+                    (bit_length + 7) // 8,
+                    lambda encoded_bytes: self._encode_data(data, make_bit_writer(code_table.codes, self.backend),
+                                                            encoded_bytes, bit_length), trailer)
 
-        encoded_file_path = self.file_handler.get_encoded_filename()
-        self.file_handler.write_encoded_file(encoded_file_path, codes_serialized, extra_bits, self.file_handler.extension, encoded_bytes)
+    def _prepare_code_table(self, frequencies: Dict[int, int]) -> Optional[Tuple[CodeTable, bytes, int]]:
+        """
+        Строит кодовую таблицу по частотам или берёт таблицу словаря.
 
-    @staticmethod
-    def _encode_data(data: bytes, code_table: CodeTable) -> Tuple[bytes, int]:
+        :param frequencies: словарь {байт: частота} исходных данных
+        :return: кортеж из кодовой таблицы, содержимого поля таблицы в заголовке и длины
+                 закодированных данных в битах или None, если словарь не покрывает данные
         """
-        Кодирует данные с использованием кодовой таблицы.
+        if self.dictionary is None:
+            code_table = CodeTable()
+            with self.report.phase('build_table'):
+                code_table.build_from_frequencies(frequencies)
+            logging.info(f"Средняя длина кода {code_table.average_code_length():.4f} бит/символ, "
+                         f"энтропия {code_table.entropy():.4f} бит/символ")
+            with self.report.phase('serialize_table'):
+                codes_serialized = code_table.serialize()
+            return code_table, codes_serialized, code_table.encoded_bit_length()
+
+        if not self.dictionary.covers(frequencies):
+            logging.error(f"Словарь '{self.dictionary.name}' не содержит кодов для всех байтов файла.")
+            return None
+        code_table = self.dictionary.code_table
+        return code_table, self.dictionary.reference(), code_table.encoded_bit_length(frequencies)
 
-        :param data: исходные данные в виде байтовой строки
-        :param code_table: экземпляр CodeTable с построенной кодовой таблицей
-        :return: кортеж из закодированных байтов и количества дополнительных битов
+    def _prepare_context_model(self, chunks: Iterable[bytes]) -> ContextModel:
         """
-        encoded_bits = ''.join(code_table.codes[byte] for byte in data)
-        extra_bits = (8 - len(encoded_bits) % 8) % 8
-        encoded_bits += '0' * extra_bits
+        Считает пары байтов и строит контекстную модель.
 
-        encoded_bytes = bytearray()
-        for i in range(0, len(encoded_bits), 8):
-            byte = encoded_bits[i:i + 8]
-            encoded_bytes.append(int(byte, 2))
+        :param chunks: итератор по блокам исходных данных
+        :return: контекстная модель с построенными таблицами
+        """
+        model = ContextModel(self.backend)
+        with self.report.phase('count'):
+            for chunk in chunks:
+                model.update(chunk)
+        with self.report.phase('build_table'):
+            model.build()
+        logging.info(f"Контекстная модель: {len(model.context_tables)} таблиц контекстов, средняя длина кода "
+                     f"{model.average_code_length():.4f} бит/символ против "
+                     f"{model.global_table.average_code_length():.4f} у общей таблицы")
+        return model
 
-        return bytes(encoded_bytes), extra_bits
+    def _encode_context_mapped(self, data: memoryview) -> bool:
+        """
+        Кодирует отображённый в память файл контекстной моделью.
 
-    def _handle_empty_file(self) -> None:
+        :param data: исходные данные
+        :return: True, если закодированный файл успешно записан
+        """
+        model = self._prepare_context_model([data])
+        with self.report.phase('serialize_table'):
+            codes_serialized = model.serialize()
+        bit_length = model.encoded_bit_length()
+        with self.report.phase('checksum'):
+            checksum = ContentChecksum()
+            checksum.update(data)
+        bit_writer = model.bit_writer()
+        with self.report.phase('write'):
+            return self.file_handler.write_encoded_mapped(
+                self.encoded_file_path, codes_serialized, (8 - bit_length % 8) % 8, self.file_handler.extension,
+                (bit_length + 7) // 8,
+                lambda encoded_bytes: self._encode_data(data, bit_writer, encoded_bytes, bit_length),
+                checksum.serialize((bit_length + 7) // 8))
+
+    def _encode_data(self, data: memoryview, bit_writer: Union[BitWriter, NumpyBitWriter, ContextBitWriter],
+                     encoded_bytes: memoryview, bit_length: int) -> None:
+        """
+        Кодирует данные в переданный буфер и запоминает скорость упаковки.
+
+        :param data: исходные данные
+        :param bit_writer: упаковщик битов, построенный по кодовой таблице или контекстной модели
+        :param encoded_bytes: обнулённый буфер размером (bit_length + 7) // 8 байт
+        :param bit_length: длина закодированных данных в битах
+        """
+        with self.report.phase('pack'):
+            bit_writer.pack_into(data, encoded_bytes, bit_length)
+        self.throughput = bit_writer.throughput
+        logging.info(f"Упаковано {bit_writer.bytes_in} байт в {bit_writer.bytes_out} байт, "
+                     f"{self.throughput:.2f} МБ/с")
+
+    def _encode_streaming(self) -> bool:
+        """
+        Кодирует файл блоками по buffer_size байт и записывает результат конвейером: упаковка
+        очередного блока идёт одновременно с записью предыдущих. Без словаря таблица должна
+        попасть в заголовок раньше данных, поэтому первый проход считает частоты байтов
+        (для контекстной модели — пар байтов); таблица словаря известна заранее, и файл
+        читается один раз. С sample_size частоты оцениваются по выборке, а точные частоты
+        считаются попутно с упаковкой только для отчёта о потерях сжатия.
+
+        :return: True, если закодированный файл успешно записан
+        """
+        code_table: Optional[CodeTable] = None
+        exact_frequencies: Optional[ByteHistogram] = None
+        file_size = os.path.getsize(self.file_handler.file_path)
+        if self.sample_size is not None and file_size > self.sample_size:
+            # Каждый байт получает частоту не меньше 1: байты, не попавшие в выборку, тоже кодируются
+            frequencies = ByteHistogram(self.backend, initial=1)
+            try:
+                with self.report.phase('count'):
+                    for chunk in self.file_handler.iter_sample(self.sample_size):
+                        frequencies.update(chunk)
+            except IOError as e:
+                logging.exception(f"Ошибка при чтении файла '{self.file_handler.file_path}': {e}")
+                return False
+            prepared = self._prepare_code_table(frequencies)
+            if prepared is None:
+                return False
+            code_table, codes_serialized, _ = prepared
+            exact_frequencies = ByteHistogram(self.backend)
+        elif self.context_model:
+            if not file_size:
+                return self._handle_empty_file()
+            try:
+                model = self._prepare_context_model(self.file_handler.iter_chunks(self.buffer_size))
+            except IOError as e:
+                logging.exception(f"Ошибка при чтении файла '{self.file_handler.file_path}': {e}")
+                return False
+            with self.report.phase('serialize_table'):
+                codes_serialized = model.serialize()
+        elif self.dictionary is None:
+            if self.sample_size is not None:
+                # Файл не больше выборки: таблица точная
+                self.sampling_loss = 0.0
+            frequencies = ByteHistogram(self.backend)
+            try:
+                with self.report.phase('count'):
+                    for chunk in self.file_handler.iter_chunks(self.buffer_size):
+                        frequencies.update(chunk)
+            except IOError as e:
+                logging.exception(f"Ошибка при чтении файла '{self.file_handler.file_path}': {e}")
+                return False
+
+            if not frequencies:
+                return self._handle_empty_file()
+
+            prepared = self._prepare_code_table(frequencies)
+            if prepared is None:
+                return False
+            code_table, codes_serialized, _ = prepared
+        else:
+            if not file_size:
+                return self._handle_empty_file()
+            code_table = self.dictionary.code_table
+            codes_serialized = self.dictionary.reference()
+
+        bit_writer = model.bit_writer() if code_table is None else make_bit_writer(code_table.codes, self.backend)
+        # Файл читается повторно после подсчёта частот и мог измениться; словарь проверяется отдельно,
+        # контекстная модель — по парам байтов в ContextBitWriter.covers_data
+        covered = bytes(code_table.codes) if code_table is not None and self.dictionary is None else None
+        sync_index = SyncIndex(self.sync_interval, code_table.codes) if self.sync_interval else None
+        # Чтение и упаковка блоков замеряются внутри _encode_chunks, в 'write' остаётся ожидание записи
+        with self.report.phase('write'):
+            written = self.file_handler.write_encoded_pipelined(self.encoded_file_path, codes_serialized,
+                                                                self.file_handler.extension,
+                                                                self._encode_chunks(bit_writer, sync_index,
+                                                                                    exact_frequencies, covered),
+                                                                lambda: self.extra_bits, self.buffer_size)
+        self.throughput = bit_writer.throughput
+        if written and exact_frequencies is not None:
+            self._report_sampling_loss(code_table, codes_serialized, exact_frequencies)
+        return written
+
+    def _report_sampling_loss(self, code_table: CodeTable, codes_serialized: bytes,
+                              exact_frequencies: Dict[int, int]) -> None:
+        """
+        Сравнивает размер данных и таблицы, построенной по выборке, с точной таблицей
+        по частотам всего файла и записывает потери сжатия в sampling_loss и в отчёт.
+
+        :param code_table: таблица, построенная по выборке
+        :param codes_serialized: записанная в заголовок таблица
+        :param exact_frequencies: частоты байтов всего файла
+        """
+        exact_table = CodeTable()
+        exact_table.build_from_frequencies(exact_frequencies)
+        sampled_bits = code_table.encoded_bit_length(exact_frequencies) + 8 * len(codes_serialized)
+        exact_bits = exact_table.encoded_bit_length() + 8 * len(exact_table.serialize())
+        self.sampling_loss = sampled_bits / exact_bits - 1 if exact_bits else 0.0
+        self.report.set_metric('sampling_loss', self.sampling_loss)
+        logging.info(f"Таблица по выборке {self.sample_size} байт: {sampled_bits / 8:.0f} Б против "
+                     f"{exact_bits / 8:.0f} Б у точной таблицы, потери {self.sampling_loss:.2%}")
+
+    def _encode_chunks(self, bit_writer: Union[BitWriter, NumpyBitWriter, ContextBitWriter],
+                       sync_index: Optional[SyncIndex] = None,
+                       exact_frequencies: Optional[ByteHistogram] = None,
+                       covered: Optional[bytes] = None) -> Iterator[bytes]:
+        """
+        Кодирует файл блоками, перенося неполный последний байт блока в следующий.
+        Длина и CRC32 исходных данных считаются по тем же блокам и записываются последними.
+
+        :param bit_writer: упаковщик битов
+        :param sync_index: индекс точек синхронизации, записываемый после закодированных данных
+        :param exact_frequencies: гистограмма, в которую попутно считаются частоты (для таблицы по выборке)
+        :param covered: байты, для которых в таблице есть код (None — не проверять)
+        :return: итератор по блокам закодированных данных
+        :raises ValueError: если в блоке есть байт или, для контекстной модели, пара байтов без кода
+        """
+        report = self.report
+        checksum = ContentChecksum()
+        payload_length = 0
+        chunks = self.file_handler.iter_chunks(self.buffer_size)
+        while True:
+            with report.phase('read'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            if self.dictionary is not None and not self.dictionary.covers_data(chunk):
+                # Без проверки BitWriter молча пропустил бы байты, для которых нет кода
+                raise ValueError(f"Словарь '{self.dictionary.name}' не содержит кодов для всех байтов файла.")
+            if covered is not None and chunk.translate(None, covered) or \
+                    isinstance(bit_writer, ContextBitWriter) and not bit_writer.covers_data(chunk):
+                raise ValueError(f"Файл '{self.file_handler.file_path}' изменился во время кодирования.")
+            if sync_index is not None:
+                with report.phase('sync_index'):
+                    sync_index.update(chunk)
+            with report.phase('checksum'):
+                checksum.update(chunk)
+            if exact_frequencies is not None:
+                with report.phase('count'):
+                    exact_frequencies.update(chunk)
+            with report.phase('pack'):
+                encoded_bytes = bit_writer.write(chunk)
+            payload_length += len(encoded_bytes)
+            yield encoded_bytes
+        last_byte, self.extra_bits = bit_writer.flush()
+        payload_length += len(last_byte)
+        yield last_byte
+        if sync_index is not None:
+            yield sync_index.serialize()
+        yield checksum.serialize(payload_length)
+
+    def _handle_empty_file(self) -> bool:
         """
         Обрабатывает случай пустого входного файла при кодировании.
+
+        :return: True, если закодированный файл успешно записан
         """
         codes_size = 0
         extra_bits = 0
@@ -57,10 +375,12 @@ class Encoder:
         extension_length = len(extension_bytes)
 
         try:
-            with open(self.file_handler.get_encoded_filename(), 'wb') as file:
+            with open(self.encoded_file_path, 'wb') as file:
                 file.write(struct.pack('I', codes_size))
                 file.write(bytes([extra_bits]))
                 file.write(struct.pack('I', extension_length))
                 file.write(extension_bytes)
+            return True
         except IOError as e:
-            logging.exception(f"Ошибка при записи пустого закодированного файла '{self.file_handler.get_encoded_filename()}': {e}")
+            logging.exception(f"Ошибка при записи пустого закодированного файла '{self.encoded_file_path}': {e}")
+            return False
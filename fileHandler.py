@@ -1,8 +1,36 @@
+import mmap
 import os
+import queue
 import struct
+import threading
+from contextlib import contextmanager
 from typing import *
 import logging
 
+from contentChecksum import CHECKSUM_FOOTER, ContentChecksum
+from syncIndex import SyncIndex
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+# Выборка для оценки частот: блоки по SAMPLE_BLOCK_SIZE байт, равномерно расставленные по файлу
+DEFAULT_SAMPLE_SIZE = 4 << 20
+SAMPLE_BLOCK_SIZE = 1 << 16
+# Сколько заполненных буферов может ждать записи, пока кодирование идёт дальше
+DEFAULT_QUEUE_DEPTH = 4
+
+
+def is_safe_name(path: str) -> bool:
+    """
+    Проверяет, что относительный путь из закодированных данных (имя файла архива, имя словаря)
+    не выйдет за пределы каталога, к которому он присоединяется.
+
+    :param path: путь относительно каталога с разделителями '/'
+    :return: True, если путь относительный и не содержит '..'
+    """
+    parts = path.split('/')
+    return bool(path) and not path.startswith('/') and '..' not in parts and '\\' not in path and \
+        not os.path.splitdrive(path)[0]
+
+
 class FileHandler:
     def __init__(self, file_path: str) -> None:
         """
@@ -28,19 +56,139 @@ class FileHandler:
             logging.exception(f"Ошибка при чтении файла '{self.file_path}': {e}")
             return None
 
+    @contextmanager
+    def map_file(self, offset: int = 0, length: Optional[int] = None) -> Iterator[Optional[memoryview]]:
+        """
+        Отображает файл в память и отдаёт его участок как memoryview без копирования в кучу.
+
+        :param offset: смещение начала участка в файле
+        :param length: длина участка в байтах (None — до конца файла)
+        :return: контекстный менеджер с memoryview участка или None в случае ошибки
+        """
+        try:
+            file = open(self.file_path, 'rb')
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении файла '{self.file_path}': {e}")
+            yield None
+            return
+
+        with file:
+            if length is None:
+                length = os.fstat(file.fileno()).st_size - offset
+            if length <= 0:
+                # Пустой файл отобразить нельзя
+                yield memoryview(b'')
+                return
+            try:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                logging.exception(f"Ошибка при отображении файла '{self.file_path}' в память: {e}")
+                yield None
+                return
+            view = memoryview(mapped)[offset:offset + length]
+            try:
+                yield view
+            finally:
+                self._close_mapping(mapped, view)
+
+    @staticmethod
+    def _close_mapping(mapped: mmap.mmap, view: memoryview) -> None:
+        """
+        Освобождает memoryview и закрывает отображение. Если на буфер ещё есть ссылки
+        (например, массив NumPy), отображение закроется при сборке мусора.
+
+        :param mapped: отображение файла
+        :param view: memoryview отображения
+        """
+        try:
+            view.release()
+            mapped.close()
+        except BufferError:
+            pass
+
+    def iter_chunks(self, buffer_size: int = DEFAULT_BUFFER_SIZE, offset: int = 0,
+                    length: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Читает файл блоками фиксированного размера, не загружая его целиком в память.
+
+        :param buffer_size: размер блока в байтах
+        :param offset: смещение в файле, с которого начинается чтение
+        :param length: количество читаемых байтов (None — до конца файла)
+        :return: итератор по блокам данных
+        """
+        with open(self.file_path, 'rb') as file:
+            file.seek(offset)
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = file.read(buffer_size if remaining is None else min(buffer_size, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def iter_sample(self, sample_size: int, block_size: int = SAMPLE_BLOCK_SIZE) -> Iterator[bytes]:
+        """
+        Читает выборку из блоков, равномерно расставленных по файлу: первый блок начинается
+        в начале файла, последний заканчивается в его конце. Файл не больше выборки читается целиком.
+
+        :param sample_size: размер выборки в байтах
+        :param block_size: размер одного блока выборки в байтах
+        :return: итератор по блокам выборки
+        """
+        file_size = os.path.getsize(self.file_path)
+        if file_size <= sample_size:
+            yield from self.iter_chunks(block_size)
+            return
+        block_size = max(1, min(block_size, sample_size))
+        block_count = max(1, sample_size // block_size)
+        stride = (file_size - block_size) / (block_count - 1) if block_count > 1 else 0
+        with open(self.file_path, 'rb') as file:
+            for index in range(block_count):
+                file.seek(int(index * stride))
+                yield file.read(block_size)
+
     @staticmethod
-    def write_file(file_path: str, data: bytes) -> None:
+    def write_file(file_path: str, data: bytes) -> bool:
         """
         Записывает данные в файл.
 
         :param file_path: путь к файлу
         :param data: данные для записи (байтовая строка)
+        :return: True, если файл успешно записан
         """
         try:
             with open(file_path, 'wb') as file:
                 file.write(data)
+            return True
         except IOError as e:
             logging.exception(f"Ошибка при записи файла '{file_path}': {e}")
+            return False
+
+    @staticmethod
+    def write_file_chunks(file_path: str, chunks: Iterable[bytes]) -> bool:
+        """
+        Записывает данные по мере их поступления во временный файл и заменяет им файл
+        только после успешной записи, поэтому при ошибке частично записанных данных не остаётся.
+
+        :param file_path: путь к файлу
+        :param chunks: итератор по блокам данных (ValueError итератора означает повреждённые данные)
+        :return: True, если файл успешно записан
+        """
+        temporary_path = file_path + '.tmp'
+        try:
+            with open(temporary_path, 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+            os.replace(temporary_path, file_path)
+            return True
+        except (IOError, ValueError) as e:
+            logging.exception(f"Ошибка при записи файла '{file_path}': {e}")
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            return False
 
     def file_exists(self) -> bool:
         """
@@ -83,7 +231,29 @@ class FileHandler:
         return self.generate_unique_filename(self.base_name + "_decoded", extension)
 
     @staticmethod
-    def write_encoded_file(encoded_file_path: str, codes_serialized: bytes, extra_bits: int, extension: str, encoded_bytes: bytes) -> None:
+    def write_encoded_header(file: BinaryIO, codes_serialized: bytes, extra_bits: int, extension: str) -> None:
+        """
+        Записывает заголовок закодированного файла: кодовую таблицу, количество дополнительных битов и расширение.
+
+        :param file: файловый объект, открытый на запись
+        :param codes_serialized: сериализованная кодовая таблица
+        :param extra_bits: количество дополнительных битов
+        :param extension: оригинальное расширение файла
+        """
+        extension_bytes = extension.encode('utf-8')
+        # Записываем размер кодовой таблицы (4 байта, unsigned int)
+        file.write(struct.pack('I', len(codes_serialized)))
+        # Записываем кодовую таблицу
+        file.write(codes_serialized)
+        # Записываем количество дополнительных битов (1 байт)
+        file.write(bytes([extra_bits]))
+        # Записываем длину расширения (4 байта, unsigned int)
+        file.write(struct.pack('I', len(extension_bytes)))
+        # Записываем само расширение
+        file.write(extension_bytes)
+
+    @staticmethod
+    def write_encoded_file(encoded_file_path: str, codes_serialized: bytes, extra_bits: int, extension: str, encoded_bytes: bytes) -> bool:
         """
         Записывает закодированные данные и кодовую таблицу в файл, включая информацию об оригинальном расширении.
 
@@ -92,27 +262,141 @@ class FileHandler:
         :param extra_bits: количество дополнительных битов
         :param extension: оригинальное расширение файла
         :param encoded_bytes: закодированные данные в виде байтовой строки
+        :return: True, если файл успешно записан
         """
-        codes_size = len(codes_serialized)
-        extension_bytes = extension.encode('utf-8')
-        extension_length = len(extension_bytes)
+        return FileHandler.write_encoded_stream(encoded_file_path, codes_serialized, extra_bits, extension, [encoded_bytes])
 
+    @staticmethod
+    def write_encoded_stream(encoded_file_path: str, codes_serialized: bytes, extra_bits: int, extension: str,
+                             chunks: Iterable[bytes]) -> bool:
+        """
+        Записывает заголовок и закодированные данные по мере их поступления; формат совпадает с write_encoded_file.
+
+        :param encoded_file_path: путь к закодированному файлу
+        :param codes_serialized: сериализованная кодовая таблица
+        :param extra_bits: количество дополнительных битов
+        :param extension: оригинальное расширение файла
+        :param chunks: итератор по блокам закодированных данных
+        :return: True, если файл успешно записан
+        """
         try:
             with open(encoded_file_path, 'wb') as file:
-                # Записываем размер кодовой таблицы (4 байта, unsigned int)
-                file.write(struct.pack('I', codes_size))
-                # Записываем кодовую таблицу
-                file.write(codes_serialized)
-                # Записываем количество дополнительных битов (1 байт)
-                file.write(bytes([extra_bits]))
-                # Записываем длину расширения (4 байта, unsigned int)
-                file.write(struct.pack('I', extension_length))
-                # Записываем само расширение
-                file.write(extension_bytes)
+                FileHandler.write_encoded_header(file, codes_serialized, extra_bits, extension)
                 # Записываем закодированные данные
-                file.write(encoded_bytes)
+                for chunk in chunks:
+                    file.write(chunk)
+            return True
         except IOError as e:
             logging.exception(f"Ошибка при записи закодированного файла '{encoded_file_path}': {e}")
+            return False
+
+    @staticmethod
+    def write_encoded_pipelined(encoded_file_path: str, codes_serialized: bytes, extension: str,
+                                chunks: Iterable[bytes], get_extra_bits: Callable[[], int],
+                                flush_size: int = DEFAULT_BUFFER_SIZE, queue_depth: int = DEFAULT_QUEUE_DEPTH) -> bool:
+        """
+        Записывает заголовок и закодированные данные за один проход. Вызывающий поток кодирует
+        и собирает результат в буферы по flush_size байт, отдельный поток пишет их на диск,
+        поэтому кодирование и запись идут одновременно. Очередь ограничена queue_depth буферами,
+        и в памяти находится не больше (queue_depth + 2) * flush_size байт. Количество
+        дополнительных битов становится известно только в конце и дописывается в заголовок.
+
+        :param encoded_file_path: путь к закодированному файлу
+        :param codes_serialized: сериализованная кодовая таблица
+        :param extension: оригинальное расширение файла
+        :param chunks: итератор по блокам закодированных данных
+        :param get_extra_bits: функция, возвращающая количество дополнительных битов после исчерпания chunks
+        :param flush_size: размер буфера одной записи в байтах
+        :param queue_depth: максимальное количество буферов, ожидающих записи
+        :return: True, если файл успешно записан
+        """
+        try:
+            with open(encoded_file_path, 'wb') as file:
+                FileHandler.write_encoded_header(file, codes_serialized, 0, extension)
+                buffers: queue.Queue = queue.Queue(maxsize=queue_depth)
+                errors: List[BaseException] = []
+                writer = threading.Thread(target=FileHandler._write_buffers, args=(file, buffers, errors), daemon=True)
+                writer.start()
+                try:
+                    buffer = bytearray()
+                    for chunk in chunks:
+                        buffer += chunk
+                        if len(buffer) >= flush_size:
+                            buffers.put(buffer)
+                            buffer = bytearray()
+                            if errors:
+                                break
+                    buffers.put(buffer)
+                finally:
+                    buffers.put(None)
+                    writer.join()
+                if errors:
+                    raise errors[0]
+
+                # Количество дополнительных битов следует за размером и содержимым кодовой таблицы
+                file.seek(struct.calcsize('I') + len(codes_serialized))
+                file.write(bytes([get_extra_bits()]))
+            return True
+        except (IOError, ValueError) as e:
+            logging.exception(f"Ошибка при записи закодированного файла '{encoded_file_path}': {e}")
+            return False
+
+    @staticmethod
+    def _write_buffers(file: BinaryIO, buffers: queue.Queue, errors: List[BaseException]) -> None:
+        """
+        Пишет буферы из очереди в файл до получения None. После ошибки записи очередь
+        продолжает разбираться, чтобы кодирующий поток не заблокировался.
+
+        :param file: файловый объект, открытый на запись
+        :param buffers: очередь буферов
+        :param errors: список, в который добавляется ошибка записи
+        """
+        while True:
+            buffer = buffers.get()
+            if buffer is None:
+                return
+            if errors:
+                continue
+            try:
+                file.write(buffer)
+            except IOError as e:
+                errors.append(e)
+
+    @staticmethod
+    def write_encoded_mapped(encoded_file_path: str, codes_serialized: bytes, extra_bits: int, extension: str,
+                             payload_length: int, pack: Callable[[memoryview], None], trailer: bytes = b'') -> bool:
+        """
+        Записывает заголовок, затем выделяет под закодированные данные место в файле заранее
+        известного размера и упаковывает их прямо в отображённую память.
+
+        :param encoded_file_path: путь к закодированному файлу
+        :param codes_serialized: сериализованная кодовая таблица
+        :param extra_bits: количество дополнительных битов
+        :param extension: оригинальное расширение файла
+        :param payload_length: длина закодированных данных в байтах
+        :param pack: функция, заполняющая переданный буфер закодированными данными
+        :param trailer: данные, записываемые после закодированных (например, индекс)
+        :return: True, если файл успешно записан
+        """
+        try:
+            with open(encoded_file_path, 'w+b') as file:
+                FileHandler.write_encoded_header(file, codes_serialized, extra_bits, extension)
+                payload_offset = file.tell()
+                file.truncate(payload_offset + payload_length)
+                if payload_length:
+                    mapped = mmap.mmap(file.fileno(), payload_offset + payload_length)
+                    view = memoryview(mapped)[payload_offset:]
+                    try:
+                        pack(view)
+                        mapped.flush()
+                    finally:
+                        FileHandler._close_mapping(mapped, view)
+                file.seek(payload_offset + payload_length)
+                file.write(trailer)
+            return True
+        except (IOError, ValueError) as e:
+            logging.exception(f"Ошибка при записи закодированного файла '{encoded_file_path}': {e}")
+            return False
 
     def read_encoded_file(self) -> Optional[Tuple[bytes, int, bytes, str]]:
         """
@@ -121,40 +405,196 @@ class FileHandler:
         :return: кортеж из сериализованной кодовой таблицы, количества дополнительных битов, закодированных байтов и расширения
                  или все None в случае ошибки
         """
-        #сделать декомпоз
+        header = self.read_encoded_header()
+        if header is None:
+            return None
+        codes_serialized, extra_bits, extension, payload_offset = header
+
+        if not codes_serialized:
+            return codes_serialized, extra_bits, b'', extension
+
+        try:
+            with open(self.file_path, 'rb') as file:
+                payload_length = self.read_trailer(file, payload_offset, extra_bits)[0]
+                file.seek(payload_offset)
+                encoded_bytes = file.read(payload_length)
+        except ValueError as e:
+            logging.error(f"{e} Файл: '{self.file_path}'.")
+            return None
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении файла '{self.file_path}': {e}")
+            return None
+
+        if not encoded_bytes and extra_bits != 0:
+            logging.error("Файл поврежден или имеет неверный формат (нет закодированных данных, но указано наличие дополнительных битов).")
+            return None
+        return codes_serialized, extra_bits, encoded_bytes, extension
+
+    def read_encoded_header(self) -> Optional[Tuple[bytes, int, str, int]]:
+        """
+        Читает заголовок закодированного файла, не загружая закодированные данные.
+
+        :return: кортеж из сериализованной кодовой таблицы, количества дополнительных битов, расширения
+                 и смещения начала закодированных данных или None в случае ошибки
+        """
+        try:
+            with open(self.file_path, 'rb') as file:
+                return self.parse_encoded_header(file)
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении файла '{self.file_path}': {e}")
+            return None
+
+    @staticmethod
+    def parse_encoded_header(file: BinaryIO) -> Optional[Tuple[bytes, int, str, int]]:
+        """
+        Разбирает заголовок закодированных данных из файлового объекта, в том числе из io.BytesIO.
+
+        :param file: файловый объект, позиция которого стоит на начале заголовка
+        :return: кортеж из сериализованной кодовой таблицы, количества дополнительных битов, расширения
+                 и смещения начала закодированных данных или None в случае ошибки
+        """
+        codes_size_data = file.read(4)
+        if len(codes_size_data) < 4:
+            logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для размера кодовой таблицы).")
+            return None
+        codes_size = struct.unpack('I', codes_size_data)[0]
+
+        if codes_size > 0:
+            codes_serialized = file.read(codes_size)
+            if len(codes_serialized) < codes_size:
+                logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для кодовой таблицы).")
+                return None
+        else:
+            codes_serialized = b''
+
+        extra_bits, extension = FileHandler._read_extra_bits_and_extension(file)
+        if extra_bits is None or extension is None:
+            return None
+
+        return codes_serialized, extra_bits, extension, file.tell()
+
+    @staticmethod
+    def read_trailer(file: BinaryIO, payload_offset: int,
+                     extra_bits: int) -> Tuple[int, Optional[SyncIndex], Optional[ContentChecksum]]:
+        """
+        Читает данные, записанные после закодированных: индекс точек синхронизации и контрольную
+        сумму, которая всегда стоит последней.
+
+        :param file: файловый объект закодированного файла (с произвольным доступом, в том числе io.BytesIO)
+        :param payload_offset: смещение начала закодированных данных в файле
+        :param extra_bits: количество дополнительных битов
+        :return: кортеж из длины закодированных данных, индекса и контрольной суммы (None, если их нет)
+        :raises ValueError: если контрольная сумма найдена, но закодированные данные и индекс
+                            не доходят ровно до её начала (окончание обрезано или дополнено)
+        """
+        file_size = file.seek(0, os.SEEK_END)
+        checksum = ContentChecksum.read(file, payload_offset)
+        index_end = file_size - CHECKSUM_FOOTER.size if checksum is not None else None
+        sync_index = SyncIndex.read(file, payload_offset, extra_bits, index_end)
+        if checksum is not None and (payload_offset + checksum.payload_length != index_end if sync_index is None
+                                     else sync_index.payload_length != checksum.payload_length):
+            raise ValueError("Файл поврежден: длина закодированных данных не совпадает с записанной в окончании.")
+        if checksum is not None:
+            payload_length = checksum.payload_length
+        elif sync_index is not None:
+            payload_length = sync_index.payload_length
+        else:
+            payload_length = file_size - payload_offset
+        return payload_length, sync_index, checksum
+
+    def read_encoded_trailer(self, payload_offset: int,
+                             extra_bits: int) -> Optional[Tuple[int, Optional[SyncIndex], Optional[ContentChecksum]]]:
+        """
+        Открывает закодированный файл и читает данные, записанные после закодированных.
+
+        :param payload_offset: смещение начала закодированных данных в файле
+        :param extra_bits: количество дополнительных битов
+        :return: результат read_trailer или None в случае ошибки
+        """
+        try:
+            with open(self.file_path, 'rb') as file:
+                return self.read_trailer(file, payload_offset, extra_bits)
+        except ValueError as e:
+            logging.error(f"{e} Файл: '{self.file_path}'.")
+            return None
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении индекса файла '{self.file_path}': {e}")
+            return None
+
+    def read_sync_index(self, payload_offset: int, extra_bits: int) -> Optional[SyncIndex]:
+        """
+        Читает индекс точек синхронизации, записанный после закодированных данных.
+
+        :param payload_offset: смещение начала закодированных данных в файле
+        :param extra_bits: количество дополнительных битов
+        :return: экземпляр SyncIndex или None, если индекса нет или произошла ошибка
+        """
+        trailer = self.read_encoded_trailer(payload_offset, extra_bits)
+        return trailer[1] if trailer is not None else None
+
+    def read_checksum(self, payload_offset: int) -> Optional[ContentChecksum]:
+        """
+        Читает длину и CRC32 исходных данных, записанные в конце закодированного файла.
+
+        :param payload_offset: смещение начала закодированных данных в файле
+        :return: экземпляр ContentChecksum или None, если контрольной суммы нет или произошла ошибка
+        """
         try:
             with open(self.file_path, 'rb') as file:
-                codes_size_data = file.read(4)
-                if len(codes_size_data) < 4:
-                    logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для размера кодовой таблицы).")
-                    return None
-                codes_size = struct.unpack('I', codes_size_data)[0]
-
-                if codes_size > 0:
-                    codes_serialized = file.read(codes_size)
-                    if len(codes_serialized) < codes_size:
-                        logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для кодовой таблицы).")
-                        return None
-                else:
-                    codes_serialized = b''
-
-                extra_bits, extension = self._read_extra_bits_and_extension(file)
-                if extra_bits is None or extension is None:
-                    return None
-
-                if codes_size > 0:
-                    encoded_bytes = file.read()
-                    if not encoded_bytes and extra_bits != 0:
-                        logging.error("Файл поврежден или имеет неверный формат (нет закодированных данных, но указано наличие дополнительных битов).")
-                        return None
-                else:
-                    encoded_bytes = b''
-
-                return codes_serialized, extra_bits, encoded_bytes, extension
+                # Окончание разбирается целиком, чтобы обрезанное или дополненное считалось повреждённым
+                return self.read_trailer(file, payload_offset, 0)[2]
+        except ValueError as e:
+            logging.error(f"{e} Файл: '{self.file_path}'.")
+            return None
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении контрольной суммы файла '{self.file_path}': {e}")
+            return None
 
+    def get_payload_length(self, payload_offset: int, extra_bits: int) -> int:
+        """
+        Возвращает длину закодированных данных без индекса точек синхронизации и контрольной суммы.
+
+        :param payload_offset: смещение начала закодированных данных в файле
+        :param extra_bits: количество дополнительных битов
+        :return: длина закодированных данных в байтах
+        """
+        trailer = self.read_encoded_trailer(payload_offset, extra_bits)
+        if trailer is not None:
+            return trailer[0]
+        return os.path.getsize(self.file_path) - payload_offset
+
+    def read_payload_bits(self, payload_offset: int, start_bit: int, end_bit: int) -> Optional[Tuple[bytes, int]]:
+        """
+        Читает участок закодированных данных с точностью до бита и выравнивает его по началу байта.
+
+        :param payload_offset: смещение начала закодированных данных в файле
+        :param start_bit: битовое смещение начала участка
+        :param end_bit: битовое смещение конца участка
+        :return: кортеж из выровненных байтов и количества дополнительных битов в последнем байте
+                 или None в случае ошибки
+        """
+        first_byte = start_bit // 8
+        byte_count = (end_bit + 7) // 8 - first_byte
+        try:
+            with open(self.file_path, 'rb') as file:
+                file.seek(payload_offset + first_byte)
+                data = file.read(byte_count)
         except IOError as e:
             logging.exception(f"Ошибка при чтении файла '{self.file_path}': {e}")
             return None
+        if len(data) < byte_count:
+            logging.error("Файл поврежден или имеет неверный формат (недостаточно закодированных данных).")
+            return None
+
+        bit_count = end_bit - start_bit
+        extra_bits = (8 - bit_count % 8) % 8
+        skip_bits = start_bit % 8
+        if skip_bits:
+            # Сдвигаем участок влево на skip_bits бит; лишние биты в конце отбрасываются
+            value = int.from_bytes(data, 'big') & ((1 << (len(data) * 8 - skip_bits)) - 1)
+            value >>= len(data) * 8 - skip_bits - bit_count
+            data = (value << extra_bits).to_bytes((bit_count + extra_bits) // 8, 'big')
+        return data, extra_bits
 
     @staticmethod
     def _read_extra_bits_and_extension(file) -> Tuple[Optional[int], Optional[str]]:
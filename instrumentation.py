@@ -0,0 +1,284 @@
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_PROFILE_LINES = 25
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Возвращает пиковый объём резидентной памяти текущего процесса в МБ.
+
+    :return: пиковый RSS или None, если модуль resource недоступен
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS — байты
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+class _Phase:
+    def __init__(self, report: 'OperationReport', name: str) -> None:
+        """
+        Замер одного участка операции; время участков с одним именем суммируется.
+        Время вложенного участка не входит во время объемлющего.
+
+        :param report: отчёт операции
+        :param name: имя участка
+        """
+        self.report: OperationReport = report
+        self.name: str = name
+
+    def __enter__(self) -> None:
+        report = self.report
+        report._charge()
+        report._active.append(self.name)
+
+    def __exit__(self, *exc_info) -> None:
+        report = self.report
+        report._charge()
+        report._active.pop()
+
+
+class OperationReport:
+    def __init__(self, operation: str, path: str) -> None:
+        """
+        Отчёт об одной операции кодирования или декодирования.
+
+        :param operation: 'encode', 'decode' или 'verify'
+        :param path: путь к обрабатываемому файлу
+        """
+        self.operation: str = operation
+        self.path: str = path
+        self.phases: Dict[str, float] = {}
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+        self.elapsed: float = 0.0
+        self.ok: bool = False
+        self.peak_rss_mb: Optional[float] = None
+        self.peak_traced_mb: Optional[float] = None
+        self.profile: Optional[str] = None
+        # Показатели конкретной операции, например потери сжатия от таблицы по выборке
+        self.metrics: Dict[str, float] = {}
+        self._active: List[str] = []
+        self._mark: float = 0.0
+
+    def phase(self, name: str) -> _Phase:
+        """
+        Возвращает контекстный менеджер, добавляющий время участка к фазе name.
+
+        :param name: имя фазы, например 'count', 'pack', 'write'
+        :return: контекстный менеджер замера
+        """
+        return _Phase(self, name)
+
+    def _charge(self) -> None:
+        """
+        Добавляет время с предыдущей отметки к выполняемой сейчас фазе.
+        """
+        now = time.perf_counter()
+        if self._active:
+            name = self._active[-1]
+            self.phases[name] = self.phases.get(name, 0.0) + now - self._mark
+        self._mark = now
+
+    def add_bytes(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        """
+        Учитывает прочитанные и записанные байты.
+
+        :param bytes_in: количество байтов на входе операции
+        :param bytes_out: количество байтов на выходе операции
+        """
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def set_metric(self, name: str, value: float) -> None:
+        """
+        Записывает показатель операции.
+
+        :param name: имя показателя
+        :param value: значение
+        """
+        self.metrics[name] = value
+
+    @property
+    def throughput(self) -> float:
+        """
+        Возвращает скорость операции в МБ/с по входным данным.
+        """
+        return self.bytes_in / self.elapsed / 1e6 if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Возвращает отчёт в виде словаря для сериализации в JSON.
+
+        :return: словарь полей отчёта
+        """
+        return {
+            'operation': self.operation,
+            'path': self.path,
+            'ok': self.ok,
+            'elapsed_seconds': self.elapsed,
+            'phases_seconds': self.phases,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'throughput_mb_s': self.throughput,
+            'peak_rss_mb': self.peak_rss_mb,
+            'peak_traced_mb': self.peak_traced_mb,
+            'profile': self.profile,
+            'metrics': self.metrics,
+        }
+
+    def to_json(self) -> str:
+        """
+        Сериализует отчёт в одну строку JSON.
+
+        :return: строка JSON
+        """
+        import json
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+class _NullPhase:
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class _NullReport(OperationReport):
+    """
+    Отчёт выключенной инструментации: замеры не выполняются, один объект на процесс.
+    Его общими полями пользуются все потоки, поэтому после создания запись в них игнорируется.
+    """
+    _null_phase = _NullPhase()
+    _sealed = False
+
+    def __init__(self, operation: str, path: str) -> None:
+        super().__init__(operation, path)
+        object.__setattr__(self, '_sealed', True)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        if not self._sealed:
+            super().__setattr__(name, value)
+
+    def phase(self, name: str) -> _NullPhase:
+        return self._null_phase
+
+    def add_bytes(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        pass
+
+    def set_metric(self, name: str, value: float) -> None:
+        pass
+
+
+Observer = Callable[[OperationReport], None]
+
+
+class Instrumentation:
+    def __init__(self, observers: Iterable[Observer] = (), profile: bool = False, trace_memory: bool = False,
+                 profile_lines: int = DEFAULT_PROFILE_LINES) -> None:
+        """
+        Собирает отчёты об операциях кодирования и декодирования и передаёт их наблюдателям.
+
+        :param observers: функции, вызываемые с готовым отчётом каждой операции
+        :param profile: выполнять операцию под cProfile и сохранять в отчёт самые затратные функции
+        :param trace_memory: отслеживать пиковый объём выделенной Python памяти через tracemalloc
+                             (заметно замедляет работу)
+        :param profile_lines: количество функций в выводе профилировщика
+        """
+        self.observers: List[Observer] = list(observers)
+        self.profile: bool = profile
+        self.trace_memory: bool = trace_memory
+        self.profile_lines: int = profile_lines
+
+    def add_observer(self, observer: Observer) -> None:
+        """
+        Добавляет наблюдателя.
+
+        :param observer: функция, вызываемая с готовым отчётом каждой операции
+        """
+        self.observers.append(observer)
+
+    @contextmanager
+    def operation(self, operation: str, path: str) -> Iterator[OperationReport]:
+        """
+        Замеряет операцию целиком и по окончании передаёт отчёт наблюдателям.
+
+        :param operation: 'encode', 'decode' или 'verify'
+        :param path: путь к обрабатываемому файлу
+        :return: отчёт, в который операция записывает фазы и объёмы данных
+        """
+        report = OperationReport(operation, path)
+        profiler = None
+        if self.profile:
+            # Профилировщик загружается только по запросу, чтобы не замедлять запуск
+            import cProfile
+            profiler = cProfile.Profile()
+        tracing = False
+        if self.trace_memory:
+            # tracemalloc при импорте загружает pickle и tokenize, поэтому тоже импортируется по запросу
+            import tracemalloc
+            tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        start_time = time.perf_counter()
+        try:
+            yield report
+        finally:
+            report.elapsed = time.perf_counter() - start_time
+            if profiler is not None:
+                profiler.disable()
+                import io
+                import pstats
+                output = io.StringIO()
+                pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(self.profile_lines)
+                report.profile = output.getvalue()
+            if tracing:
+                report.peak_traced_mb = tracemalloc.get_traced_memory()[1] / (1 << 20)
+                tracemalloc.stop()
+            report.peak_rss_mb = peak_rss_mb()
+            for observer in self.observers:
+                try:
+                    observer(report)
+                except Exception as e:
+                    # Ошибка системы метрик не должна прерывать кодирование
+                    logging.exception(f"Ошибка наблюдателя инструментации: {e}")
+
+
+class _DisabledInstrumentation(Instrumentation):
+    """
+    Инструментация по умолчанию: операции не замеряются и отчёты не создаются.
+    """
+    null_report = _NullReport('', '')
+
+    @contextmanager
+    def operation(self, operation: str, path: str) -> Iterator[OperationReport]:
+        yield self.null_report
+
+
+DISABLED = _DisabledInstrumentation()
+
+
+def json_lines_observer(path: str) -> Observer:
+    """
+    Создаёт наблюдателя, дописывающего каждый отчёт строкой JSON в файл.
+
+    :param path: путь к файлу отчётов
+    :return: функция-наблюдатель
+    """
+    def write_report(report: OperationReport) -> None:
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(report.to_json() + '\n')
+    return write_report
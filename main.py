@@ -1,8 +1,28 @@
+import sys
+from typing import List, Optional
+
+from batch import run_cli
 from encoder import Encoder
 from decoder import Decoder
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Запускает пакетную обработку, если переданы аргументы командной строки,
+    иначе интерактивное меню.
+
+    :param argv: аргументы командной строки без имени программы (None — sys.argv)
+    :return: код завершения
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv:
+        return run_cli(argv)
+    run_interactive()
+    return 0
+
+
+def run_interactive() -> None:
     while True:
         print("\n=== Shannon-Fano Codec ===")
         print("Выберите действие:")
@@ -34,4 +54,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
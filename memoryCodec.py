@@ -0,0 +1,246 @@
+import io
+import logging
+import struct
+from typing import Optional, Union
+
+from blockCodec import BLOCK_MAGIC
+from byteHistogram import ByteHistogram
+from codeDictionary import CodeDictionary
+from codeTable import CodeTable
+from contentChecksum import CHECKSUM_FOOTER, CHECKSUM_MAGIC, ContentChecksum
+from contextModel import ContextModel, ContextTableDecoder
+from decoder import load_table_decoder
+from fileHandler import FileHandler
+from numpyBackend import NumpyTableDecoder, make_bit_writer, resolve_backend
+from segmentCodec import SEGMENT_MAGIC
+from syncIndex import SyncIndex
+from tableDecoder import TableDecoder
+
+# Наибольший заголовок, который накапливает StreamDecoder: таблица контекстной модели с запасом
+MAX_STREAM_HEADER_SIZE = 1 << 20
+# Поля заголовка вокруг кодовой таблицы: её размер, затем дополнительные биты и длина расширения
+HEADER_LENGTH = struct.Struct('I')
+
+
+def encode_bytes(data: bytes, backend: str = 'auto', extension: str = '',
+                 dictionary: Optional[CodeDictionary] = None, sync_interval: Optional[int] = None,
+                 context_model: bool = False) -> Optional[bytes]:
+    """
+    Кодирует данные в памяти в тот же формат, что и Encoder для файла, без обращения к диску.
+
+    :param data: исходные данные
+    :param backend: движок кодирования, 'auto', 'python' или 'numpy'
+    :param extension: расширение, записываемое в заголовок
+    :param dictionary: словарь, таблица которого используется вместо построенной по данным
+    :param sync_interval: интервал точек синхронизации в байтах (None — без индекса)
+    :param context_model: кодировать моделью порядка 1 (без словаря и точек синхронизации)
+    :return: закодированные данные или None, если словарь не покрывает данные или параметры несовместимы
+    """
+    backend = resolve_backend(backend)
+    output = io.BytesIO()
+    if not data:
+        FileHandler.write_encoded_header(output, b'', 0, extension)
+        return output.getvalue()
+
+    sync_index = None
+    if context_model:
+        if dictionary is not None or sync_interval:
+            logging.error("Контекстная модель не сочетается с точками синхронизации и словарём.")
+            return None
+        model = ContextModel(backend)
+        model.update(data)
+        model.build()
+        codes_serialized = model.serialize()
+        encoded_bytes, extra_bits = model.bit_writer().pack(data, model.encoded_bit_length())
+    else:
+        frequencies = ByteHistogram.from_data(data, backend)
+        if dictionary is None:
+            code_table = CodeTable()
+            code_table.build_from_frequencies(frequencies)
+            codes_serialized = code_table.serialize()
+        elif dictionary.covers(frequencies):
+            code_table = dictionary.code_table
+            codes_serialized = dictionary.reference()
+        else:
+            logging.error(f"Словарь '{dictionary.name}' не содержит кодов для всех байтов данных.")
+            return None
+        encoded_bytes, extra_bits = make_bit_writer(code_table.codes, backend).pack(
+            data, code_table.encoded_bit_length(frequencies))
+        if sync_interval:
+            sync_index = SyncIndex(sync_interval, code_table.codes)
+            sync_index.update(data)
+
+    FileHandler.write_encoded_header(output, codes_serialized, extra_bits, extension)
+    output.write(encoded_bytes)
+    if sync_index is not None:
+        output.write(sync_index.serialize())
+    checksum = ContentChecksum()
+    checksum.update(data)
+    output.write(checksum.serialize(len(encoded_bytes)))
+    return output.getvalue()
+
+
+def decode_bytes(encoded: bytes, backend: str = 'auto', dictionary_dir: str = '.') -> Optional[bytes]:
+    """
+    Декодирует данные в памяти, закодированные encode_bytes или Encoder без блочного режима.
+
+    :param encoded: закодированные данные вместе с заголовком
+    :param backend: движок декодирования, 'auto', 'python' или 'numpy'
+    :param dictionary_dir: каталог словарей для данных, закодированных со словарём
+    :return: декодированные данные или None в случае ошибки
+    """
+    if encoded[:len(BLOCK_MAGIC)] == BLOCK_MAGIC:
+        logging.error("Блочный контейнер декодируется только из файла.")
+        return None
+    if encoded[:len(SEGMENT_MAGIC)] == SEGMENT_MAGIC:
+        logging.error("Файл с сегментами декодируется только из файла.")
+        return None
+    backend = resolve_backend(backend)
+    stream = io.BytesIO(encoded)
+    header = FileHandler.parse_encoded_header(stream)
+    if header is None:
+        return None
+    codes_serialized, extra_bits, _, payload_offset = header
+    if not codes_serialized:
+        return b''
+
+    table_decoder = load_table_decoder(codes_serialized, backend, dictionary_dir)
+    if table_decoder is None:
+        return None
+    try:
+        payload_length, _, expected = FileHandler.read_trailer(stream, payload_offset, extra_bits)
+    except ValueError as e:
+        logging.error(str(e))
+        return None
+    if not payload_length and extra_bits != 0:
+        logging.error("Данные повреждены (нет закодированных данных, но указано наличие дополнительных битов).")
+        return None
+    decoded_data = table_decoder.decode(memoryview(encoded)[payload_offset:payload_offset + payload_length], extra_bits)
+    if expected is not None:
+        checksum = ContentChecksum()
+        checksum.update(decoded_data)
+        if not checksum.matches(expected):
+            logging.error(checksum.describe_mismatch(expected))
+            return None
+    return decoded_data
+
+
+class StreamDecoder:
+    def __init__(self, backend: str = 'auto', dictionary_dir: str = '.') -> None:
+        """
+        Декодирует поток закодированных данных по частям без сохранения потока целиком.
+        Заголовок накапливается, пока не будет получен полностью; из данных удерживаются
+        только последние байты, которые могут оказаться окончанием с контрольной суммой.
+        Декодированные блоки отдаются до проверки длины и CRC32, которая выполняется в finish.
+
+        Индекс точек синхронизации стоит между данными и окончанием и в потоке неотличим
+        от данных: поток с индексом декодируется с ошибкой длины в finish.
+
+        :param backend: движок декодирования, 'auto', 'python' или 'numpy'
+        :param dictionary_dir: каталог словарей для данных, закодированных со словарём
+        """
+        self.backend: str = resolve_backend(backend)
+        self.dictionary_dir: str = dictionary_dir
+        self.table_decoder: Optional[Union[TableDecoder, NumpyTableDecoder, ContextTableDecoder]] = None
+        self.extra_bits: int = 0
+        self.payload_length: int = 0
+        self.checksum: ContentChecksum = ContentChecksum()
+        self._buffer: bytearray = bytearray()
+        self._header_done: bool = False
+        self._empty: bool = False
+
+    def feed(self, data: bytes) -> bytes:
+        """
+        Принимает очередной блок потока.
+
+        :param data: блок закодированных данных
+        :return: декодированные данные, которые уже можно отдать (возможно, пустые)
+        :raises ValueError: если заголовок повреждён или после пустых данных пришли ещё
+        """
+        self._buffer += data
+        if not self._header_done and not self._read_header():
+            return b''
+        if self._empty:
+            if self._buffer:
+                raise ValueError("Данные повреждены: после заголовка пустых данных есть лишние байты.")
+            return b''
+        ready = len(self._buffer) - CHECKSUM_FOOTER.size
+        if ready <= 0:
+            return b''
+        payload = bytes(self._buffer[:ready])
+        del self._buffer[:ready]
+        self.payload_length += len(payload)
+        decoded = self.table_decoder.decode_chunk(payload)
+        self.checksum.update(decoded)
+        return decoded
+
+    def finish(self) -> bytes:
+        """
+        Завершает поток: декодирует последние байты и сверяет длину и CRC32 с окончанием.
+        Окончание обязательно: без него обрезанный поток не отличить от целого, а данные
+        старого формата без контрольной суммы декодирует decode_bytes.
+
+        :return: последние декодированные данные
+        :raises ValueError: если поток обрезан или данные повреждены
+        """
+        if not self._header_done:
+            raise ValueError("Данные повреждены: поток закончился внутри заголовка.")
+        if self._empty:
+            return b''
+        tail = bytes(self._buffer)
+        self._buffer.clear()
+        if len(tail) != CHECKSUM_FOOTER.size or tail[-len(CHECKSUM_MAGIC):] != CHECKSUM_MAGIC:
+            raise ValueError("Данные повреждены: поток обрезан или не содержит окончания с контрольной суммой.")
+        original_length, payload_length, crc32, _ = CHECKSUM_FOOTER.unpack(tail)
+        if payload_length != self.payload_length:
+            raise ValueError(f"Данные повреждены: получено {self.payload_length} байт закодированных данных "
+                             f"вместо {payload_length} (поток с индексом точек синхронизации "
+                             f"декодируется только целиком).")
+        if not payload_length and self.extra_bits != 0:
+            raise ValueError("Данные повреждены (нет закодированных данных, но указано наличие дополнительных битов).")
+        decoded = self.table_decoder.decode_chunk(b'', final=True, extra_bits_count=self.extra_bits)
+        self.checksum.update(decoded)
+        expected = ContentChecksum()
+        expected.original_length, expected.crc32 = original_length, crc32
+        if not self.checksum.matches(expected):
+            raise ValueError(self.checksum.describe_mismatch(expected))
+        return decoded
+
+    def _read_header(self) -> bool:
+        """
+        Разбирает заголовок, если он уже получен полностью, и строит декодер по его таблице.
+
+        :return: True, если заголовок разобран
+        :raises ValueError: если заголовок повреждён или слишком велик
+        """
+        buffer = self._buffer
+        if buffer[:len(BLOCK_MAGIC)] == BLOCK_MAGIC or buffer[:len(SEGMENT_MAGIC)] == SEGMENT_MAGIC:
+            raise ValueError("Блочный контейнер и файл с сегментами декодируются только из файла.")
+        if len(buffer) < HEADER_LENGTH.size:
+            return False
+        codes_size, = HEADER_LENGTH.unpack_from(buffer)
+        extension_position = HEADER_LENGTH.size + codes_size + 1
+        if extension_position + HEADER_LENGTH.size > MAX_STREAM_HEADER_SIZE:
+            raise ValueError("Данные повреждены: кодовая таблица слишком велика.")
+        if len(buffer) < extension_position + HEADER_LENGTH.size:
+            return False
+        extension_length, = HEADER_LENGTH.unpack_from(buffer, extension_position)
+        header_size = extension_position + HEADER_LENGTH.size + extension_length
+        if header_size > MAX_STREAM_HEADER_SIZE:
+            raise ValueError("Данные повреждены: расширение слишком длинное.")
+        if len(buffer) < header_size:
+            return False
+
+        header = FileHandler.parse_encoded_header(io.BytesIO(bytes(buffer[:header_size])))
+        if header is None:
+            raise ValueError("Данные повреждены: не удалось разобрать заголовок.")
+        codes_serialized, self.extra_bits, _, _ = header
+        del buffer[:header_size]
+        self._header_done = True
+        if not codes_serialized:
+            self._empty = True
+            return True
+        self.table_decoder = load_table_decoder(codes_serialized, self.backend, self.dictionary_dir)
+        if self.table_decoder is None:
+            raise ValueError("Не удалось восстановить кодовую таблицу.")
+        return True
@@ -0,0 +1,433 @@
+import importlib.util
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from bitWriter import BitWriter
+from smallAlphabet import FixedLengthDecoder, LookupBitWriter, LookupDecoder, fixed_code_length, is_small_alphabet
+from tableDecoder import TableDecoder
+
+
+class _LazyNumpy:
+    """
+    Заместитель модуля numpy: импорт NumPy занимает десятки миллисекунд, поэтому модуль
+    загружается при первом обращении к атрибуту, то есть только когда движок 'numpy'
+    действительно используется. Полученные атрибуты запоминаются в заместителе.
+    """
+    def __getattr__(self, name: str):
+        import numpy
+        value = getattr(numpy, name)
+        setattr(self, name, value)
+        return value
+
+
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+np = _LazyNumpy() if NUMPY_AVAILABLE else None
+BACKENDS = ('auto', 'python', 'numpy')
+
+LANE_CHUNK_SYMBOLS = 1 << 14
+# Код, сдвинутый на 0..7 бит внутри байта, должен помещаться в 64-битное слово
+MAX_LANE_CODE_LENGTH = 57
+DECODE_CHUNK_BYTES = 1 << 13
+# Окно поиска собирается из 4 байт со сдвигом до 7 бит, поэтому длина кода ограничена 25 битами
+WINDOW_BITS = 25
+PRIMARY_BITS = 12
+JUMP_ROUNDS = 4
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    Определяет фактический движок кодирования по запрошенному.
+
+    :param backend: 'auto', 'python' или 'numpy'
+    :return: 'numpy', если NumPy запрошен (явно или через 'auto') и установлен, иначе 'python'
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный движок '{backend}', допустимые значения: {', '.join(BACKENDS)}")
+    if backend == 'python' or not NUMPY_AVAILABLE:
+        return 'python'
+    return 'numpy'
+
+
+def make_bit_writer(codes: Dict[int, str], backend: str) -> Union[BitWriter, 'NumpyBitWriter']:
+    """
+    Создаёт упаковщик битов для выбранного движка; коды длиннее 57 бит упаковывает BitWriter,
+    маленькие алфавиты без NumPy — LookupBitWriter.
+
+    :param codes: словарь кодов {байт: строка из '0' и '1'}
+    :param backend: фактический движок, 'python' или 'numpy'
+    :return: экземпляр BitWriter, LookupBitWriter или NumpyBitWriter
+    """
+    if backend == 'numpy' and max(map(len, codes.values()), default=0) <= MAX_LANE_CODE_LENGTH:
+        return NumpyBitWriter(codes)
+    if is_small_alphabet(codes):
+        return LookupBitWriter(codes)
+    return BitWriter(codes)
+
+
+def make_table_decoder(codes: Dict[int, str],
+                       backend: str) -> Union[TableDecoder, FixedLengthDecoder, LookupDecoder, 'NumpyTableDecoder']:
+    """
+    Создаёт декодер для выбранного движка; таблицы с кодами длиннее 25 бит декодирует TableDecoder.
+    Коды одинаковой длины 1, 2, 4 или 8 бит при любом движке декодирует FixedLengthDecoder,
+    остальные маленькие алфавиты без NumPy — LookupDecoder.
+
+    :param codes: словарь кодов {байт: строка из '0' и '1'}
+    :param backend: фактический движок, 'python' или 'numpy'
+    :return: экземпляр TableDecoder, FixedLengthDecoder, LookupDecoder или NumpyTableDecoder
+    """
+    if fixed_code_length(codes) is not None:
+        return FixedLengthDecoder(codes)
+    if backend == 'numpy' and max(map(len, codes.values()), default=0) <= WINDOW_BITS:
+        return NumpyTableDecoder(codes)
+    if is_small_alphabet(codes):
+        return LookupDecoder(codes)
+    return TableDecoder(codes)
+
+
+class NumpyBitWriter:
+    def __init__(self, codes: Dict[int, str]) -> None:
+        """
+        Подготавливает таблицы длин и значений кодов для векторной упаковки.
+        Коды должны быть не длиннее 57 бит (см. make_bit_writer).
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'}
+        """
+        self.max_code_length: int = max((len(code) for code in codes.values()), default=1)
+        self.code_lengths = np.zeros(256, dtype=np.int64)
+        self.code_values = np.zeros(256, dtype=np.uint64)
+        for byte, code in codes.items():
+            self.code_lengths[byte] = len(code)
+            self.code_values[byte] = int(code, 2)
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+        self.elapsed: float = 0.0
+        self._pending: int = 0
+        self._pending_bits: int = 0
+
+    def bit_length(self, data: bytes) -> int:
+        """
+        Вычисляет длину закодированных данных в битах без их кодирования.
+
+        :param data: исходные данные в виде байтовой строки
+        :return: количество бит закодированных данных
+        """
+        counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        return int(np.dot(counts, self.code_lengths))
+
+    def pack(self, data: bytes, bit_length: Optional[int] = None) -> Tuple[bytearray, int]:
+        """
+        Упаковывает данные: длины кодов берутся индексированием массива, битовые смещения —
+        накопленной суммой, после чего коды раскладываются в упакованный массив uint8.
+
+        :param data: исходные данные в виде байтовой строки
+        :param bit_length: длина результата в битах, если уже известна
+        :return: кортеж из закодированных байтов и количества дополнительных битов
+        """
+        if bit_length is None:
+            bit_length = self.bit_length(data)
+        encoded_bytes = bytearray((bit_length + 7) // 8)
+        return encoded_bytes, self.pack_into(data, encoded_bytes, bit_length)
+
+    def pack_into(self, data: bytes, encoded_bytes: Union[bytearray, memoryview], bit_length: int) -> int:
+        """
+        Упаковывает данные в переданный обнулённый буфер, например в отображённый в память файл.
+
+        :param data: исходные данные (bytes, memoryview или mmap)
+        :param encoded_bytes: обнулённый буфер размером (bit_length + 7) // 8 байт
+        :param bit_length: длина результата в битах
+        :return: количество дополнительных битов
+        """
+        start_time = time.perf_counter()
+        extra_bits = (8 - bit_length % 8) % 8
+        output = np.frombuffer(encoded_bytes, dtype=np.uint8)
+
+        self._pack_lanes(np.frombuffer(data, dtype=np.uint8), output, 0)
+        del output
+
+        self.bytes_in += len(data)
+        self.bytes_out += len(encoded_bytes)
+        self.elapsed += time.perf_counter() - start_time
+        return extra_bits
+
+    def write(self, data: bytes) -> bytearray:
+        """
+        Упаковывает очередной блок потока; неполный последний байт переносится в следующий вызов.
+
+        :param data: очередной блок исходных данных
+        :return: полностью заполненные байты закодированных данных
+        """
+        start_time = time.perf_counter()
+        symbols = np.frombuffer(data, dtype=np.uint8)
+        bit_length = self._pending_bits + int(np.dot(np.bincount(symbols, minlength=256), self.code_lengths))
+        encoded_bytes = bytearray((bit_length + 7) // 8)
+        output = np.frombuffer(encoded_bytes, dtype=np.uint8)
+        if self._pending_bits:
+            output[0] = self._pending << (8 - self._pending_bits)
+        self._pack_lanes(symbols, output, self._pending_bits)
+
+        whole_bytes = bit_length >> 3
+        self._pending_bits = bit_length & 7
+        self._pending = int(output[whole_bytes]) >> (8 - self._pending_bits) if self._pending_bits else 0
+        del output
+
+        self.bytes_in += len(data)
+        self.bytes_out += whole_bytes
+        self.elapsed += time.perf_counter() - start_time
+        return encoded_bytes[:whole_bytes]
+
+    def flush(self) -> Tuple[bytes, int]:
+        """
+        Завершает поток, дополняя последний байт нулями.
+
+        :return: кортеж из последнего байта (или пустой строки) и количества дополнительных битов
+        """
+        if not self._pending_bits:
+            return b'', 0
+        extra_bits = 8 - self._pending_bits
+        last_byte = bytes((self._pending << extra_bits,))
+        self._pending = 0
+        self._pending_bits = 0
+        self.bytes_out += 1
+        return last_byte, extra_bits
+
+    def _pack_lanes(self, symbols: 'np.ndarray', output: 'np.ndarray', bit_position: int) -> None:
+        """
+        Сдвигает каждый код к его позиции внутри байта и раскладывает полученное
+        64-битное слово по байтам результата. Биты разных кодов не пересекаются,
+        поэтому сумма вкладов в байт через np.bincount равна их побитовому ИЛИ.
+
+        :param symbols: исходные данные в виде массива uint8
+        :param output: буфер результата, заполненный нулями после позиции bit_position
+        :param bit_position: битовая позиция в буфере, с которой записывается первый код
+        """
+        lanes = (self.max_code_length + 7 + 7) // 8
+        for chunk_start in range(0, len(symbols), LANE_CHUNK_SYMBOLS):
+            chunk = symbols[chunk_start:chunk_start + LANE_CHUNK_SYMBOLS]
+            lengths = self.code_lengths[chunk]
+            ends = np.cumsum(lengths) + bit_position
+            starts = ends - lengths
+            first_byte = bit_position >> 3
+            size = ((int(ends[-1]) + 7) >> 3) - first_byte
+            byte_index = (starts >> 3) - first_byte
+            shifted = self.code_values[chunk] << (64 - lengths - (starts & 7)).astype(np.uint64)
+
+            packed = np.zeros(size + lanes, dtype=np.float64)
+            for lane in range(lanes):
+                lane_bytes = (shifted >> np.uint64(56 - 8 * lane)) & np.uint64(0xFF)
+                packed += np.bincount(byte_index + lane, weights=lane_bytes.astype(np.float64),
+                                      minlength=size + lanes)
+            output[first_byte:first_byte + size] |= packed[:size].astype(np.uint8)
+            bit_position = int(ends[-1])
+
+    @property
+    def throughput(self) -> float:
+        """
+        Возвращает скорость упаковки в МБ/с по исходным данным.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.bytes_in / self.elapsed / 1e6
+
+
+class NumpyTableDecoder:
+    def __init__(self, codes: Dict[int, str], primary_bits: int = PRIMARY_BITS) -> None:
+        """
+        Строит таблицы для векторного декодирования: основную по primary_bits бит
+        и отсортированные списки кодов для более длинных кодов. Коды должны быть
+        не длиннее 25 бит (см. make_table_decoder).
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'}
+        :param primary_bits: ширина основной таблицы поиска в битах
+        """
+        self.codes: Dict[int, str] = codes
+        self.max_code_length: int = max((len(code) for code in codes.values()), default=0)
+        self.primary_bits: int = max(1, min(primary_bits, self.max_code_length))
+
+        k = self.primary_bits
+        self.symbols = np.zeros(1 << k, dtype=np.uint8)
+        self.lengths = np.zeros(1 << k, dtype=np.int64)
+        long_codes: Dict[int, List[Tuple[int, int]]] = {}
+        # Короткие коды записываются последними, как и при побитовом поиске побеждает кратчайший
+        for byte, code in sorted(codes.items(), key=lambda item: -len(item[1])):
+            length = len(code)
+            if length > k:
+                long_codes.setdefault(length, []).append((int(code, 2), byte))
+                continue
+            start = int(code, 2) << (k - length)
+            self.symbols[start:start + (1 << (k - length))] = byte
+            self.lengths[start:start + (1 << (k - length))] = length
+
+        self.long_codes: List[Tuple[int, 'np.ndarray', 'np.ndarray']] = []
+        for length in sorted(long_codes):
+            values, symbols = zip(*sorted(long_codes[length]))
+            self.long_codes.append((length, np.array(values, dtype=np.int64), np.array(symbols, dtype=np.uint8)))
+        self.reset()
+
+    def decode(self, encoded_bytes: bytes, extra_bits_count: int) -> bytes:
+        """
+        Декодирует поток по блокам: коды ищутся сразу для всех битовых позиций блока,
+        а цепочка начал кодов восстанавливается прыжками по составным переходам.
+
+        :param encoded_bytes: закодированные данные в виде байтовой строки
+        :param extra_bits_count: количество дополнительных битов в последнем байте
+        :return: декодированные данные в виде байтовой строки
+        """
+        self.reset()
+        return self.decode_chunk(encoded_bytes, True, extra_bits_count)
+
+    def reset(self) -> None:
+        """
+        Сбрасывает состояние потокового декодирования.
+        """
+        self._pending: bytes = b''
+        self._bit_offset: int = 0
+        self._stopped: bool = False
+
+    def decode_chunk(self, encoded_bytes: bytes, final: bool = False, extra_bits_count: int = 0) -> bytes:
+        """
+        Декодирует очередной блок потока. Последний байт блока и байты с незавершённым
+        кодом сохраняются и декодируются вместе со следующим блоком.
+
+        :param encoded_bytes: очередной блок закодированных данных
+        :param final: True для последнего блока потока
+        :param extra_bits_count: количество дополнительных битов в последнем байте последнего блока
+        :return: декодированные данные в виде байтовой строки
+        """
+        if not self.codes or self._stopped:
+            return b''
+
+        # Без перенесённых байтов данные декодируются на месте, без копирования
+        data = self._pending + bytes(encoded_bytes) if self._pending else encoded_bytes
+        # Последний байт промежуточного блока может оказаться последним байтом потока
+        # с дополнительными битами, поэтому он декодируется только со следующим блоком
+        total_bits = len(data) * 8 - (extra_bits_count if final else 8)
+        decoded, position, stopped = self._decode_bits(np.frombuffer(data, dtype=np.uint8),
+                                                       self._bit_offset, total_bits)
+        if final:
+            self.reset()
+        elif stopped and total_bits - position >= self.max_code_length:
+            # Кода нет при достаточном количестве бит — поток повреждён, дальше не декодируем
+            self._stopped = True
+        else:
+            self._pending = bytes(data[position >> 3:])
+            self._bit_offset = position & 7
+        return decoded
+
+    def _decode_bits(self, data: 'np.ndarray', start_bit: int, total_bits: int) -> Tuple[bytes, int, bool]:
+        """
+        Декодирует коды, целиком лежащие в первых total_bits битах данных, начиная с позиции start_bit.
+
+        :param data: закодированные данные в виде массива uint8
+        :param start_bit: битовая позиция первого кода
+        :param total_bits: количество значащих битов
+        :return: кортеж из декодированных байтов, позиции следующего кода
+                 и признака остановки на позиции без подходящего кода
+        """
+        decoded_parts: List[bytes] = []
+        position = start_bit
+        first_chunk = start_bit // 8 // DECODE_CHUNK_BYTES * DECODE_CHUNK_BYTES
+        for chunk_start in range(first_chunk, len(data), DECODE_CHUNK_BYTES):
+            if position >= total_bits:
+                break
+            bit_start = chunk_start * 8
+            chunk_end = min(chunk_start + DECODE_CHUNK_BYTES, len(data))
+            count = min(chunk_end * 8, total_bits) - bit_start
+            if position - bit_start >= count:
+                continue
+
+            windows = self._windows(data, chunk_start, chunk_end)[:count]
+            lengths, symbols = self._lookup(windows, total_bits - bit_start)
+            nodes = self._walk(lengths, position - bit_start, count)
+            last = int(nodes[-1])
+            if lengths[last] == 0:
+                decoded_parts.append(symbols[nodes[:-1]].tobytes())
+                return b''.join(decoded_parts), bit_start + last, True
+            decoded_parts.append(symbols[nodes].tobytes())
+            position = bit_start + last + int(lengths[last])
+
+        return b''.join(decoded_parts), position, False
+
+    @staticmethod
+    def _windows(data: 'np.ndarray', chunk_start: int, chunk_end: int) -> 'np.ndarray':
+        """
+        Собирает 25-битные окна, начинающиеся в каждой битовой позиции блока.
+
+        :param data: закодированные байты
+        :param chunk_start: индекс первого байта блока
+        :param chunk_end: индекс байта за концом блока
+        :return: массив окон длиной 8 * (chunk_end - chunk_start)
+        """
+        size = chunk_end - chunk_start
+        chunk = data[chunk_start:chunk_end + 3].astype(np.uint32)
+        if len(chunk) < size + 3:
+            chunk = np.concatenate((chunk, np.zeros(size + 3 - len(chunk), dtype=np.uint32)))
+        words = (chunk[:size] << 24) | (chunk[1:size + 1] << 16) | (chunk[2:size + 2] << 8) | chunk[3:size + 3]
+        windows = np.empty((size, 8), dtype=np.uint32)
+        for offset in range(8):
+            np.right_shift(words, 7 - offset, out=windows[:, offset])
+        windows = windows.reshape(-1)
+        windows &= (1 << WINDOW_BITS) - 1
+        return windows
+
+    def _lookup(self, windows: 'np.ndarray', valid_bits: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Находит код, начинающийся в каждой позиции; длина 0 означает, что кода нет
+        или он выходит за конец значащих битов.
+
+        :param windows: 25-битные окна для позиций блока
+        :param valid_bits: количество значащих битов от начала блока
+        :return: кортеж из массивов длин кодов и декодированных байтов
+        """
+        index = windows >> (WINDOW_BITS - self.primary_bits)
+        lengths = self.lengths[index]
+        symbols = self.symbols[index]
+
+        unresolved = np.flatnonzero(lengths == 0)
+        for length, values, long_symbols in self.long_codes:
+            if not unresolved.size:
+                break
+            candidates = (windows[unresolved] >> (WINDOW_BITS - length)).astype(np.int64)
+            found = np.minimum(np.searchsorted(values, candidates), len(values) - 1)
+            hit = values[found] == candidates
+            lengths[unresolved[hit]] = length
+            symbols[unresolved[hit]] = long_symbols[found[hit]]
+            unresolved = unresolved[~hit]
+
+        tail_start = max(0, valid_bits - WINDOW_BITS)
+        if tail_start < len(lengths):
+            tail = lengths[tail_start:]
+            tail[np.arange(tail_start, len(lengths)) + tail > valid_bits] = 0
+        return lengths, symbols
+
+    @staticmethod
+    def _walk(lengths: 'np.ndarray', start: int, count: int) -> 'np.ndarray':
+        """
+        Восстанавливает позиции начал кодов от start до конца блока.
+
+        :param lengths: длины кодов для каждой позиции (0 — декодирование останавливается)
+        :param start: позиция первого кода относительно начала блока
+        :param count: количество битовых позиций в блоке
+        :return: упорядоченный массив позиций начал кодов
+        """
+        following = np.arange(count + 1, dtype=np.int64)
+        following[:count] += np.where(lengths == 0, count, lengths)
+        np.minimum(following, count, out=following)
+
+        # Переход сразу на 2^JUMP_ROUNDS кодов; промежуточные позиции восстанавливаются по following
+        jump = following
+        for _ in range(JUMP_ROUNDS):
+            jump = jump[jump]
+
+        starts = []
+        node = start
+        while node < count:
+            starts.append(node)
+            node = int(jump[node])
+
+        row = np.array(starts, dtype=np.int64)
+        rows = [row]
+        for _ in range((1 << JUMP_ROUNDS) - 1):
+            row = following[row]
+            rows.append(row)
+        nodes = np.stack(rows, axis=1).reshape(-1)
+        return nodes[nodes < count]
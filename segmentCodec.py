@@ -0,0 +1,574 @@
+import os
+import struct
+import logging
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from byteHistogram import ByteHistogram
+from codeTable import CodeTable
+from contentChecksum import ContentChecksum
+from fileHandler import DEFAULT_BUFFER_SIZE, FileHandler
+from numpyBackend import NumpyTableDecoder, make_bit_writer, make_table_decoder, resolve_backend
+from smallAlphabet import FixedLengthDecoder, LookupDecoder
+from tableDecoder import TableDecoder
+
+SEGMENT_MAGIC = b'SFSG'
+SEGMENT_FORMAT_VERSION = 2
+# Каталог версии 1 не содержит выборочных окон: такой файл читается, но при дописывании кодируется заново
+SUPPORTED_FORMAT_VERSIONS = (1, SEGMENT_FORMAT_VERSION)
+# Заголовок: сигнатура, версия, смещение каталога сегментов (записывается после данных), длина расширения;
+# за ним расширение в UTF-8
+SEGMENT_HEADER = struct.Struct('<4sBQI')
+# Начало каталога: количество кодовых таблиц и сегментов, размер контрольных окон и CRC32 окон
+# в начале и в конце закодированных данных; за ним таблицы (длина и таблица) и записи сегментов
+DIRECTORY_HEADER = struct.Struct('<IIIII')
+TABLE_LENGTH = struct.Struct('<I')
+# Запись сегмента: смещение данных, исходная длина, длина данных, CRC32, дополнительные биты, номер таблицы
+SEGMENT_ENTRY = struct.Struct('<QQQIBI')
+# С версии 2 за записями сегментов: количество и размер выборочных окон, затем CRC32 каждого окна
+SAMPLE_HEADER = struct.Struct('<II')
+SAMPLE_CRC32 = struct.Struct('<I')
+# Размер окон, по которым проверяется, что исходный файл только дописывался
+PROBE_SIZE = 1 << 16
+# Выборочные окна равномерно покрывают данные между окнами в начале и в конце
+SAMPLE_PROBE_COUNT = 32
+SAMPLE_PROBE_SIZE = 1 << 12
+# Допустимые потери сжатия дописанных данных на уже записанной таблице относительно новой
+# таблицы сегмента вместе с её размером
+DEFAULT_TABLE_TOLERANCE = 0.02
+# Дописанные данные не больше этого размера читаются один раз: между подсчётом частот
+# и кодированием они держатся в памяти
+READ_CACHE_SIZE = 64 << 20
+
+
+class Segment(NamedTuple):
+    offset: int
+    original_length: int
+    payload_size: int
+    crc32: int
+    extra_bits: int
+    table_index: int
+
+
+class SegmentDirectory(NamedTuple):
+    extension: str
+    directory_offset: int
+    # Конец каталога: байты после него остались от прерванного дописывания и ни на что не ссылаются
+    directory_end: int
+    tables: List[bytes]
+    segments: List[Segment]
+    probe_size: int
+    head_crc32: int
+    tail_crc32: int
+    sample_size: int
+    # None для каталога версии 1, в котором выборочных окон нет
+    sample_crc32s: Optional[List[int]]
+
+    @property
+    def original_length(self) -> int:
+        """
+        Возвращает длину уже закодированных исходных данных.
+        """
+        return sum(segment.original_length for segment in self.segments)
+
+    @property
+    def unused_size(self) -> int:
+        """
+        Возвращает размер места, занятого прежними каталогами между данными сегментов.
+        """
+        extension_length = len(self.extension.encode('utf-8'))
+        return self.directory_offset - SEGMENT_HEADER.size - extension_length - \
+            sum(segment.payload_size for segment in self.segments)
+
+
+def is_segmented_file(file_path: str) -> bool:
+    """
+    Проверяет, записан ли файл в формате с сегментами.
+
+    :param file_path: путь к закодированному файлу
+    :return: True, если файл начинается с сигнатуры файла с сегментами
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            return file.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC
+    except IOError:
+        return False
+
+
+def probe_crc32(file_handler: FileHandler, offset: int, length: int) -> int:
+    """
+    Считает CRC32 окна исходного файла.
+
+    :param file_handler: обработчик исходного файла
+    :param offset: смещение окна
+    :param length: длина окна в байтах
+    :return: CRC32 окна
+    """
+    crc32 = 0
+    for chunk in file_handler.iter_chunks(length or 1, offset, length):
+        crc32 = zlib.crc32(chunk, crc32)
+    return crc32
+
+
+def sample_crc32s(file_handler: FileHandler, length: int, count: int, size: int) -> List[int]:
+    """
+    Считает CRC32 выборочных окон, равномерно расставленных по первым length байтам исходного файла.
+
+    :param file_handler: обработчик исходного файла
+    :param length: длина проверяемых данных
+    :param count: количество окон
+    :param size: длина окна в байтах
+    :return: список CRC32 окон
+    """
+    return [probe_crc32(file_handler, (length - size) * (index + 1) // (count + 1), size) for index in range(count)]
+
+
+class SegmentCodec:
+    def __init__(self, encoded_file_path: str, backend: str = 'auto', buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 tolerance: float = DEFAULT_TABLE_TOLERANCE) -> None:
+        """
+        Кодирует растущий файл (например, журнал) сегментами: при повторном кодировании
+        дописывается только новый хвост исходного файла, а каталог сегментов в конце
+        закодированного файла переписывается. Время повторного кодирования зависит
+        от объёма дописанных данных, а не от размера всего файла.
+
+        :param encoded_file_path: путь к закодированному файлу
+        :param backend: движок кодирования: 'auto', 'python' или 'numpy'
+        :param buffer_size: размер блока чтения в байтах
+        :param tolerance: допустимые потери сжатия хвоста на уже записанной таблице (доля)
+        """
+        self.encoded_file_path: str = encoded_file_path
+        self.backend: str = resolve_backend(backend)
+        self.buffer_size: int = buffer_size
+        self.tolerance: float = tolerance
+        # Итоги последнего вызова append: сколько исходных байт закодировано и построена ли новая таблица
+        self.appended_bytes: int = 0
+        self.new_table: bool = False
+
+    def append(self, file_handler: FileHandler) -> bool:
+        """
+        Дописывает в закодированный файл новый хвост исходного файла. Если закодированного
+        файла нет, он записан в другом формате или исходный файл изменился не только
+        дописыванием (не совпали длина, окна в начале и в конце закодированных данных или
+        выборочные окна между ними), файл кодируется заново одним сегментом.
+
+        Прежние данные целиком не перечитываются, поэтому изменение, не задевшее ни одного
+        окна, не обнаруживается: файл, который переписывается не только в конце, нужно
+        кодировать без дописывания.
+
+        Новый сегмент и новый каталог пишутся после прежнего каталога и сбрасываются на диск,
+        и только затем заголовок переключается на новый каталог, поэтому при сбое в любой момент
+        файл остаётся читаемым в прежнем или новом состоянии. Файл, кодируемый заново,
+        записывается во временный файл и заменяет прежний после сброса на диск.
+
+        :param file_handler: обработчик исходного файла
+        :return: True, если закодированный файл успешно записан
+        """
+        self.appended_bytes = 0
+        self.new_table = False
+        file_size = os.path.getsize(file_handler.file_path)
+        directory = self._read_previous(file_handler, file_size)
+        if directory is None:
+            return self._write_new(file_handler, file_size)
+        if directory.original_length == file_size:
+            logging.info(f"Файл '{file_handler.file_path}' не изменился с последнего кодирования.")
+            return True
+
+        try:
+            with open(self.encoded_file_path, 'r+b') as file:
+                file.seek(directory.directory_end)
+                tables = list(directory.tables)
+                segments = list(directory.segments)
+                self._write_tail(file, file_handler, directory.original_length, file_size, tables, segments)
+            return True
+        except (IOError, ValueError) as e:
+            logging.exception(f"Ошибка при записи файла с сегментами '{self.encoded_file_path}': {e}")
+            self._discard_tail(directory.directory_end)
+            return False
+
+    def _write_new(self, file_handler: FileHandler, file_size: int) -> bool:
+        """
+        Кодирует исходный файл заново одним сегментом во временный файл и заменяет им прежний.
+
+        :param file_handler: обработчик исходного файла
+        :param file_size: размер исходного файла
+        :return: True, если закодированный файл успешно записан
+        """
+        temporary_path = self.encoded_file_path + '.tmp'
+        try:
+            with open(temporary_path, 'w+b') as file:
+                # Нулевое смещение каталога отмечает файл, запись которого не завершилась
+                file.write(self._serialize_header(file_handler.extension, 0))
+                self._write_tail(file, file_handler, 0, file_size, [], [])
+            os.replace(temporary_path, self.encoded_file_path)
+            return True
+        except (IOError, ValueError) as e:
+            logging.exception(f"Ошибка при записи файла с сегментами '{self.encoded_file_path}': {e}")
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            return False
+
+    def _write_tail(self, file: BinaryIO, file_handler: FileHandler, start: int, file_size: int,
+                    tables: List[bytes], segments: List[Segment]) -> None:
+        """
+        Кодирует хвост исходного файла сегментом с текущей позиции, записывает за ним новый
+        каталог, сбрасывает их на диск и затем переключает заголовок на новый каталог.
+
+        :param file: закодированный файл, открытый на запись
+        :param file_handler: обработчик исходного файла
+        :param start: смещение хвоста в исходном файле
+        :param file_size: размер исходного файла
+        :param tables: сериализованные таблицы файла (пополняется)
+        :param segments: записи сегментов файла (пополняется)
+        :raises IOError, ValueError: при ошибке чтения или записи либо если исходный файл изменился
+        """
+        if file_size > start:
+            segments.append(self._write_segment(file, file_handler, start, file_size - start, tables))
+            self.appended_bytes = file_size - start
+
+        directory_offset = file.tell()
+        probe_size = min(PROBE_SIZE, file_size)
+        # Окна в начале и в конце покрывают файл целиком, пока он не длиннее двух окон
+        sample_count, sample_size = (SAMPLE_PROBE_COUNT, SAMPLE_PROBE_SIZE) if file_size > 2 * PROBE_SIZE else (0, 0)
+        file.write(self._serialize_directory(tables, segments, probe_size,
+                                             probe_crc32(file_handler, 0, probe_size),
+                                             probe_crc32(file_handler, file_size - probe_size, probe_size),
+                                             sample_size, sample_crc32s(file_handler, file_size, sample_count, sample_size)))
+        file.truncate()
+        file.flush()
+        os.fsync(file.fileno())
+        # Заголовок переписывается последним: до этого он указывает на прежний, нетронутый каталог
+        file.seek(0)
+        file.write(self._serialize_header(file_handler.extension, directory_offset))
+        file.flush()
+        os.fsync(file.fileno())
+
+    def _discard_tail(self, directory_end: int) -> None:
+        """
+        Отрезает данные прерванного дописывания после прежнего каталога. Заголовок на них
+        не ссылается, поэтому файл читается и без этого; отрезание только освобождает место.
+
+        :param directory_end: конец прежнего каталога
+        """
+        try:
+            with open(self.encoded_file_path, 'r+b') as file:
+                file.truncate(directory_end)
+        except IOError as e:
+            logging.exception(f"Не удалось отрезать данные прерванного дописывания '{self.encoded_file_path}': {e}")
+
+    @staticmethod
+    def _serialize_header(extension: str, directory_offset: int) -> bytes:
+        """
+        Сериализует заголовок файла с сегментами.
+
+        :param extension: расширение исходного файла
+        :param directory_offset: смещение каталога сегментов
+        :return: байтовая строка заголовка вместе с расширением
+        """
+        extension_bytes = extension.encode('utf-8')
+        return SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_FORMAT_VERSION, directory_offset,
+                                   len(extension_bytes)) + extension_bytes
+
+    def _read_previous(self, file_handler: FileHandler, file_size: int) -> Optional[SegmentDirectory]:
+        """
+        Читает каталог прежнего закодированного файла и проверяет, что исходный файл с тех пор
+        только дописывался.
+
+        :param file_handler: обработчик исходного файла
+        :param file_size: текущий размер исходного файла
+        :return: каталог, к которому можно дописать хвост, или None, если файл кодируется заново
+        """
+        if not os.path.exists(self.encoded_file_path):
+            return None
+        if not is_segmented_file(self.encoded_file_path):
+            logging.info(f"Файл '{self.encoded_file_path}' записан без сегментов и будет перезаписан.")
+            return None
+        directory = self.read_directory()
+        if directory is None:
+            return None
+        if directory.sample_crc32s is None:
+            logging.info(f"Файл '{self.encoded_file_path}' записан без выборочных окон и будет закодирован заново.")
+            return None
+        original_length = directory.original_length
+        try:
+            grown = directory.extension == file_handler.extension and original_length <= file_size and \
+                directory.probe_size == min(PROBE_SIZE, original_length) and \
+                directory.sample_size <= original_length and \
+                probe_crc32(file_handler, 0, directory.probe_size) == directory.head_crc32 and \
+                probe_crc32(file_handler, original_length - directory.probe_size,
+                            directory.probe_size) == directory.tail_crc32 and \
+                sample_crc32s(file_handler, original_length, len(directory.sample_crc32s),
+                              directory.sample_size) == directory.sample_crc32s
+        except IOError as e:
+            logging.exception(f"Ошибка при чтении файла '{file_handler.file_path}': {e}")
+            return None
+        if not grown:
+            logging.info(f"Файл '{file_handler.file_path}' изменился не только дописыванием и будет закодирован заново.")
+            return None
+        # Прежние каталоги остаются между сегментами; когда они занимают больше места, чем сами
+        # данные, файл записывается заново без них, что в среднем не меняет стоимости дописывания
+        if directory.unused_size > sum(segment.payload_size for segment in directory.segments):
+            logging.info(f"В файле '{self.encoded_file_path}' накопились прежние каталоги, он будет записан заново.")
+            return None
+        return directory
+
+    def _write_segment(self, file: BinaryIO, file_handler: FileHandler, start: int, length: int,
+                       tables: List[bytes]) -> Segment:
+        """
+        Кодирует хвост исходного файла одним сегментом с текущей позиции закодированного файла.
+        Таблица выбирается по частотам хвоста (см. _choose_table).
+
+        :param file: закодированный файл, открытый на запись
+        :param file_handler: обработчик исходного файла
+        :param start: смещение хвоста в исходном файле
+        :param length: длина хвоста в байтах
+        :param tables: сериализованные таблицы файла (пополняется новой таблицей)
+        :return: запись сегмента
+        :raises ValueError: если исходный файл изменился во время кодирования
+        """
+        data: Optional[bytes] = None
+        histogram = ByteHistogram(self.backend)
+        if length <= READ_CACHE_SIZE:
+            data = b''.join(file_handler.iter_chunks(self.buffer_size, start, length))
+            histogram.update(data)
+        else:
+            for chunk in file_handler.iter_chunks(self.buffer_size, start, length):
+                histogram.update(chunk)
+
+        table_index, code_table = self._choose_table(tables, histogram)
+        bit_writer = make_bit_writer(code_table.codes, self.backend)
+        covered = bytes(code_table.codes)
+        chunks: Iterable[bytes] = [data] if data is not None else \
+            file_handler.iter_chunks(self.buffer_size, start, length)
+        offset = file.tell()
+        checksum = ContentChecksum()
+        for chunk in chunks:
+            # Перечитанный хвост мог измениться после подсчёта частот
+            if chunk.translate(None, covered):
+                raise ValueError(f"Файл '{file_handler.file_path}' изменился во время кодирования.")
+            checksum.update(chunk)
+            file.write(bit_writer.write(chunk))
+        last_byte, extra_bits = bit_writer.flush()
+        file.write(last_byte)
+        if checksum.original_length != length:
+            raise ValueError(f"Файл '{file_handler.file_path}' изменился во время кодирования.")
+        return Segment(offset, length, file.tell() - offset, checksum.crc32, extra_bits, table_index)
+
+    def _choose_table(self, tables: List[bytes], histogram: Dict[int, int]) -> Tuple[int, CodeTable]:
+        """
+        Выбирает таблицу для хвоста: самую выгодную из уже записанных, если она покрывает
+        все его байты и проигрывает новой таблице (с учётом её размера) не больше tolerance,
+        иначе строит новую таблицу и добавляет её в tables.
+
+        :param tables: сериализованные таблицы файла
+        :param histogram: частоты байтов хвоста
+        :return: кортеж из номера таблицы и кодовой таблицы
+        """
+        new_table = CodeTable()
+        new_table.build_from_frequencies(histogram)
+        new_serialized = new_table.serialize()
+        new_bits = new_table.encoded_bit_length() + 8 * len(new_serialized)
+
+        best: Optional[Tuple[int, int, CodeTable]] = None
+        for index, serialized in enumerate(tables):
+            code_table = CodeTable.deserialize(serialized)
+            if any(byte not in code_table.codes for byte in histogram):
+                continue
+            bits = code_table.encoded_bit_length(histogram)
+            if best is None or bits < best[0]:
+                best = (bits, index, code_table)
+        if best is not None and best[0] <= new_bits * (1 + self.tolerance):
+            logging.info(f"Хвост кодируется таблицей {best[1]}: {best[0] / 8:.0f} Б против {new_bits / 8:.0f} Б "
+                         f"с новой таблицей")
+            return best[1], best[2]
+
+        self.new_table = True
+        tables.append(new_serialized)
+        return len(tables) - 1, new_table
+
+    @staticmethod
+    def _serialize_directory(tables: List[bytes], segments: List[Segment], probe_size: int,
+                             head_crc32: int, tail_crc32: int, sample_size: int, sample_crc32s: List[int]) -> bytes:
+        """
+        Сериализует каталог: таблицы, записи сегментов и контрольные окна исходного файла.
+
+        :param tables: сериализованные таблицы
+        :param segments: записи сегментов
+        :param probe_size: размер контрольных окон в байтах
+        :param head_crc32: CRC32 окна в начале исходных данных
+        :param tail_crc32: CRC32 окна в конце исходных данных
+        :param sample_size: размер выборочных окон в байтах
+        :param sample_crc32s: CRC32 выборочных окон
+        :return: байтовая строка каталога
+        """
+        parts = [DIRECTORY_HEADER.pack(len(tables), len(segments), probe_size, head_crc32, tail_crc32)]
+        for serialized in tables:
+            parts.append(TABLE_LENGTH.pack(len(serialized)))
+            parts.append(serialized)
+        for segment in segments:
+            parts.append(SEGMENT_ENTRY.pack(*segment))
+        parts.append(SAMPLE_HEADER.pack(len(sample_crc32s), sample_size))
+        parts.extend(SAMPLE_CRC32.pack(crc32) for crc32 in sample_crc32s)
+        return b''.join(parts)
+
+    def read_directory(self) -> Optional[SegmentDirectory]:
+        """
+        Читает заголовок и каталог сегментов, не затрагивая закодированные данные.
+
+        :return: каталог или None в случае ошибки
+        """
+        try:
+            with open(self.encoded_file_path, 'rb') as file:
+                header = file.read(SEGMENT_HEADER.size)
+                if len(header) < SEGMENT_HEADER.size:
+                    logging.error("Файл поврежден или имеет неверный формат (недостаточно данных для заголовка сегментов).")
+                    return None
+                magic, version, directory_offset, extension_length = SEGMENT_HEADER.unpack(header)
+                if magic != SEGMENT_MAGIC or version not in SUPPORTED_FORMAT_VERSIONS:
+                    logging.error(f"Неподдерживаемая версия формата с сегментами: {version}.")
+                    return None
+                extension = file.read(extension_length).decode('utf-8')
+                if directory_offset < SEGMENT_HEADER.size + extension_length:
+                    raise ValueError("каталог сегментов не записан")
+                file.seek(directory_offset)
+                directory = file.read()
+            return self._parse_directory(directory, extension, directory_offset, version)
+        except (IOError, struct.error, UnicodeDecodeError, ValueError) as e:
+            logging.error(f"Каталог сегментов '{self.encoded_file_path}' повреждён: {e}")
+            return None
+
+    @staticmethod
+    def _parse_directory(directory: bytes, extension: str, directory_offset: int, version: int) -> SegmentDirectory:
+        """
+        Разбирает каталог сегментов.
+
+        :param directory: байты каталога (за ним могут остаться данные прерванного дописывания)
+        :param extension: расширение исходного файла из заголовка
+        :param directory_offset: смещение каталога (данные сегментов должны лежать до него)
+        :param version: версия формата из заголовка
+        :return: каталог
+        :raises ValueError, struct.error: если каталог повреждён
+        """
+        table_count, segment_count, probe_size, head_crc32, tail_crc32 = DIRECTORY_HEADER.unpack_from(directory)
+        position = DIRECTORY_HEADER.size
+        tables: List[bytes] = []
+        for _ in range(table_count):
+            table_length, = TABLE_LENGTH.unpack_from(directory, position)
+            position += TABLE_LENGTH.size
+            if position + table_length > len(directory):
+                raise ValueError("таблица выходит за пределы каталога")
+            tables.append(directory[position:position + table_length])
+            position += table_length
+
+        segments: List[Segment] = []
+        for number in range(segment_count):
+            segment = Segment(*SEGMENT_ENTRY.unpack_from(directory, position))
+            position += SEGMENT_ENTRY.size
+            if segment.offset + segment.payload_size > directory_offset or segment.table_index >= table_count:
+                raise ValueError(f"сегмент {number} выходит за пределы файла")
+            segments.append(segment)
+
+        sample_size = 0
+        sample_crc32s: Optional[List[int]] = None
+        if version >= 2:
+            sample_count, sample_size = SAMPLE_HEADER.unpack_from(directory, position)
+            position += SAMPLE_HEADER.size
+            if position + SAMPLE_CRC32.size * sample_count > len(directory):
+                raise ValueError("выборочные окна выходят за пределы каталога")
+            sample_crc32s = [SAMPLE_CRC32.unpack_from(directory, position + SAMPLE_CRC32.size * index)[0]
+                             for index in range(sample_count)]
+            position += SAMPLE_CRC32.size * sample_count
+        return SegmentDirectory(extension, directory_offset, directory_offset + position, tables, segments, probe_size,
+                                head_crc32, tail_crc32, sample_size, sample_crc32s)
+
+    def decode(self, directory: SegmentDirectory) -> Iterator[bytes]:
+        """
+        Декодирует сегменты по порядку блоками по buffer_size байт, сверяя длину и CRC32
+        каждого сегмента с каталогом.
+
+        :param directory: каталог сегментов
+        :return: итератор по блокам декодированных данных
+        :raises ValueError: если таблица повреждена или данные не совпали с каталогом
+        """
+        decoders: Dict[int, Union[TableDecoder, FixedLengthDecoder, LookupDecoder, NumpyTableDecoder]] = {}
+        with open(self.encoded_file_path, 'rb') as file:
+            for number, segment in enumerate(directory.segments):
+                yield from self._decode_segment(file, number, segment, directory.tables, decoders)
+
+    def decode_range(self, directory: SegmentDirectory, start: int, length: int) -> bytes:
+        """
+        Декодирует только сегменты, задевающие диапазон исходных данных, и останавливается
+        на конце диапазона; длина и CRC32 сверяются у сегментов, декодированных до конца.
+
+        :param directory: каталог сегментов
+        :param start: индекс первого байта диапазона в исходных данных
+        :param length: длина диапазона в байтах
+        :return: декодированные байты диапазона
+        :raises ValueError: если таблица повреждена или данные не совпали с каталогом
+        """
+        end = start + length
+        parts: List[bytes] = []
+        decoders: Dict[int, Union[TableDecoder, FixedLengthDecoder, LookupDecoder, NumpyTableDecoder]] = {}
+        segment_start = 0
+        with open(self.encoded_file_path, 'rb') as file:
+            for number, segment in enumerate(directory.segments):
+                if segment_start >= end:
+                    break
+                segment_end = segment_start + segment.original_length
+                if segment_end > start:
+                    # Сегмент декодируется блоками, и в памяти остаются только байты диапазона
+                    chunk_start = segment_start
+                    for decoded_data in self._decode_segment(file, number, segment, directory.tables, decoders):
+                        chunk_end = chunk_start + len(decoded_data)
+                        if chunk_end > start:
+                            parts.append(decoded_data[max(start - chunk_start, 0):end - chunk_start])
+                        chunk_start = chunk_end
+                        if chunk_start >= end:
+                            break
+                segment_start = segment_end
+        return b''.join(parts)
+
+    def _decode_segment(self, file: BinaryIO, number: int, segment: Segment, tables: List[bytes],
+                        decoders: Dict[int, Union[TableDecoder, FixedLengthDecoder, LookupDecoder, NumpyTableDecoder]]) -> Iterator[bytes]:
+        """
+        Декодирует один сегмент блоками по buffer_size байт.
+
+        :param file: открытый закодированный файл
+        :param number: номер сегмента (для сообщений об ошибках)
+        :param segment: запись сегмента
+        :param tables: сериализованные таблицы файла
+        :param decoders: декодеры, уже построенные по номерам таблиц (пополняется)
+        :return: итератор по блокам декодированных данных
+        :raises ValueError: если таблица повреждена или данные не совпали с каталогом
+        """
+        table_decoder = decoders.get(segment.table_index)
+        if table_decoder is None:
+            try:
+                code_table = CodeTable.deserialize(tables[segment.table_index])
+            except IndexError as e:
+                raise ValueError(f"Таблица сегмента {number} повреждена: {e}")
+            table_decoder = make_table_decoder(code_table.codes, self.backend)
+            decoders[segment.table_index] = table_decoder
+        # Декодер таблицы общий для всех её сегментов, поэтому состояние потока сбрасывается явно
+        table_decoder.reset()
+        expected = ContentChecksum()
+        expected.original_length = segment.original_length
+        expected.crc32 = segment.crc32
+        checksum = ContentChecksum()
+
+        remaining = segment.payload_size
+        position = segment.offset
+        final = False
+        while not final:
+            file.seek(position)
+            chunk = file.read(min(self.buffer_size, remaining))
+            position += len(chunk)
+            remaining -= len(chunk)
+            final = not remaining or not chunk
+            decoded_data = table_decoder.decode_chunk(chunk, final, segment.extra_bits if final else 0)
+            checksum.update(decoded_data)
+            if checksum.original_length > expected.original_length or final and not checksum.matches(expected):
+                raise ValueError(f"Сегмент {number}: {checksum.describe_mismatch(expected)}")
+            yield decoded_data
@@ -0,0 +1,253 @@
+import sys
+from typing import Dict, List, Optional, Tuple, Union
+
+from bitWriter import BitWriter
+
+# Для алфавитов не больше 16 символов таблица пар байтов остаётся маленькой по числу различных строк
+SMALL_ALPHABET_SIZE = 16
+PACK_CHUNK_SYMBOLS = 1 << 16
+# Коды одинаковой длины, делящей 8, не пересекают границы байтов
+FIXED_CODE_LENGTHS = (1, 2, 4, 8)
+
+
+def is_small_alphabet(codes: Dict[int, str]) -> bool:
+    """
+    Проверяет, подходит ли кодовая таблица для упаковки через таблицы строк кодов.
+
+    :param codes: словарь кодов {байт: строка из '0' и '1'}
+    :return: True, если в таблице от 1 до SMALL_ALPHABET_SIZE символов
+    """
+    return 0 < len(codes) <= SMALL_ALPHABET_SIZE
+
+
+def fixed_code_length(codes: Dict[int, str]) -> Optional[int]:
+    """
+    Определяет общую длину кодов, если все коды одной длины и она делит 8.
+
+    :param codes: словарь кодов {байт: строка из '0' и '1'}
+    :return: длина кода в битах или None
+    """
+    lengths = {len(code) for code in codes.values()}
+    if len(lengths) == 1:
+        length = lengths.pop()
+        if length in FIXED_CODE_LENGTHS:
+            return length
+    return None
+
+
+class LookupBitWriter(BitWriter):
+    def __init__(self, codes: Dict[int, str]) -> None:
+        """
+        Упаковщик для маленьких алфавитов. Пара байтов данных через 16-битную таблицу сразу
+        превращается в строку кодов, строки блока склеиваются и переводятся в байты через
+        int(bits, 2) — весь проход выполняется встроенными функциями без цикла по символам.
+        Результат совпадает с BitWriter бит в бит.
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'}
+        """
+        super().__init__(codes)
+        self.byte_codes: List[str] = [''] * 256
+        for byte, code in codes.items():
+            self.byte_codes[byte] = code
+        # memoryview.cast('H') читает пару байтов в порядке байтов платформы
+        if sys.byteorder == 'little':
+            self.pair_codes: List[str] = [first + second for second in self.byte_codes for first in self.byte_codes]
+        else:
+            self.pair_codes = [first + second for first in self.byte_codes for second in self.byte_codes]
+
+    def _pack_into(self, data: bytes, encoded_bytes: Union[bytearray, memoryview], position: int) -> int:
+        """
+        Дописывает коды данных в буфер с позиции position, сохраняя неполный байт в состоянии.
+
+        :param data: исходные данные (bytes, memoryview или mmap)
+        :param encoded_bytes: буфер результата (присваивание за концом bytearray расширяет буфер)
+        :param position: индекс первого записываемого байта
+        :return: индекс байта, следующего за последним записанным
+        """
+        byte_codes = self.byte_codes
+        pair_codes = self.pair_codes
+        pending = format(self._pending, f'0{self._pending_bits}b') if self._pending_bits else ''
+        view = memoryview(data)
+        for block_start in range(0, len(view), PACK_CHUNK_SYMBOLS):
+            block = view[block_start:block_start + PACK_CHUNK_SYMBOLS]
+            even = len(block) & ~1
+            bits = pending + ''.join(map(pair_codes.__getitem__, block[:even].cast('H'))) + \
+                ''.join(map(byte_codes.__getitem__, block[even:]))
+            whole_bytes = len(bits) >> 3
+            if whole_bytes:
+                encoded_bytes[position:position + whole_bytes] = int(bits[:whole_bytes * 8], 2).to_bytes(whole_bytes, 'big')
+                position += whole_bytes
+            pending = bits[whole_bytes * 8:]
+        self._pending = int(pending, 2) if pending else 0
+        self._pending_bits = len(pending)
+        return position
+
+
+class FixedLengthDecoder:
+    def __init__(self, codes: Dict[int, str]) -> None:
+        """
+        Декодер для кодов одинаковой длины 1, 2, 4 или 8 бит. Каждый байт содержит ровно
+        8 / длина кодов, поэтому i-й символ всех байтов получается одним bytes.translate,
+        а результат собирается срезами с шагом — без цикла по символам.
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'} одинаковой длины
+        """
+        code_length = fixed_code_length(codes)
+        if code_length is None:
+            raise ValueError("Коды должны иметь одинаковую длину 1, 2, 4 или 8 бит.")
+        self.code_length: int = code_length
+        self.symbols_per_byte: int = 8 // code_length
+        symbols = {int(code, 2): byte for byte, code in codes.items()}
+        mask = (1 << code_length) - 1
+        self.tables: List[bytes] = []
+        for index in range(self.symbols_per_byte):
+            shift = 8 - code_length * (index + 1)
+            self.tables.append(bytes(symbols.get((byte >> shift) & mask, 0) for byte in range(256)))
+        self.reset()
+
+    def decode(self, encoded_bytes: bytes, extra_bits_count: int) -> bytes:
+        """
+        Декодирует битовый поток целиком.
+
+        :param encoded_bytes: закодированные данные в виде байтовой строки
+        :param extra_bits_count: количество дополнительных битов в последнем байте
+        :return: декодированные данные в виде байтовой строки
+        """
+        self.reset()
+        return self.decode_chunk(encoded_bytes, True, extra_bits_count)
+
+    def reset(self) -> None:
+        """
+        Сбрасывает состояние потокового декодирования.
+        """
+        self._held: bytes = b''
+
+    def decode_chunk(self, encoded_bytes: bytes, final: bool = False, extra_bits_count: int = 0) -> bytes:
+        """
+        Декодирует очередной блок потока. Последний байт блока сохраняется до следующего
+        вызова: только в последнем блоке потока он содержит дополнительные биты.
+
+        :param encoded_bytes: очередной блок закодированных данных
+        :param final: True для последнего блока потока
+        :param extra_bits_count: количество дополнительных битов в последнем байте последнего блока
+        :return: декодированные данные в виде байтовой строки
+        """
+        data = self._held + bytes(encoded_bytes)
+        if not data:
+            return b''
+        count = self.symbols_per_byte
+        decoded_bytes = bytearray(len(data) * count)
+        for index, table in enumerate(self.tables):
+            decoded_bytes[index::count] = data.translate(table)
+
+        if final:
+            self.reset()
+            # Из последнего байта берутся только коды, целиком лежащие до дополнительных битов
+            unused = count - (8 - extra_bits_count) // self.code_length
+        else:
+            self._held = data[-1:]
+            unused = count
+        if unused:
+            del decoded_bytes[-unused:]
+        return bytes(decoded_bytes)
+
+
+class LookupDecoder:
+    def __init__(self, codes: Dict[int, str]) -> None:
+        """
+        Декодер для маленьких алфавитов с кодами разной длины (например, ДНК с длинами 1, 2, 3, 3).
+        Состояние — начало ещё не завершённого кода, то есть внутренний узел дерева кодов, и их
+        меньше, чем символов. Для каждого состояния таблица на 256 байтов хранит все символы,
+        коды которых завершаются внутри байта, и следующее состояние, поэтому один поиск
+        декодирует целый байт потока — несколько символов при коротких кодах.
+
+        Таблица по 16-битным окнам при 16 символах занимает около миллиона записей и
+        в CPython оказывается медленнее из-за промахов кэша, поэтому окно — один байт.
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'} не больше чем для SMALL_ALPHABET_SIZE символов
+        """
+        if not is_small_alphabet(codes):
+            raise ValueError(f"Алфавит должен содержать от 1 до {SMALL_ALPHABET_SIZE} символов.")
+        self.symbols_by_code: Dict[str, int] = {code: byte for byte, code in codes.items()}
+        # Пустая строка — начало кода, состояние 0
+        self.prefixes: List[str] = sorted({code[:length] for code in codes.values() for length in range(len(code))},
+                                          key=lambda prefix: (len(prefix), prefix))
+        self.states: Dict[str, int] = {prefix: state for state, prefix in enumerate(self.prefixes)}
+        # Битовая строка, не являющаяся ни кодом, ни его началом: декодирование останавливается, как в TableDecoder
+        self.stopped_state: int = len(self.prefixes)
+        self.tables: List[List[Tuple[bytes, int]]] = [
+            [self._walk(prefix, format(byte, '08b')) for byte in range(256)] for prefix in self.prefixes]
+        self.tables.append([(b'', self.stopped_state)] * 256)
+        self.reset()
+
+    def _walk(self, prefix: str, bits: str) -> Tuple[bytes, int]:
+        """
+        Декодирует биты побитово, начиная с незавершённого кода prefix.
+
+        :param prefix: начало незавершённого кода
+        :param bits: строка из '0' и '1'
+        :return: кортеж из декодированных байтов и следующего состояния
+        """
+        decoded_bytes = bytearray()
+        current = prefix
+        for bit in bits:
+            current += bit
+            byte = self.symbols_by_code.get(current)
+            if byte is not None:
+                decoded_bytes.append(byte)
+                current = ''
+            elif current not in self.states:
+                return bytes(decoded_bytes), self.stopped_state
+        return bytes(decoded_bytes), self.states[current]
+
+    def decode(self, encoded_bytes: bytes, extra_bits_count: int) -> bytes:
+        """
+        Декодирует битовый поток целиком.
+
+        :param encoded_bytes: закодированные данные в виде байтовой строки
+        :param extra_bits_count: количество дополнительных битов в последнем байте
+        :return: декодированные данные в виде байтовой строки
+        """
+        self.reset()
+        return self.decode_chunk(encoded_bytes, True, extra_bits_count)
+
+    def reset(self) -> None:
+        """
+        Сбрасывает состояние потокового декодирования.
+        """
+        self._state: int = 0
+        self._held: bytes = b''
+
+    def decode_chunk(self, encoded_bytes: bytes, final: bool = False, extra_bits_count: int = 0) -> bytes:
+        """
+        Декодирует очередной блок потока. Последний байт блока сохраняется до следующего
+        вызова: только в последнем блоке потока он содержит дополнительные биты.
+
+        :param encoded_bytes: очередной блок закодированных данных
+        :param final: True для последнего блока потока
+        :param extra_bits_count: количество дополнительных битов в последнем байте последнего блока
+        :return: декодированные данные в виде байтовой строки
+        """
+        data = self._held + bytes(encoded_bytes)
+        if not data:
+            if final:
+                self.reset()
+            return b''
+        tables = self.tables
+        state = self._state
+        decoded_parts: List[bytes] = []
+        append = decoded_parts.append
+        for byte in data[:-1]:
+            symbols, state = tables[state][byte]
+            append(symbols)
+
+        if final:
+            # Из последнего байта декодируются только биты до дополнительных; неполный код отбрасывается
+            if state != self.stopped_state:
+                append(self._walk(self.prefixes[state],
+                                  format(data[-1], '08b')[:8 - extra_bits_count])[0])
+            self.reset()
+        else:
+            self._state = state
+            self._held = data[-1:]
+        return b''.join(decoded_parts)
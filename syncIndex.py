@@ -0,0 +1,107 @@
+import os
+import struct
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+SYNC_MAGIC = b'SFIX'
+DEFAULT_SYNC_INTERVAL = 1 << 20
+# Окончание индекса: исходная длина, длина закодированных данных, интервал, количество точек, сигнатура
+SYNC_FOOTER = struct.Struct('<QQII4s')
+# Точка синхронизации: битовое смещение кода байта с номером i * interval
+SYNC_ENTRY = struct.Struct('<Q')
+
+
+class SyncIndex:
+    def __init__(self, interval: int = DEFAULT_SYNC_INTERVAL, codes: Optional[Dict[int, str]] = None) -> None:
+        """
+        Индекс точек синхронизации: битовое смещение кода каждого interval-го байта исходных данных.
+        Записывается после закодированных данных, поэтому заголовок файла не меняется.
+
+        :param interval: расстояние между точками синхронизации в байтах исходных данных
+        :param codes: словарь кодов {байт: строка из '0' и '1'}, нужен только при построении индекса
+        """
+        if interval <= 0:
+            raise ValueError(f"Интервал точек синхронизации должен быть положительным: {interval}")
+        self.interval: int = interval
+        self.offsets: List[int] = []
+        self.original_length: int = 0
+        self.bit_length: int = 0
+        self.code_lengths: List[int] = [0] * 256
+        for byte, code in (codes or {}).items():
+            self.code_lengths[byte] = len(code)
+
+    @property
+    def payload_length(self) -> int:
+        """
+        Возвращает длину закодированных данных в байтах.
+        """
+        return (self.bit_length + 7) // 8
+
+    def update(self, data: bytes) -> None:
+        """
+        Добавляет точки синхронизации для очередного блока исходных данных.
+
+        :param data: очередной блок исходных данных
+        """
+        code_lengths = self.code_lengths
+        position = 0
+        next_sync = -self.original_length % self.interval
+        while next_sync < len(data):
+            self.bit_length += sum(map(code_lengths.__getitem__, data[position:next_sync]))
+            self.offsets.append(self.bit_length)
+            position = next_sync
+            next_sync += self.interval
+        self.bit_length += sum(map(code_lengths.__getitem__, data[position:]))
+        self.original_length += len(data)
+
+    def locate(self, start: int, end: int) -> Tuple[int, int, int]:
+        """
+        Находит точки синхронизации, ограничивающие диапазон исходных данных.
+
+        :param start: индекс первого байта диапазона
+        :param end: индекс байта за концом диапазона
+        :return: кортеж из индекса первого байта декодируемого участка, его начального
+                 и конечного битового смещения
+        """
+        first = start // self.interval
+        last = -(-end // self.interval)
+        end_bit = self.offsets[last] if last < len(self.offsets) else self.bit_length
+        return first * self.interval, self.offsets[first], end_bit
+
+    def serialize(self) -> bytes:
+        """
+        Сериализует индекс: битовые смещения точек, затем окончание с сигнатурой.
+
+        :return: байтовая строка индекса
+        """
+        entries = b''.join(SYNC_ENTRY.pack(offset) for offset in self.offsets)
+        return entries + SYNC_FOOTER.pack(self.original_length, self.payload_length, self.interval,
+                                          len(self.offsets), SYNC_MAGIC)
+
+    @staticmethod
+    def read(file: BinaryIO, payload_offset: int, extra_bits: int, end: Optional[int] = None) -> Optional['SyncIndex']:
+        """
+        Читает индекс из конца закодированного файла. Индекс считается найденным, только если
+        сигнатура совпадает и его размер вместе с закодированными данными доходит ровно до end.
+
+        :param file: файловый объект закодированного файла (с произвольным доступом, в том числе io.BytesIO)
+        :param payload_offset: смещение начала закодированных данных в файле
+        :param extra_bits: количество дополнительных битов в последнем байте закодированных данных
+        :param end: смещение конца индекса (None — конец файла; перед контрольной суммой — её начало)
+        :return: экземпляр SyncIndex или None, если индекса в файле нет
+        """
+        file_size = file.seek(0, os.SEEK_END) if end is None else end
+        if file_size - payload_offset < SYNC_FOOTER.size:
+            return None
+        file.seek(file_size - SYNC_FOOTER.size)
+        original_length, payload_length, interval, count, magic = SYNC_FOOTER.unpack(file.read(SYNC_FOOTER.size))
+        index_size = SYNC_ENTRY.size * count + SYNC_FOOTER.size
+        if magic != SYNC_MAGIC or not interval or payload_offset + payload_length + index_size != file_size:
+            return None
+
+        file.seek(payload_offset + payload_length)
+        entries = file.read(SYNC_ENTRY.size * count)
+        sync_index = SyncIndex(interval)
+        sync_index.offsets = [offset for offset, in SYNC_ENTRY.iter_unpack(entries)]
+        sync_index.original_length = original_length
+        sync_index.bit_length = payload_length * 8 - extra_bits
+        return sync_index
@@ -0,0 +1,187 @@
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_WINDOW_BITS = 12
+REFILL_BYTES = 6
+
+
+class TableDecoder:
+    def __init__(self, codes: Dict[int, str], window_bits: int = DEFAULT_WINDOW_BITS) -> None:
+        """
+        Строит таблицы поиска для декодирования окнами по window_bits бит.
+
+        Каждой записи таблицы соответствует k-битное окно: байты, которые целиком
+        декодируются внутри окна, и число использованных бит. Коды длиннее окна
+        декодируются медленным путём по словарю (длина, значение) -> байт.
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'}
+        :param window_bits: ширина окна поиска в битах
+        """
+        self.window_bits: int = window_bits
+        self.codes_by_key: Dict[Tuple[int, int], int] = {
+            (len(code), int(code, 2)): byte for byte, code in codes.items()
+        }
+        self.max_code_length: int = max((len(code) for code in codes.values()), default=0)
+        self.entries: List[Tuple[bytes, int]] = self._build_entries(codes)
+        self.reset()
+
+    def _build_entries(self, codes: Dict[int, str]) -> List[Tuple[bytes, int]]:
+        """
+        Заполняет таблицу окон динамическим программированием по длине остатка окна.
+
+        :param codes: словарь кодов {байт: строка из '0' и '1'}
+        :return: список записей (декодированные байты, использованные биты) для всех 2^k окон
+        """
+        k = self.window_bits
+        # Первый символ окна: (байт, длина кода); длина 0 — код не помещается в окно.
+        # Короткие коды записываются последними, как и при побитовом поиске побеждает кратчайший.
+        first: List[Tuple[int, int]] = [(0, 0)] * (1 << k)
+        for byte, code in sorted(codes.items(), key=lambda item: -len(item[1])):
+            length = len(code)
+            if length > k:
+                continue
+            start = int(code, 2) << (k - length)
+            first[start:start + (1 << (k - length))] = [(byte, length)] * (1 << (k - length))
+
+        # rest[r][v] — жадное декодирование r-битной строки v
+        rest: List[List[Tuple[bytes, int]]] = [[(b'', 0)]]
+        for r in range(1, k + 1):
+            shift = k - r
+            row: List[Tuple[bytes, int]] = []
+            for v in range(1 << r):
+                byte, length = first[v << shift]
+                if length and length <= r:
+                    tail_bytes, tail_length = rest[r - length][v & ((1 << (r - length)) - 1)]
+                    row.append((bytes((byte,)) + tail_bytes, length + tail_length))
+                else:
+                    row.append((b'', 0))
+            rest.append(row)
+        return rest[k]
+
+    def _match_code(self, value: int, bit_count: int) -> Optional[Tuple[int, int]]:
+        """
+        Ищет кратчайший код, являющийся префиксом битовой строки.
+
+        :param value: битовая строка в виде целого числа
+        :param bit_count: количество бит в строке
+        :return: кортеж (байт, длина кода) или None, если код не найден
+        """
+        for length in range(1, min(bit_count, self.max_code_length) + 1):
+            byte = self.codes_by_key.get((length, value >> (bit_count - length)))
+            if byte is not None:
+                return byte, length
+        return None
+
+    def decode(self, encoded_bytes: bytes, extra_bits_count: int) -> bytes:
+        """
+        Декодирует битовый поток, обрабатывая за шаг целое окно из нескольких кодов.
+
+        :param encoded_bytes: закодированные данные в виде байтовой строки
+        :param extra_bits_count: количество дополнительных битов в последнем байте
+        :return: декодированные данные в виде байтовой строки
+        """
+        self.reset()
+        return self.decode_chunk(encoded_bytes, True, extra_bits_count)
+
+    def reset(self) -> None:
+        """
+        Сбрасывает состояние потокового декодирования.
+        """
+        self._acc: int = 0
+        self._bit_count: int = 0
+        self._stopped: bool = False
+
+    def decode_chunk(self, encoded_bytes: bytes, final: bool = False, extra_bits_count: int = 0) -> bytes:
+        """
+        Декодирует очередной блок потока. Последний байт блока и биты незавершённого
+        кода сохраняются и декодируются вместе со следующим блоком.
+
+        :param encoded_bytes: очередной блок закодированных данных
+        :param final: True для последнего блока потока
+        :param extra_bits_count: количество дополнительных битов в последнем байте последнего блока
+        :return: декодированные данные в виде байтовой строки
+        """
+        decoded_bytes = bytearray()
+        if not self.codes_by_key or self._stopped:
+            return bytes(decoded_bytes)
+        if not encoded_bytes:
+            if final:
+                # Последний байт с дополнительными битами уже перенесён из предыдущего блока
+                self._decode_tail(self._acc >> extra_bits_count, self._bit_count - extra_bits_count, decoded_bytes)
+                self.reset()
+            return bytes(decoded_bytes)
+
+        k = self.window_bits
+        mask = (1 << k) - 1
+        entries = self.entries
+        refill_bits = REFILL_BYTES * 8
+        # Последний байт блока в основной цикл не загружается: в последнем блоке потока
+        # он содержит дополнительные биты, а про промежуточный блок это ещё неизвестно
+        limit = len(encoded_bytes) - REFILL_BYTES - 1
+
+        acc = self._acc
+        bit_count = self._bit_count
+        pos = 0
+        while True:
+            if bit_count < k:
+                if pos > limit:
+                    break
+                acc = ((acc & ((1 << bit_count) - 1)) << refill_bits) | \
+                    int.from_bytes(encoded_bytes[pos:pos + REFILL_BYTES], 'big')
+                pos += REFILL_BYTES
+                bit_count += refill_bits
+
+            symbols, used = entries[(acc >> (bit_count - k)) & mask]
+            if used:
+                decoded_bytes += symbols
+                bit_count -= used
+                continue
+
+            # Код длиннее окна: догружаем биты и ищем код медленным путём
+            while bit_count < self.max_code_length and pos <= limit:
+                acc = ((acc & ((1 << bit_count) - 1)) << refill_bits) | \
+                    int.from_bytes(encoded_bytes[pos:pos + REFILL_BYTES], 'big')
+                pos += REFILL_BYTES
+                bit_count += refill_bits
+            if bit_count < self.max_code_length:
+                break
+            match = self._match_code((acc >> (bit_count - self.max_code_length)) &
+                                     ((1 << self.max_code_length) - 1), self.max_code_length)
+            if match is None:
+                self._stopped = True
+                return bytes(decoded_bytes)
+            decoded_bytes.append(match[0])
+            bit_count -= match[1]
+
+        tail = encoded_bytes[pos:]
+        value = ((acc & ((1 << bit_count) - 1)) << (len(tail) * 8)) | int.from_bytes(tail, 'big')
+        bit_count += len(tail) * 8
+        if final:
+            self._decode_tail(value >> extra_bits_count, bit_count - extra_bits_count, decoded_bytes)
+            self.reset()
+        else:
+            self._acc = value
+            self._bit_count = bit_count
+        return bytes(decoded_bytes)
+
+    def _decode_tail(self, value: int, bit_count: int, decoded_bytes: bytearray) -> None:
+        """
+        Декодирует хвост потока с точным учётом оставшихся бит; неполный код в конце отбрасывается.
+
+        :param value: оставшиеся биты в виде целого числа
+        :param bit_count: количество оставшихся бит
+        :param decoded_bytes: буфер, в который дописываются декодированные байты
+        """
+        k = self.window_bits
+        mask = (1 << k) - 1
+        while bit_count > 0:
+            if bit_count >= k:
+                symbols, used = self.entries[(value >> (bit_count - k)) & mask]
+                if used:
+                    decoded_bytes += symbols
+                    bit_count -= used
+                    continue
+            match = self._match_code(value & ((1 << bit_count) - 1), bit_count)
+            if match is None:
+                return
+            decoded_bytes.append(match[0])
+            bit_count -= match[1]
@@ -0,0 +1,100 @@
+import os
+import random
+import sys
+from typing import Callable, Iterator
+
+import pytest
+
+# Модули лежат в корне репозитория без пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contentChecksum import CHECKSUM_MAGIC  # noqa: E402
+from decoder import Decoder  # noqa: E402
+from encoder import Encoder  # noqa: E402
+
+FUZZ_SEED = 20240501
+
+
+@pytest.fixture
+def text_data() -> bytes:
+    """
+    Текст с неравномерными частотами байтов, похожий на журнал.
+    """
+    rng = random.Random(1)
+    words = [b'INFO', b'ERROR', b'request', b'done', b'in', b'ms', b'2024-05-01', b'\n']
+    return b' '.join(rng.choice(words) for _ in range(20000))
+
+
+@pytest.fixture
+def write_file(tmp_path) -> Callable[[str, bytes], str]:
+    """
+    Записывает файл во временный каталог и возвращает путь к нему.
+    """
+    def write(name: str, data: bytes) -> str:
+        path = os.path.join(str(tmp_path), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+    return write
+
+
+def mutations(data: bytes, count: int, seed: int = FUZZ_SEED) -> Iterator[bytes]:
+    """
+    Порождает повреждённые копии данных: замену нескольких байтов, обрезание и дописывание.
+
+    :param data: исходные данные
+    :param count: количество копий
+    :param seed: начальное значение генератора
+    :return: итератор по повреждённым копиям
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        mutated = bytearray(data)
+        kind = index % 3
+        if kind == 0:
+            for _ in range(rng.randrange(1, 4)):
+                position = rng.randrange(len(mutated))
+                mutated[position] = rng.randrange(256)
+        elif kind == 1:
+            del mutated[rng.randrange(len(mutated)):]
+        else:
+            mutated += bytes(rng.randrange(256) for _ in range(rng.randrange(1, 32)))
+        yield bytes(mutated)
+
+
+def read(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def encode_file(path: str, **options) -> str:
+    encoder = Encoder(path, **options)
+    assert encoder.encode()
+    return encoder.encoded_file_path
+
+
+def decode_file(encoded_path: str, **options) -> bytes:
+    decoder = Decoder(encoded_path, **options)
+    assert decoder.decode()
+    return read(decoder.decoded_file_name)
+
+
+def check_corrupted_file(encoded_path: str, original_path: str) -> None:
+    """
+    Повреждённый файл не должен приводить к исключениям. Если окончание с контрольной суммой
+    уцелело, успешное декодирование допустимо, только если результат совпадает с исходными данными;
+    файл без окончания читается как файл старого формата, и повреждение в нём не обнаружить.
+    """
+    original = read(original_path)
+    checked = read(encoded_path).endswith(CHECKSUM_MAGIC)
+    decoder = Decoder(encoded_path)
+    if decoder.decode() and checked:
+        assert read(decoder.decoded_file_name) == original
+    streaming = Decoder(encoded_path, streaming=True)
+    if streaming.decode() and checked:
+        assert read(streaming.decoded_file_name) == original
+    if Decoder(encoded_path).verify() and checked:
+        assert Decoder(encoded_path).matches_original(original_path)
+    decoded_range = Decoder(encoded_path).decode_range(10, 100)
+    assert decoded_range is None or not checked or decoded_range == original[10:110]
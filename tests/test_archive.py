@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from archiveCodec import ARCHIVE_ENTRY, ARCHIVE_HEADER, DIRECTORY_HEADER, TABLE_LENGTH, ArchiveCodec
+from conftest import mutations, read
+
+
+def test_archive_round_trip(write_file, text_data, tmp_path):
+    paths = [write_file('logs/a.txt', text_data), write_file('logs/sub/b.csv', b'1,2,3\n' * 1000),
+             write_file('logs/empty.txt', b'')]
+    archive_path = os.path.join(str(tmp_path), 'logs.sfa')
+    codec = ArchiveCodec(archive_path)
+    assert codec.create(paths, os.path.join(str(tmp_path), 'logs'), max_tables=2)
+    assert sorted(member.path for member in codec.list_members()) == ['a.txt', 'empty.txt', 'sub/b.csv']
+    assert codec.read_member('sub/b.csv') == b'1,2,3\n' * 1000
+
+    output_dir = os.path.join(str(tmp_path), 'out')
+    assert codec.extract(output_dir)
+    assert read(os.path.join(output_dir, 'a.txt')) == text_data
+    assert read(os.path.join(output_dir, 'empty.txt')) == b''
+
+
+def test_fuzzed_archives(write_file, text_data, tmp_path):
+    paths = [write_file('logs/a.txt', text_data[:20000]), write_file('logs/b.txt', b'abc' * 3000)]
+    archive_path = os.path.join(str(tmp_path), 'logs.sfa')
+    assert ArchiveCodec(archive_path).create(paths)
+    archive = read(archive_path)
+    for index, corrupted in enumerate(mutations(archive, 60)):
+        corrupted_path = write_file(f'fuzz{index}.sfa', corrupted)
+        codec = ArchiveCodec(corrupted_path)
+        member = codec.read_member('a.txt')
+        assert member is None or member == text_data[:20000]
+        codec.extract(os.path.join(str(tmp_path), f'out{index}'))
+
+
+@pytest.mark.parametrize('directory, error', [
+    (DIRECTORY_HEADER.pack(0xFFFFFFFF, 0xFFFFFFFF), 'не помещается в каталог'),
+    (DIRECTORY_HEADER.pack(1, 0) + TABLE_LENGTH.pack(0xFFFFFFFF), 'таблица выходит за пределы каталога'),
+    (DIRECTORY_HEADER.pack(0, 1) + ARCHIVE_ENTRY.pack(0, 0, 0, 0, 0, 0, 0xFFFF, 0), 'имя файла записи 0'),
+    (DIRECTORY_HEADER.pack(0, 2) + ARCHIVE_ENTRY.pack(0, 0, 0, 0, 0, 0, 1, 0) + b'a' + bytes(ARCHIVE_ENTRY.size - 1),
+     'запись 1 выходит за пределы каталога'),
+], ids=['counts', 'table', 'name', 'entry'])
+def test_hostile_directory_is_rejected(write_file, text_data, tmp_path, directory, error, caplog):
+    archive_path = os.path.join(str(tmp_path), 'logs.sfa')
+    assert ArchiveCodec(archive_path).create([write_file('logs/a.txt', text_data[:1000])])
+    _, _, directory_offset = ARCHIVE_HEADER.unpack_from(read(archive_path))
+    hostile_path = write_file('hostile.sfa', read(archive_path)[:directory_offset] + directory)
+    codec = ArchiveCodec(hostile_path)
+    assert codec.read_directory() is None
+    assert 'повреждён' in caplog.text and error in caplog.text
+    assert not codec.extract(os.path.join(str(tmp_path), 'out'))
@@ -0,0 +1,27 @@
+import pytest
+
+from conftest import decode_file, encode_file
+from numpyBackend import NUMPY_AVAILABLE, resolve_backend
+
+
+@pytest.mark.parametrize('backend', ['python', 'auto'])
+def test_round_trip(write_file, text_data, backend):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, backend=backend)
+    assert decode_file(encoded_path, backend='python') == text_data
+    assert decode_file(encoded_path, backend=backend, streaming=True) == text_data
+
+
+def test_resolve_backend():
+    assert resolve_backend('python') == 'python'
+    assert resolve_backend('auto') == ('numpy' if NUMPY_AVAILABLE else 'python')
+    with pytest.raises(ValueError):
+        resolve_backend('cuda')
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason='NumPy не установлен')
+def test_numpy_and_python_decode_each_other(write_file, text_data):
+    python_path = encode_file(write_file('python.txt', text_data), backend='python')
+    numpy_path = encode_file(write_file('numpy.txt', text_data), backend='numpy')
+    assert decode_file(python_path, backend='numpy') == text_data
+    assert decode_file(numpy_path, backend='python') == text_data
@@ -0,0 +1,33 @@
+from bitWriter import BitWriter
+from codeTable import CodeTable
+from tableDecoder import TableDecoder
+
+
+def test_bit_length_matches_packed_size(text_data):
+    code_table = CodeTable()
+    code_table.build(text_data, backend='python')
+    writer = BitWriter(code_table.codes)
+    bit_length = writer.bit_length(text_data)
+    assert bit_length == sum(len(code_table.codes[byte]) for byte in text_data)
+    assert bit_length == writer.bit_length(memoryview(text_data))
+
+    encoded, extra_bits = writer.pack(text_data)
+    assert len(encoded) * 8 - extra_bits == bit_length
+    assert TableDecoder(code_table.codes).decode(bytes(encoded), extra_bits) == text_data
+
+
+def test_bit_length_ignores_bytes_without_code():
+    writer = BitWriter({97: '0', 98: '1'})
+    assert writer.bit_length(b'') == 0
+    assert writer.bit_length(b'ab\xffab') == 4
+
+
+def test_incremental_write_matches_pack(text_data):
+    code_table = CodeTable()
+    code_table.build(text_data, backend='python')
+    packed, extra_bits = BitWriter(code_table.codes).pack(text_data)
+    writer = BitWriter(code_table.codes)
+    written = b''.join(bytes(writer.write(text_data[start:start + 999])) for start in range(0, len(text_data), 999))
+    tail, tail_extra_bits = writer.flush()
+    assert written + tail == bytes(packed)
+    assert tail_extra_bits == extra_bits
@@ -0,0 +1,56 @@
+import os
+
+from blockCodec import BLOCK_HEADER, BlockCodec
+from conftest import decode_file, encode_file, mutations, read
+from decoder import Decoder
+
+
+def test_block_container_round_trip(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, block_size=1 << 14, workers=1)
+    assert decode_file(encoded_path, workers=1) == text_data
+    assert Decoder(encoded_path, workers=1).verify()
+    assert Decoder(encoded_path, workers=1).matches_original(path)
+    assert Decoder(encoded_path, workers=1).decode_range(20000, 30000) == text_data[20000:50000]
+
+
+def test_block_container_huge_count_is_rejected(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded = bytearray(read(encode_file(path, block_size=1 << 14, workers=1)))
+    magic, version, block_size, _, extension_length = BLOCK_HEADER.unpack_from(encoded)
+    BLOCK_HEADER.pack_into(encoded, 0, magic, version, block_size, 0xFFFFFFF0, extension_length)
+    corrupted_path = write_file('corrupted_encoded.bin', bytes(encoded))
+    assert not Decoder(corrupted_path, workers=1).decode()
+    assert not Decoder(corrupted_path, workers=1).verify()
+    assert Decoder(corrupted_path, workers=1).decode_range(0, 10) is None
+
+
+def test_fuzzed_block_containers(write_file, text_data):
+    path = write_file('log.txt', text_data[:30000])
+    encoded = read(encode_file(path, block_size=1 << 12, workers=1))
+    for corrupted in mutations(encoded, 60):
+        corrupted_path = write_file('fuzz_encoded.bin', corrupted)
+        original = read(path)
+        decoder = Decoder(corrupted_path, workers=1)
+        if decoder.decode():
+            assert read(decoder.decoded_file_name) == original
+        Decoder(corrupted_path, workers=1).verify()
+        decoded_range = Decoder(corrupted_path, workers=1).decode_range(10, 100)
+        assert decoded_range is None or decoded_range == original[10:110]
+
+
+def test_corrupted_block_leaves_no_output(write_file, text_data, tmp_path):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, block_size=1 << 14, workers=1)
+    entries = BlockCodec(1).read_header(encoded_path)[1]
+    encoded = bytearray(read(encoded_path))
+    # Середина данных второго блока: индекс цел, но блок декодируется неверно
+    offset, _, table_size, payload_size, *_ = entries[1]
+    encoded[offset + table_size + payload_size // 2] ^= 0xFF
+    corrupted_path = write_file('corrupted_encoded.bin', bytes(encoded))
+    before = sorted(os.listdir(str(tmp_path)))
+
+    decoder = Decoder(corrupted_path, workers=1)
+    assert not decoder.decode()
+    assert not os.path.exists(decoder.decoded_file_name)
+    assert sorted(os.listdir(str(tmp_path))) == before
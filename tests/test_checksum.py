@@ -0,0 +1,37 @@
+import pytest
+
+from contentChecksum import CHECKSUM_FOOTER, CHECKSUM_MAGIC
+from conftest import check_corrupted_file, encode_file, mutations, read
+from decoder import Decoder
+from memoryCodec import decode_bytes
+
+
+def test_changed_payload_fails_verification(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded = bytearray(read(encode_file(path)))
+    encoded[len(encoded) // 2] ^= 0x55
+    corrupted_path = write_file('corrupted_encoded.bin', bytes(encoded))
+    assert not Decoder(corrupted_path).verify()
+    assert not Decoder(corrupted_path).decode()
+
+
+@pytest.mark.parametrize('sync_interval', [None, 4096])
+def test_truncated_or_padded_trailer_is_corruption(write_file, text_data, sync_interval):
+    path = write_file('log.txt', text_data)
+    encoded = read(encode_file(path, sync_interval=sync_interval))
+    footer = CHECKSUM_FOOTER.size
+    for corrupted in (encoded[:-footer] + b'\0' + encoded[-footer:], encoded[:-footer - 1] + encoded[-footer:]):
+        corrupted_path = write_file('corrupted_encoded.bin', corrupted)
+        assert not Decoder(corrupted_path).verify()
+        assert not Decoder(corrupted_path).decode()
+        assert not Decoder(corrupted_path, streaming=True).decode()
+        assert decode_bytes(corrupted) is None
+
+
+def test_fuzzed_plain_files(write_file, text_data):
+    path = write_file('log.txt', text_data[:20000])
+    encoded = read(encode_file(path, sync_interval=1024))
+    for corrupted in mutations(encoded, 60):
+        check_corrupted_file(write_file('fuzz_encoded.bin', corrupted), path)
+        decoded = decode_bytes(corrupted)
+        assert decoded is None or not corrupted.endswith(CHECKSUM_MAGIC) or decoded == text_data[:20000]
@@ -0,0 +1,62 @@
+import pickle
+import struct
+
+import pytest
+
+from codeTable import CodeTable
+from conftest import mutations
+
+
+@pytest.mark.parametrize('symbol_count', [1, 2, 31, 32, 200, 256])
+def test_compact_table_round_trip(symbol_count):
+    frequencies = {byte: 1 + byte * byte for byte in range(symbol_count)}
+    code_table = CodeTable()
+    code_table.build_from_frequencies(frequencies)
+    serialized = code_table.serialize()
+    assert serialized.startswith(b'SFT')
+    assert CodeTable.deserialize(serialized).codes == code_table.codes
+
+
+def test_long_codes_round_trip():
+    # Частоты Фибоначчи дают коды длиннее 15 бит, и длины записываются байтами вместо полубайтов
+    fibonacci = [1, 1]
+    while len(fibonacci) < 24:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    code_table = CodeTable()
+    code_table.build_from_frequencies(dict(enumerate(fibonacci)))
+    assert max(len(code) for code in code_table.codes.values()) > 15
+    assert CodeTable.deserialize(code_table.serialize()).codes == code_table.codes
+
+
+def test_corrupted_compact_tables_raise_value_error():
+    code_table = CodeTable()
+    code_table.build_from_frequencies({byte: 1 + byte % 7 for byte in range(0, 256, 3)})
+    for corrupted in mutations(code_table.serialize(), 300):
+        try:
+            CodeTable.deserialize(corrupted)
+        except ValueError:
+            pass
+
+
+def test_legacy_pickle_table_round_trip():
+    codes = {97: '0', 98: '10', 99: '11'}
+    # Таблицы старого формата записывались pickle.dumps с протоколом не ниже 2 (начинаются с PROTO)
+    for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+        assert CodeTable.deserialize(pickle.dumps(codes, protocol=protocol)).codes == codes
+
+
+@pytest.mark.parametrize('codes', [{True: '0'}, {300: '0'}, {-1: '0'}, {97: '2'}, {97: ''}, [97]])
+def test_legacy_pickle_table_rejects_wrong_shape(codes):
+    with pytest.raises(ValueError):
+        CodeTable.deserialize(pickle.dumps(codes))
+
+
+def test_legacy_pickle_table_rejects_corrupted_opcodes():
+    serialized = pickle.dumps({97: '0', 98: '1'})
+    # LONG_BINPUT с огромным номером ячейки памяти заставил бы выделить память до чтения
+    huge_memo = serialized[:12] + b'r' + struct.pack('<I', 0xFFFFFFF0) + serialized[13:]
+    for corrupted in [huge_memo, *mutations(serialized, 300)]:
+        try:
+            CodeTable.deserialize(corrupted)
+        except ValueError:
+            pass
@@ -0,0 +1,19 @@
+from conftest import decode_file, encode_file
+from decoder import Decoder
+from encoder import Encoder
+from test_streaming import rewrite_before_second_pass
+
+
+def test_context_model_round_trip(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, context_model=True)
+    assert decode_file(encoded_path) == text_data
+    assert Decoder(encoded_path).verify()
+
+
+def test_file_gaining_uncoded_pair_fails(write_file, monkeypatch, caplog):
+    # У контекста 'a' своя таблица только с 'b': байт 'c' есть в файле, но пары ('a', 'c') нет
+    path = write_file('log.txt', b'ab' * 13000 + b'cd' * 13000)
+    rewrite_before_second_pass(monkeypatch, path, b'ab' * 12999 + b'ac' + b'cd' * 13000)
+    assert not Encoder(path, context_model=True, streaming=True).encode()
+    assert 'изменился во время кодирования' in caplog.text
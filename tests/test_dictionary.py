@@ -0,0 +1,57 @@
+import os
+import struct
+
+import pytest
+
+from codeDictionary import (DICTIONARY_FORMAT_VERSION, DICTIONARY_MAGIC, DICTIONARY_REFERENCE, CodeDictionary,
+                            LRUCache, is_valid_name, parse_reference)
+from codeTable import CodeTable
+from conftest import decode_file, encode_file
+from encoder import Encoder
+from memoryCodec import decode_bytes
+
+
+def test_dictionary_round_trip(write_file, text_data, tmp_path):
+    dictionary = CodeDictionary.train('logs', [text_data[:5000]])
+    assert dictionary.save(str(tmp_path)) == CodeDictionary.get_path(str(tmp_path), 'logs')
+    assert CodeDictionary.load(str(tmp_path), 'logs').code_table.codes == dictionary.code_table.codes
+
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, dictionary=dictionary)
+    assert decode_file(encoded_path, dictionary_dir=str(tmp_path)) == text_data
+    assert decode_file(encoded_path, dictionary_dir=str(tmp_path), streaming=True) == text_data
+
+
+def test_dictionary_must_cover_data(write_file, text_data):
+    code_table = CodeTable()
+    code_table.build(text_data)
+    dictionary = CodeDictionary('logs', code_table)
+    path = write_file('binary.bin', text_data + b'\xff')
+    assert not Encoder(path, dictionary=dictionary).encode()
+    assert not Encoder(path, dictionary=dictionary, streaming=True).encode()
+
+
+@pytest.mark.parametrize('name', ['', '..', '../escape', 'a/b', '/abs', 'a\\b', 'C:x'])
+def test_unsafe_names_are_rejected(text_data, tmp_path, name):
+    assert not is_valid_name(name)
+    assert CodeDictionary.train(name, [text_data]).save(str(tmp_path)) is None
+    assert CodeDictionary.load(str(tmp_path), name) is None
+    reference = DICTIONARY_REFERENCE.pack(DICTIONARY_MAGIC, DICTIONARY_FORMAT_VERSION, 0) + name.encode()
+    with pytest.raises(ValueError):
+        parse_reference(reference)
+    assert decode_bytes(struct.pack('I', len(reference)) + reference + b'\0' + struct.pack('I', 0)) is None
+
+
+def test_failed_save_returns_none(text_data, tmp_path):
+    assert CodeDictionary.train('logs', [text_data]).save(os.path.join(str(tmp_path), 'missing')) is None
+
+
+def test_lru_cache_evicts_oldest():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats() == {'size': 2, 'max_size': 2, 'hits': 3, 'misses': 1, 'evictions': 1}
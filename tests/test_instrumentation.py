@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from decoder import Decoder
+from encoder import Encoder
+from instrumentation import DISABLED, Instrumentation
+
+
+def test_null_report_ignores_writes():
+    report = DISABLED.null_report
+    report.ok = True
+    report.add_bytes(10, 5)
+    report.set_metric('sampling_loss', 0.5)
+    assert report.ok is False
+    assert report.bytes_in == 0 and report.metrics == {}
+
+
+def test_concurrent_results_do_not_mix(write_file, text_data):
+    paths = [write_file(f'log{index}.txt', text_data[:5000 + index]) for index in range(8)]
+    # Половина заданий заведомо неудачна: файла нет
+    jobs = [path if index % 2 else path + '.missing' for index, path in enumerate(paths)]
+    with ThreadPoolExecutor(8) as executor:
+        for _ in range(5):
+            results = list(executor.map(lambda path: Encoder(path).encode(), jobs))
+            assert results == [bool(index % 2) for index in range(len(jobs))]
+
+
+def test_enabled_report(write_file, text_data):
+    reports = []
+    instrumentation = Instrumentation(observers=[reports.append])
+    path = write_file('log.txt', text_data)
+    encoder = Encoder(path, instrumentation=instrumentation)
+    assert encoder.encode()
+    assert Decoder(encoder.encoded_file_path, instrumentation=instrumentation).decode()
+    assert not Decoder(path + '.missing', instrumentation=instrumentation).decode()
+    assert [(report.operation, report.ok) for report in reports] == [('encode', True), ('decode', True),
+                                                                      ('decode', False)]
+    assert reports[0].bytes_in == len(text_data)
+    assert 'pack' in reports[0].phases
@@ -0,0 +1,22 @@
+from conftest import decode_file, encode_file
+from decoder import Decoder
+from encoder import Encoder
+
+
+def test_round_trip(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, sample_size=4096)
+    assert decode_file(encoded_path) == text_data
+    assert decode_file(encoded_path, streaming=True) == text_data
+    assert Decoder(encoded_path).verify()
+    assert Decoder(encoded_path).matches_original(path)
+
+
+def test_sampled_table_codes_unsampled_bytes(write_file):
+    data = bytearray(b'abcd' * 50000)
+    data[123457] = 0xFF
+    path = write_file('sample.bin', bytes(data))
+    encoder = Encoder(path, sample_size=1024)
+    assert encoder.encode()
+    assert encoder.sampling_loss is not None
+    assert decode_file(encoder.encoded_file_path) == bytes(data)
@@ -0,0 +1,109 @@
+import os
+import random
+
+from conftest import FUZZ_SEED, check_corrupted_file, decode_file, mutations, read
+from decoder import Decoder
+from encoder import Encoder
+from fileHandler import FileHandler
+from segmentCodec import SAMPLE_HEADER, SegmentCodec
+
+
+def test_segments_append_only_new_data(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoder = Encoder(path, append=True)
+    assert encoder.encode()
+    encoded_path = encoder.encoded_file_path
+
+    tail = b'\n'.join(b'WARN new line %d' % number for number in range(500))
+    with open(path, 'ab') as file:
+        file.write(tail)
+    codec = SegmentCodec(encoded_path)
+    assert codec.append(FileHandler(path))
+    assert codec.appended_bytes == len(tail)
+    assert len(codec.read_directory().segments) == 2
+
+    assert decode_file(encoded_path) == text_data + tail
+    assert Decoder(encoded_path).verify()
+    assert Decoder(encoded_path).matches_original(path)
+    assert Decoder(encoded_path).decode_range(len(text_data) - 5, 20) == (text_data + tail)[len(text_data) - 5:
+                                                                                            len(text_data) + 15]
+
+
+def test_segments_rewritten_when_prefix_changes(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    assert Encoder(path, append=True).encode()
+    changed = b'X' + text_data[1:] + b'tail'
+    write_file('log.txt', changed)
+    encoder = Encoder(path, append=True)
+    assert encoder.encode()
+    assert len(SegmentCodec(encoder.encoded_file_path).read_directory().segments) == 1
+    assert decode_file(encoder.encoded_file_path) == changed
+
+
+def test_segments_survive_interrupted_append(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoder = Encoder(path, append=True)
+    assert encoder.encode()
+    # Данные прерванного дописывания после каталога: заголовок на них не ссылается
+    with open(encoder.encoded_file_path, 'ab') as file:
+        file.write(b'\x01partial segment' * 10)
+    assert decode_file(encoder.encoded_file_path) == text_data
+
+    with open(path, 'ab') as file:
+        file.write(b'more\n')
+    assert Encoder(path, append=True).encode()
+    assert decode_file(encoder.encoded_file_path) == text_data + b'more\n'
+
+
+def test_fuzzed_segment_files(write_file, text_data):
+    path = write_file('log.txt', text_data[:20000])
+    encoder = Encoder(path, append=True)
+    assert encoder.encode()
+    with open(path, 'ab') as file:
+        file.write(b'\xc3\xa9 appended\n' * 200)
+    assert Encoder(path, append=True).encode()
+    encoded = read(encoder.encoded_file_path)
+    for corrupted in mutations(encoded, 60):
+        check_corrupted_file(write_file('fuzz_encoded.bin', corrupted), path)
+
+
+def test_segment_range_reads_only_needed_part(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoder = Encoder(path, append=True, buffer_size=1 << 10)
+    assert encoder.encode()
+    codec = SegmentCodec(encoder.encoded_file_path, buffer_size=1 << 10)
+    directory = codec.read_directory()
+    assert codec.decode_range(directory, 100, 50) == text_data[100:150]
+    assert codec.decode_range(directory, len(text_data), 50) == b''
+
+
+def test_segments_rewritten_when_middle_changes(write_file):
+    data = bytes(random.Random(FUZZ_SEED).choices(b'abcdefgh \n', k=400000))
+    path = write_file('log.txt', data)
+    assert Encoder(path, append=True).encode()
+    # Размер и окна в начале и в конце прежние, изменение видно только выборочным окнам
+    changed = data[:150000] + data[150000:250000].upper() + data[250000:] + b'tail\n'
+    write_file('log.txt', changed)
+    encoder = Encoder(path, append=True)
+    assert encoder.encode()
+    assert len(SegmentCodec(encoder.encoded_file_path).read_directory().segments) == 1
+    assert decode_file(encoder.encoded_file_path) == changed
+
+
+def test_segments_version_1_is_read_and_rewritten_on_append(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoder = Encoder(path, append=True)
+    assert encoder.encode()
+    encoded = read(encoder.encoded_file_path)
+    # Каталог версии 1 отличается только отсутствием выборочных окон в конце
+    assert encoded.endswith(SAMPLE_HEADER.pack(0, 0))
+    version_1 = encoded[:4] + bytes((1,)) + encoded[5:-SAMPLE_HEADER.size]
+    write_file(os.path.basename(encoder.encoded_file_path), version_1)
+    assert SegmentCodec(encoder.encoded_file_path).read_directory().sample_crc32s is None
+    assert decode_file(encoder.encoded_file_path) == text_data
+
+    with open(path, 'ab') as file:
+        file.write(b'more\n')
+    assert Encoder(path, append=True).encode()
+    assert SegmentCodec(encoder.encoded_file_path).read_directory().sample_crc32s is not None
+    assert decode_file(encoder.encoded_file_path) == text_data + b'more\n'
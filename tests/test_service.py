@@ -0,0 +1,110 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from codecService import CodecService, ServiceOverloadedError
+from conftest import mutations
+from memoryCodec import StreamDecoder, decode_bytes, encode_bytes
+
+
+def test_memory_codec_round_trip(text_data):
+    encoded = encode_bytes(text_data, extension='.txt')
+    assert decode_bytes(encoded) == text_data
+    assert decode_bytes(encode_bytes(text_data, context_model=True)) == text_data
+
+
+def test_service_round_trip_and_corrupted_input(text_data):
+    async def run():
+        async with CodecService(executor=ThreadPoolExecutor(2), buffer_size=4096) as service:
+            encoded = await service.encode(text_data, extension='.txt')
+            assert await service.decode(encoded) == text_data
+            corrupted = bytearray(encoded)
+            corrupted[len(corrupted) // 2] ^= 0x55
+            assert await service.decode(bytes(corrupted)) is None
+            assert await service.decode(b'') is None
+
+            async def chunks(data):
+                for start in range(0, len(data), 1000):
+                    yield data[start:start + 1000]
+            streamed = b''.join([chunk async for chunk in service.encode_stream(chunks(text_data))])
+            assert b''.join([chunk async for chunk in service.decode_stream(chunks(streamed))]) == text_data
+            return service.metrics.snapshot()
+
+    metrics = asyncio.run(run())
+    assert metrics['completed'] >= 4
+    assert metrics['running'] == 0
+
+
+def test_service_rejects_calls_over_queue_limit(text_data):
+    async def run():
+        async with CodecService(executor=ThreadPoolExecutor(1), max_concurrency=1, max_queue=0) as service:
+            results = await asyncio.gather(service.encode(text_data), service.encode(text_data),
+                                           return_exceptions=True)
+            return results, service.metrics.snapshot()
+
+    (first, second), metrics = asyncio.run(run())
+    assert decode_bytes(first) == text_data
+    assert isinstance(second, ServiceOverloadedError)
+    assert metrics['rejected'] == 1 and metrics['completed'] == 1
+
+
+async def chunks_of(data: bytes, size: int, consumed: list):
+    for start in range(0, len(data), size):
+        consumed.append(start)
+        yield data[start:start + size]
+
+
+def test_decode_stream_yields_before_input_ends(text_data):
+    async def run():
+        async with CodecService(executor=ThreadPoolExecutor(1), buffer_size=512) as service:
+            consumed = []
+            stream = service.decode_stream(chunks_of(encode_bytes(text_data), 100, consumed))
+            first = await stream.__anext__()
+            consumed_before_first = len(consumed)
+            rest = [chunk async for chunk in stream]
+            return first, rest, consumed_before_first, len(consumed)
+
+    first, rest, consumed_before_first, total = asyncio.run(run())
+    assert first + b''.join(rest) == text_data
+    assert consumed_before_first < total
+    assert all(len(chunk) <= 512 for chunk in [first, *rest])
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda encoded: encoded[:-1],
+    lambda encoded: encoded[:len(encoded) // 2],
+    lambda encoded: encoded[:3],
+    lambda encoded: encoded[:-30] + bytes([encoded[-30] ^ 1]) + encoded[-29:],
+    lambda encoded: encode_bytes(b'abc' * 1000, sync_interval=100),
+])
+def test_decode_stream_raises_on_corrupted_input(text_data, corrupt):
+    async def run():
+        async with CodecService(executor=ThreadPoolExecutor(1)) as service:
+            return [chunk async for chunk in service.decode_stream(chunks_of(corrupt(encode_bytes(text_data)),
+                                                                             1000, []))]
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_encode_stream_rejects_payload_over_limit(text_data):
+    async def run():
+        async with CodecService(executor=ThreadPoolExecutor(1), max_payload=1000) as service:
+            return [chunk async for chunk in service.encode_stream(chunks_of(text_data, 300, []))]
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_fuzzed_streams(text_data):
+    original = text_data[:20000]
+    encoded = encode_bytes(original)
+    for corrupted in [*mutations(encoded, 300), *mutations(encode_bytes(original, context_model=True), 100)]:
+        stream_decoder = StreamDecoder()
+        try:
+            decoded = b''.join(stream_decoder.feed(corrupted[start:start + 999])
+                               for start in range(0, len(corrupted), 999)) + stream_decoder.finish()
+        except ValueError:
+            continue
+        assert decoded == original
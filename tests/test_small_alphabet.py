@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from bitWriter import BitWriter
+from codeTable import CodeTable
+from conftest import FUZZ_SEED, decode_file, encode_file
+from numpyBackend import make_table_decoder
+from smallAlphabet import FixedLengthDecoder, LookupDecoder
+from tableDecoder import TableDecoder
+
+DNA_SKEW_CODES = {ord('A'): '0', ord('C'): '10', ord('G'): '110', ord('T'): '111'}
+
+
+def dna_skew(size):
+    return bytes(random.Random(FUZZ_SEED).choices(b'ACGT', [50, 25, 13, 12], k=size))
+
+
+def test_lookup_decoder_matches_table_decoder():
+    data = dna_skew(20000)
+    encoded, extra_bits = BitWriter(DNA_SKEW_CODES).pack(data)
+    assert isinstance(make_table_decoder(DNA_SKEW_CODES, 'python'), LookupDecoder)
+    assert LookupDecoder(DNA_SKEW_CODES).decode(bytes(encoded), extra_bits) == data
+    assert TableDecoder(DNA_SKEW_CODES).decode(bytes(encoded), extra_bits) == data
+
+    decoder = LookupDecoder(DNA_SKEW_CODES)
+    chunks = [bytes(encoded[start:start + 7]) for start in range(0, len(encoded), 7)]
+    decoded = b''.join(decoder.decode_chunk(chunk) for chunk in chunks[:-1])
+    decoded += decoder.decode_chunk(chunks[-1], final=True, extra_bits_count=extra_bits)
+    assert decoded == data
+
+
+@pytest.mark.parametrize('data', [
+    b'a' * 1000,
+    # Частоты Фибоначчи дают коды длиннее байта
+    b''.join(bytes((byte,)) * count for byte, count in enumerate([1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144])),
+])
+def test_lookup_decoder_edge_tables(data):
+    code_table = CodeTable()
+    code_table.build(data, backend='python')
+    encoded, extra_bits = BitWriter(code_table.codes).pack(data)
+    assert LookupDecoder(code_table.codes).decode(bytes(encoded), extra_bits) == data
+
+
+def test_lookup_decoder_stops_on_invalid_code():
+    codes = {ord('A'): '0', ord('C'): '10'}
+    encoded = bytes([0b01011000, 0b00000000])
+    expected = TableDecoder(codes).decode(encoded, 0)
+    assert LookupDecoder(codes).decode(encoded, 0) == expected == b'AC'
+
+
+def test_lookup_decoder_rejects_large_alphabet():
+    with pytest.raises(ValueError):
+        LookupDecoder({byte: format(byte, '08b') for byte in range(256)})
+
+
+def test_fixed_length_decoder():
+    codes = {ord(symbol): code for symbol, code in zip('ACGT', ('00', '01', '10', '11'))}
+    data = dna_skew(1001)
+    encoded, extra_bits = BitWriter(codes).pack(data)
+    assert isinstance(make_table_decoder(codes, 'python'), FixedLengthDecoder)
+    assert FixedLengthDecoder(codes).decode(bytes(encoded), extra_bits) == data
+
+
+def test_dna_skew_file_round_trip(write_file):
+    data = dna_skew(50000)
+    path = write_file('genome.txt', data)
+    assert decode_file(encode_file(path)) == data
+    assert decode_file(encode_file(path, streaming=True), streaming=True) == data
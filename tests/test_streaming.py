@@ -0,0 +1,40 @@
+from fileHandler import FileHandler
+from conftest import decode_file, encode_file, read
+from encoder import Encoder
+
+
+def rewrite_before_second_pass(monkeypatch, path: str, data: bytes) -> None:
+    """
+    Подменяет содержимое файла перед вторым проходом чтения потокового кодировщика.
+    """
+    iter_chunks = FileHandler.iter_chunks
+    passes = []
+
+    def iter_chunks_rewriting(self, *args, **kwargs):
+        passes.append(self.file_path)
+        if len(passes) == 2:
+            with open(path, 'wb') as file:
+                file.write(data)
+        return iter_chunks(self, *args, **kwargs)
+
+    monkeypatch.setattr(FileHandler, 'iter_chunks', iter_chunks_rewriting)
+
+
+def test_round_trip(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, streaming=True, buffer_size=1000)
+    assert decode_file(encoded_path, streaming=True, buffer_size=777) == text_data
+    assert decode_file(encoded_path) == text_data
+
+
+def test_streaming_and_mapped_output_match(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    mapped = read(encode_file(path))
+    assert read(encode_file(path, streaming=True, buffer_size=4096)) == mapped
+
+
+def test_file_gaining_uncoded_bytes_fails(write_file, monkeypatch, caplog):
+    path = write_file('log.txt', b'ab' * 13000)
+    rewrite_before_second_pass(monkeypatch, path, b'ab' * 12999 + b'ac')
+    assert not Encoder(path, streaming=True).encode()
+    assert 'изменился во время кодирования' in caplog.text
@@ -0,0 +1,23 @@
+from conftest import encode_file
+from decoder import Decoder
+
+
+def test_decode_range(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path, sync_interval=4096)
+    assert Decoder(encoded_path).decode_range(10000, 5000) == text_data[10000:15000]
+    assert Decoder(encoded_path).decode_range(0, 1) == text_data[:1]
+    assert Decoder(encoded_path).decode_range(len(text_data) - 10, 100) == text_data[-10:]
+    assert Decoder(encoded_path).decode_range(len(text_data), 100) == b''
+
+
+def test_ranges_across_every_sync_point(write_file, text_data):
+    data = text_data[:30000]
+    encoded_path = encode_file(write_file('log.txt', data), sync_interval=1000)
+    for start in range(0, len(data), 997):
+        assert Decoder(encoded_path).decode_range(start, 1500) == data[start:start + 1500]
+
+
+def test_range_needs_sync_index(write_file, text_data):
+    encoded_path = encode_file(write_file('log.txt', text_data))
+    assert Decoder(encoded_path).decode_range(0, 100) is None
@@ -0,0 +1,37 @@
+from bitWriter import BitWriter
+from codeTable import CodeTable
+from conftest import decode_file, encode_file
+from decoder import Decoder
+from tableDecoder import TableDecoder
+
+
+def test_round_trip(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded_path = encode_file(path)
+    assert decode_file(encoded_path) == text_data
+    assert Decoder(encoded_path).verify()
+    assert Decoder(encoded_path).matches_original(path)
+
+
+def test_empty_file(write_file):
+    path = write_file('empty.txt', b'')
+    encoded_path = encode_file(path)
+    assert decode_file(encoded_path) == b''
+    assert Decoder(encoded_path).verify()
+
+
+def test_codes_longer_than_window_and_chunked_input():
+    # Частоты Фибоначчи дают коды длиннее окна таблицы
+    data = b''.join(bytes((byte,)) * count for byte, count in enumerate([1, 1, 2, 3, 5, 8, 13, 21, 34, 55,
+                                                                         89, 144, 233, 377, 610, 987]))
+    code_table = CodeTable()
+    code_table.build(data, backend='python')
+    encoded, extra_bits = BitWriter(code_table.codes).pack(data)
+    assert max(len(code) for code in code_table.codes.values()) > 4
+    assert TableDecoder(code_table.codes, window_bits=4).decode(bytes(encoded), extra_bits) == data
+
+    decoder = TableDecoder(code_table.codes, window_bits=4)
+    chunks = [bytes(encoded[start:start + 7]) for start in range(0, len(encoded), 7)]
+    decoded = b''.join(decoder.decode_chunk(chunk) for chunk in chunks[:-1])
+    decoded += decoder.decode_chunk(chunks[-1], final=True, extra_bits_count=extra_bits)
+    assert decoded == data
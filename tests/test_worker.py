@@ -0,0 +1,46 @@
+import io
+import json
+
+import pytest
+
+from batch import BatchOptions
+from codecWorker import handle_job, serve_stream
+
+
+def test_worker_encodes_and_decodes(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    encoded = handle_job({'id': 1, 'command': 'encode', 'path': path}, BatchOptions())
+    assert encoded['ok'] and encoded['id'] == 1
+    decoded = handle_job({'id': 2, 'command': 'decode', 'path': encoded['output_path']}, BatchOptions())
+    assert decoded['ok']
+    verified = handle_job({'command': 'verify', 'path': path,
+                           'options': {'streaming': True}}, BatchOptions())
+    assert verified['ok']
+
+
+@pytest.mark.parametrize('job', [
+    {'command': 'encode', 'path': 'log.txt', 'options': 5},
+    {'command': 'encode', 'path': 'log.txt', 'options': [[1]]},
+    {'command': 'encode', 'path': 'log.txt', 'options': {'level': 9}},
+    {'command': 'encode', 'path': 'log.txt', 'options': {'block_size': 'big', 'workers': 1}},
+    {'command': [1], 'path': 'log.txt'},
+    {'command': 'encode', 'path': 7},
+])
+def test_worker_rejects_malformed_jobs(write_file, text_data, job):
+    job = dict(job, path=write_file('log.txt', text_data)) if job['path'] == 'log.txt' else job
+    response = handle_job(job, BatchOptions())
+    assert response['ok'] is False
+
+
+def test_worker_stream_survives_bad_lines(write_file, text_data):
+    path = write_file('log.txt', text_data)
+    lines = ['not json\n', '[1, 2]\n', '\n', json.dumps({'id': 'x', 'command': 'ping'}) + '\n',
+             json.dumps({'command': 'encode', 'path': path, 'options': 5}) + '\n',
+             json.dumps({'id': 'y', 'command': 'encode', 'path': path}) + '\n',
+             json.dumps({'command': 'shutdown'}) + '\n', json.dumps({'command': 'ping'}) + '\n']
+    writer = io.StringIO()
+    assert serve_stream(lines, writer, BatchOptions())
+    responses = [json.loads(line) for line in writer.getvalue().splitlines()]
+    assert [response['ok'] for response in responses] == [False, False, True, False, True, True]
+    assert responses[2]['id'] == 'x' and 'caches' in responses[2]
+    assert responses[4]['id'] == 'y'